@@ -1,16 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog, filedialog, colorchooser, scrolledtext
 import pyautogui
-import time
 import threading
+import queue
 import json
 import os
-import random
-import shutil
 from PIL import Image, ImageTk, ImageGrab # Pillow for pixel color and image ops
+from frame_sources import create_frame_source, available_frame_sources
+from matching import (SEARCH_MODES, SEARCH_MODE_LABELS, DEFAULT_SEARCH_MODE, DEFAULT_SEARCH_MARGIN,
+                      MATCH_MODES, MATCH_MODE_LABELS, DEFAULT_MATCH_MODE,
+                      MATCH_STRATEGIES, MATCH_STRATEGY_LABELS, DEFAULT_MATCH_STRATEGY,
+                      match_mode_for, match_strategy_for, describe_search,
+                      MATCH_BACKEND)
+from template_cache import TemplateCache
+from pixel_probe import PixelProbe
+from sequence_plan import compile_sequence, SequenceRun, SequenceCancelled, run_pass
+from waits import Backoff, WAIT_POLL_MIN_S, WAIT_POLL_MAX_S
+from matcher_pool import MatcherPool
+from frozen_capture import freeze_after_hiding
+from asset_writer import AssetWriter, describe_finished
+from asset_store import AssetStore, asset_relative_path
 
 # --- Global Variables & Constants ---
 DEFAULT_PROJECT_NAME = "UntitledSequence"
+SEQUENCE_PROGRESS_POLL_MS = 50 # How often the UI drains progress messages from a running sequence
 
 # Special keys for PyAutoGUI keyboard actions
 PYAUTOGUI_SPECIAL_KEYS = sorted([
@@ -95,6 +108,7 @@ class DesktopAutomationApp:
         self.sequence_modified = False
 
         self.grid_window = None
+        self.grid_frozen = None # FrozenScreen the open grid overlay shows and image captures are cropped from
         self.grid_rows_var = tk.IntVar(value=10)
         self.grid_cols_var = tk.IntVar(value=10)
         self.selected_grid_cells = []
@@ -107,6 +121,19 @@ class DesktopAutomationApp:
         self.pixel_monitor_active = False
         self._pixel_listener = None
 
+        self.frame_source = create_frame_source("pyautogui") # Where image/pixel steps get their screen frames from
+        self.frame_source_name = tk.StringVar(value=self.frame_source.name)
+        self.template_cache = TemplateCache() # Image objects decoded once per run instead of on every check
+        self.asset_writer = AssetWriter(self.root, self._on_assets_written) # Captured PNGs and project image copies are written off the Tk thread
+
+        self.sequence_thread = None # Worker running the current sequence, None when idle
+        self.sequence_cancel = threading.Event() # Set to stop the running sequence, interrupting any wait
+        self.sequence_progress = queue.Queue() # (kind, data) messages from the worker, drained with after()
+        self.minimize_while_running = tk.BooleanVar(value=True)
+        self.match_in_process = tk.BooleanVar(value=False) # Match images in a worker process (off the GIL) instead of the sequence thread
+        self.wait_poll_min_ms = tk.IntVar(value=int(WAIT_POLL_MIN_S * 1000)) # Wait steps poll this fast when the screen changes after a quiet spell...
+        self.wait_poll_max_ms = tk.IntVar(value=int(WAIT_POLL_MAX_S * 1000)) # ...and back off to this while it stays the same or keeps changing
+
         self.container = tk.Frame(root)
         self.container.pack(fill="both", expand=True)
 
@@ -227,16 +254,25 @@ class DesktopAutomationApp:
 
     def create_region_grid_mode(self):
         if self.grid_window and self.grid_window.winfo_exists(): self.grid_window.destroy()
-        self.grid_window = tk.Toplevel(self.root)
-        self.grid_window.attributes('-fullscreen', True); self.grid_window.attributes('-alpha', 0.4); self.grid_window.attributes('-topmost', True)
-        self.grid_canvas = tk.Canvas(self.grid_window, bg='gray', highlightthickness=0); self.grid_canvas.pack(fill="both", expand=True)
-        self.screen_width = self.root.winfo_screenwidth(); self.screen_height = self.root.winfo_screenheight()
         try:
             rows = self.grid_rows_var.get(); cols = self.grid_cols_var.get()
             if rows <= 0 or cols <= 0: raise ValueError("Grid dimensions must be positive.")
         except (tk.TclError, ValueError) as e:
             simpledialog.messagebox.showerror("Error", f"Invalid grid dimensions: {e}. Using 10x10.", parent=self.root)
-            self.grid_rows_var.set(10); self.grid_cols_var.set(10); rows, cols = 10, 10
+            self.grid_rows_var.set(10); self.grid_cols_var.set(10)
+        # Freeze the screen once; the grid is drawn over the frozen image and image captures are cropped from it
+        freeze_after_hiding(self.root, self.frame_source, self._open_region_grid_overlay, self._on_capture_freeze_error)
+
+    def _on_capture_freeze_error(self, error):
+        simpledialog.messagebox.showerror("Error", f"Could not capture screen: {error}", parent=self.root)
+
+    def _open_region_grid_overlay(self, frozen):
+        rows = self.grid_rows_var.get(); cols = self.grid_cols_var.get(); self.grid_frozen = frozen
+        self.grid_window = tk.Toplevel(self.root)
+        self.grid_window.attributes('-fullscreen', True); self.grid_window.attributes('-topmost', True)
+        self.grid_canvas = tk.Canvas(self.grid_window, bg='black', highlightthickness=0); self.grid_canvas.pack(fill="both", expand=True)
+        frozen.show_on(self.grid_canvas)
+        self.screen_width = self.root.winfo_screenwidth(); self.screen_height = self.root.winfo_screenheight()
         self.cell_width = self.screen_width / cols; self.cell_height = self.screen_height / rows
         self.selected_grid_cells = []; self._draw_grid_on_canvas()
         self.grid_canvas.bind("<Button-1>", self._on_grid_cell_click)
@@ -264,8 +300,10 @@ class DesktopAutomationApp:
         self._draw_grid_on_canvas()
 
     def _confirm_grid_selection(self, cancelled=False):
+        frozen = self.grid_frozen; self.grid_frozen = None
+        if self.grid_window and self.grid_window.winfo_exists(): self.grid_window.destroy()
+        self.root.deiconify()
         if cancelled or not self.selected_grid_cells:
-            if self.grid_window and self.grid_window.winfo_exists(): self.grid_window.destroy()
             self.selected_grid_cells = []
             if not cancelled: simpledialog.messagebox.showinfo("Info", "No cells selected.", parent=self.root)
             return
@@ -282,25 +320,30 @@ class DesktopAutomationApp:
                 if self.add_object(obj_name, obj_data): simpledialog.messagebox.showinfo("Region Created", f"Region '{obj_name}' created.", parent=self.root)
             elif creation_type == "image":
                 try:
-                    self.root.withdraw(); time.sleep(0.2); img = pyautogui.screenshot(region=coords); self.root.deiconify()
-                    base_img_filename = f"{obj_name.replace(' ', '_').replace('.', '_')}.png"; final_abs_img_path = ""
-                    if self.current_project_path:
-                        images_dir = os.path.join(self.current_project_path, "images"); os.makedirs(images_dir, exist_ok=True)
-                        final_abs_img_path = os.path.join(images_dir, base_img_filename)
-                    else:
-                        final_abs_img_path = os.path.join(os.getcwd(), base_img_filename)
-                        simpledialog.messagebox.showinfo("Image Saved (No Project)",f"Image: {final_abs_img_path}\nRelative after 'Save As...'.",parent=self.root)
-                    img.save(final_abs_img_path)
-                    obj_data={"type":"image","mode":"grid","image_path":final_abs_img_path,"capture_coords":coords,"confidence":0.8}
+                    img = frozen.crop(coords) # Cut from the frozen screen the grid was drawn over
+                    image_hash, final_abs_img_path = self._store_captured_image(img, obj_name)
+                    obj_data={"type":"image","mode":"grid","image_path":final_abs_img_path,"image_hash":image_hash,"capture_coords":coords,"confidence":0.8,"search_mode":DEFAULT_SEARCH_MODE,"search_margin":DEFAULT_SEARCH_MARGIN,"match_mode":DEFAULT_MATCH_MODE,"match_strategy":DEFAULT_MATCH_STRATEGY}
                     if self.add_object(obj_name,obj_data): simpledialog.messagebox.showinfo("Image Created",f"Image '{obj_name}' captured.",parent=self.root)
-                except Exception as e: self.root.deiconify(); simpledialog.messagebox.showerror("Error",f"Capture image error: {e}",parent=self.root)
-        if self.grid_window and self.grid_window.winfo_exists(): self.grid_window.destroy(); self.selected_grid_cells = []
+                except Exception as e: simpledialog.messagebox.showerror("Error",f"Capture image error: {e}",parent=self.root)
+        self.selected_grid_cells = []
+
+    def _store_captured_image(self, img, obj_name):
+        # Images are stored by pixel hash: an identical capture reuses the existing file (and decoded template).
+        # Returns (hash, absolute path); the PNG is written in the background and the template is matchable at once.
+        image_hash, path = AssetStore.for_capture(self.current_project_path, self.asset_writer).add_image(img, label=obj_name); self.template_cache.put(path, img)
+        if not self.current_project_path: simpledialog.messagebox.showinfo("Image Saved (No Project)",f"Image: {path}\nRelative after 'Save As...'.",parent=self.root)
+        return image_hash, path
 
     def create_region_drag_mode(self):
         if self.drag_select_window and self.drag_select_window.winfo_exists(): return
+        # Freeze the screen once; the rectangle is dragged over the frozen image and image captures are cropped from it
+        freeze_after_hiding(self.root, self.frame_source, self._open_region_drag_overlay, self._on_capture_freeze_error)
+
+    def _open_region_drag_overlay(self, frozen):
         self.drag_select_window = tk.Toplevel(self.root)
-        self.drag_select_window.attributes('-fullscreen',True); self.drag_select_window.attributes('-alpha',0.3); self.drag_select_window.attributes('-topmost',True)
-        drag_canvas = tk.Canvas(self.drag_select_window,bg="gray",cursor="crosshair",highlightthickness=0); drag_canvas.pack(fill="both",expand=True)
+        self.drag_select_window.attributes('-fullscreen',True); self.drag_select_window.attributes('-topmost',True)
+        drag_canvas = tk.Canvas(self.drag_select_window,bg="black",cursor="crosshair",highlightthickness=0); drag_canvas.pack(fill="both",expand=True)
+        frozen.show_on(drag_canvas)
         tk.Label(drag_canvas,text="Click & drag. Release to confirm. ESC to cancel.",bg="lightyellow",fg="black").place(x=10,y=10)
         def on_b1_press(event): self.drag_start_x=event.x; self.drag_start_y=event.y; self.drag_rect_id=drag_canvas.create_rectangle(self.drag_start_x,self.drag_start_y,self.drag_start_x,self.drag_start_y,outline='red',width=2)
         def on_b1_motion(event):
@@ -309,6 +352,7 @@ class DesktopAutomationApp:
             if self.drag_start_x is None: return
             x1,y1=min(self.drag_start_x,event.x),min(self.drag_start_y,event.y); x2,y2=max(self.drag_start_x,event.x),max(self.drag_start_y,event.y)
             self.drag_select_window.destroy(); self.drag_select_window=None; self.drag_start_x,self.drag_start_y,self.drag_rect_id = None,None,None
+            self.root.deiconify()
             if abs(x1-x2)<5 or abs(y1-y2)<5: simpledialog.messagebox.showinfo("Info","Selection too small.",parent=self.root); return
             coords=(int(x1),int(y1),int(x2-x1),int(y2-y1))
             creation_type = self.frames["ObjectCreationFrame"].current_creation_type
@@ -319,25 +363,25 @@ class DesktopAutomationApp:
                     if self.add_object(obj_name,obj_data): simpledialog.messagebox.showinfo("Region Created",f"Region '{obj_name}' created.",parent=self.root)
                 elif creation_type == "image":
                     try:
-                        self.root.withdraw(); time.sleep(0.2); img = pyautogui.screenshot(region=coords); self.root.deiconify()
-                        base_img_filename=f"{obj_name.replace(' ','_').replace('.','_')}.png"; final_abs_img_path=""
-                        if self.current_project_path:
-                            images_dir=os.path.join(self.current_project_path,"images"); os.makedirs(images_dir,exist_ok=True)
-                            final_abs_img_path=os.path.join(images_dir,base_img_filename)
-                        else:
-                            final_abs_img_path=os.path.join(os.getcwd(),base_img_filename)
-                            simpledialog.messagebox.showinfo("Image Saved (No Project)",f"Image: {final_abs_img_path}\nRelative after 'Save As...'.",parent=self.root)
-                        img.save(final_abs_img_path)
-                        obj_data={"type":"image","mode":"drag","image_path":final_abs_img_path,"capture_coords":coords,"confidence":0.8}
+                        img = frozen.crop(coords) # Cut from the frozen screen the rectangle was dragged over
+                        image_hash, final_abs_img_path = self._store_captured_image(img, obj_name)
+                        obj_data={"type":"image","mode":"drag","image_path":final_abs_img_path,"image_hash":image_hash,"capture_coords":coords,"confidence":0.8,"search_mode":DEFAULT_SEARCH_MODE,"search_margin":DEFAULT_SEARCH_MARGIN,"match_mode":DEFAULT_MATCH_MODE,"match_strategy":DEFAULT_MATCH_STRATEGY}
                         if self.add_object(obj_name,obj_data): simpledialog.messagebox.showinfo("Image Created",f"Image '{obj_name}' captured.",parent=self.root)
-                    except Exception as e: self.root.deiconify(); simpledialog.messagebox.showerror("Error",f"Capture image error: {e}",parent=self.root)
+                    except Exception as e: simpledialog.messagebox.showerror("Error",f"Capture image error: {e}",parent=self.root)
         def on_escape_drag(event=None):
             if self.drag_select_window: self.drag_select_window.destroy(); self.drag_select_window=None
             self.drag_start_x,self.drag_start_y,self.drag_rect_id=None,None,None; print("Drag selection cancelled.")
+            self.root.deiconify()
         drag_canvas.bind("<ButtonPress-1>",on_b1_press); drag_canvas.bind("<B1-Motion>",on_b1_motion)
         drag_canvas.bind("<ButtonRelease-1>",on_b1_release); self.drag_select_window.bind("<Escape>",on_escape_drag)
         self.drag_select_window.focus_force()
 
+    def _on_assets_written(self, jobs):
+        # Completion report from the asset writer, on the Tk thread
+        line, failures = describe_finished(jobs)
+        if line: print(line)
+        if failures: simpledialog.messagebox.showerror("Save Error","Could not write these images:\n"+"\n".join(f"{label}: {error}" for label,error in failures),parent=self.root)
+
     def _check_unsaved_changes(self):
         if self.sequence_modified:
             response = simpledialog.messagebox.askyesnocancel("Unsaved Changes", f"Sequence '{self.current_sequence_name}' has unsaved changes. Save now?", parent=self.root)
@@ -360,7 +404,7 @@ class DesktopAutomationApp:
         else:
             self.frames["StepCreatorFrame"].finalize_steps_for_controller()
             project_dir=self.current_project_path; sequence_filename=os.path.join(project_dir,f"{self.current_sequence_name}.json")
-            project_images_dir=os.path.join(project_dir,"images"); os.makedirs(project_images_dir,exist_ok=True)
+            asset_store=AssetStore.for_project(project_dir,self.asset_writer) # Images by pixel hash; only missing ones are written
             data_to_save={"sequence_name":self.current_sequence_name,"loop_count":self.loop_count.get(),"objects":{},"steps":self.current_steps}
             for obj_name,obj_data_in_memory in self.objects.items():
                 obj_data_for_json=obj_data_in_memory.copy()
@@ -368,17 +412,16 @@ class DesktopAutomationApp:
                     current_abs_image_path=obj_data_in_memory.get("image_path")
                     if not current_abs_image_path or not os.path.isabs(current_abs_image_path):
                         print(f"Warning: Img obj '{obj_name}' invalid path: {current_abs_image_path}. Skipping."); data_to_save["objects"][obj_name]=obj_data_for_json; continue
-                    if not os.path.exists(current_abs_image_path):
+                    if not self.asset_writer.exists(current_abs_image_path): # A capture still being written counts
                         print(f"Warning: Img file for '{obj_name}' not found: {current_abs_image_path}. Storing as is."); data_to_save["objects"][obj_name]=obj_data_for_json; continue
-                    img_basename=os.path.basename(current_abs_image_path)
-                    target_abs_path_in_project_images=os.path.join(project_images_dir,img_basename)
-                    norm_current_path=os.path.normpath(current_abs_image_path); norm_target_path=os.path.normpath(target_abs_path_in_project_images)
-                    if norm_current_path != norm_target_path:
-                        try:
-                            shutil.copy2(current_abs_image_path,target_abs_path_in_project_images); print(f"Copied img for '{obj_name}' to: {target_abs_path_in_project_images}")
-                            self.objects[obj_name]["image_path"]=target_abs_path_in_project_images
-                        except Exception as e: print(f"Error copying img {current_abs_image_path}: {e}"); simpledialog.messagebox.showerror("Save Error",f"Could not copy img asset {img_basename} for {obj_name}",parent=self.root)
-                    obj_data_for_json["image_path"]=os.path.join("images",img_basename)
+                    # Copied into the store in the background (after any pending write of the source) unless it already has
+                    # these pixels; images from before the store are hashed once here and referenced by hash from now on
+                    try: image_hash,target_abs_path=asset_store.add_file(current_abs_image_path,obj_data_in_memory.get("image_hash"),label=obj_name)
+                    except Exception as e:
+                        print(f"Error adding img {current_abs_image_path} to the project: {e}"); simpledialog.messagebox.showerror("Save Error",f"Could not add img asset for {obj_name}: {e}",parent=self.root)
+                        data_to_save["objects"][obj_name]=obj_data_for_json; continue
+                    self.objects[obj_name].update(image_path=target_abs_path,image_hash=image_hash)
+                    obj_data_for_json.update(image_path=asset_relative_path(image_hash),image_hash=image_hash)
                 data_to_save["objects"][obj_name]=obj_data_for_json
             try:
                 with open(sequence_filename,'w') as f: json.dump(data_to_save,f,indent=4)
@@ -423,7 +466,32 @@ class DesktopAutomationApp:
             simpledialog.messagebox.showerror("Load Error",f"Could not load sequence: {e}",parent=self.root)
             self.new_sequence()
 
+    def set_frame_source(self, source_name):
+        # Called when the capture source combobox on the main menu changes
+        if self.sequence_thread and self.sequence_thread.is_alive(): # The running sequence still grabs from the current source
+            simpledialog.messagebox.showwarning("Capture Source", "Stop the sequence before changing the capture source.", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name); return
+        options = {}
+        if source_name == "replay":
+            replay_path = filedialog.askdirectory(title="Select Folder of Recorded Frames", parent=self.root)
+            if not replay_path:
+                self.frame_source_name.set(self.frame_source.name)
+                return
+            options["path"] = replay_path
+        try:
+            new_source = create_frame_source(source_name, **options)
+        except Exception as e:
+            simpledialog.messagebox.showerror("Capture Source Error", f"Could not switch to '{source_name}': {e}", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name)
+            return
+        self.frame_source.close()
+        self.frame_source = new_source
+        print(f"Capture source set to '{source_name}'.")
+
     def run_sequence(self):
+        # Runs on the Tk thread: validates and prepares, then hands the steps to a worker thread
+        if self.sequence_thread and self.sequence_thread.is_alive():
+            simpledialog.messagebox.showinfo("Run Sequence", "A sequence is already running.", parent=self.root); return
         self.frames["StepCreatorFrame"].finalize_steps_for_controller()
         if not self.current_steps:
             simpledialog.messagebox.showinfo("Run Sequence", "No steps to run.", parent=self.root); return
@@ -431,17 +499,89 @@ class DesktopAutomationApp:
             loops_to_run = self.loop_count.get()
             if loops_to_run < 0: simpledialog.messagebox.showerror("Error","Loop count cannot be negative.",parent=self.root); return
         except tk.TclError: simpledialog.messagebox.showerror("Error","Invalid loop count.",parent=self.root); return
+        try:
+            poll_min_ms = self.wait_poll_min_ms.get(); poll_max_ms = self.wait_poll_max_ms.get()
+            if poll_min_ms < 0 or poll_max_ms < poll_min_ms: simpledialog.messagebox.showerror("Error","Wait polling needs 0 <= fast <= slow.",parent=self.root); return
+        except tk.TclError: simpledialog.messagebox.showerror("Error","Invalid wait polling interval.",parent=self.root); return
+        backoff = Backoff(poll_min_ms / 1000, poll_max_ms / 1000)
+        # Paths the matcher process decodes at startup; None keeps matching in the sequence thread
+        pool_paths = [obj.get("image_path") for obj in self.objects.values() if obj.get("type") == "image"] if self.match_in_process.get() else None
+
+        # Decode every image object once up front; steps then never touch the disk
+        self.asset_writer.flush() # Fresh captures and project copies may still be on their way to disk
+        image_paths = {name: obj.get("image_path") for name, obj in self.objects.items() if obj.get("type") == "image"}
+        load_errors = self.template_cache.preload(image_paths.values())
+        for name, path in image_paths.items():
+            if path in load_errors: print(f"WARN: Image object '{name}' could not be loaded ({path}): {load_errors[path]}")
+        # Resolve objects, templates, colors and jump targets once; problems are reported before anything runs
+        steps = [{"action": s.get("action"), "object_name": s.get("object_name"), "params": dict(s.get("params", {}))} for s in self.current_steps]
+        plan = compile_sequence(steps, self.objects, self.template_cache, PREDEFINED_HOTKEYS)
+        if plan.errors:
+            for error in plan.errors: print(f"WARN: {error}")
+            shown = "\n".join(plan.errors[:15]) + (f"\n... and {len(plan.errors) - 15} more" if len(plan.errors) > 15 else "")
+            if not simpledialog.messagebox.askyesno("Sequence Problems", f"{shown}\n\nThese steps will be skipped. Run anyway?", parent=self.root): return
+        # Only the pixels the If Pixel Color steps read; nearby ones are captured together, so consecutive conditions share a grab
+        pixel_probe = PixelProbe(self.frame_source)
+        pixel_probe.register_objects(self.objects, plan.condition_pixels())
+
+        self.sequence_cancel.clear()
+        while not self.sequence_progress.empty(): self.sequence_progress.get_nowait() # Drop messages from an earlier run
+        minimize = self.minimize_while_running.get()
+        if minimize: self.root.iconify()
+        # The worker gets the compiled plan, so edits in the UI cannot change a running sequence
+        self.sequence_thread = threading.Thread(target=self._sequence_worker,
+                                                args=(plan, loops_to_run, pixel_probe, backoff, pool_paths, self.current_sequence_name, self.sequence_cancel, minimize),
+                                                daemon=True)
+        self.sequence_thread.start()
+        self.frames["MainFrame"].set_running(True)
+        self.root.after(SEQUENCE_PROGRESS_POLL_MS, self._poll_sequence_progress)
+
+    def stop_sequence(self):
+        # Interrupts the running sequence, including any wait it is in
+        if self.sequence_thread and self.sequence_thread.is_alive():
+            self.sequence_cancel.set()
+            print("--- Stopping sequence... ---")
+
+    def _sequence_sleep(self, seconds):
+        # time.sleep for the worker that returns as soon as the run is cancelled
+        if self.sequence_cancel.wait(seconds): raise SequenceCancelled()
+
+    def _post_progress(self, kind, **data):
+        self.sequence_progress.put((kind, data))
+
+    def _poll_sequence_progress(self):
+        # Drains the worker's progress messages on the Tk thread (scheduled with after())
+        main_frame = self.frames["MainFrame"]
+        finished = None
+        while True:
+            try: kind, data = self.sequence_progress.get_nowait()
+            except queue.Empty: break
+            if kind == "finished": finished = data["outcome"]
+            else: main_frame.show_progress(kind, data)
+        if finished is not None:
+            main_frame.set_running(False, finished)
+            if self.root.state() == "iconic": self.root.deiconify()
+            return
+        self.root.after(SEQUENCE_PROGRESS_POLL_MS, self._poll_sequence_progress)
 
-        self.root.iconify(); time.sleep(0.5)
+    def _sequence_worker(self, plan, loops_to_run, pixel_probe, backoff, pool_paths, sequence_name, cancel_event, minimized):
+        # Runs on the worker thread: never touches Tk widgets or variables, only posts progress messages
+        if minimized: cancel_event.wait(0.5) # Give the window time to minimize
         pyautogui.FAILSAFE = True
 
-        print(f"--- Running Sequence: {self.current_sequence_name} ---")
+        print(f"--- Running Sequence: {sequence_name} (image matcher: {MATCH_BACKEND} NCC) ---")
         is_infinite_loop = (loops_to_run == 0)
-        if is_infinite_loop: print("Looping indefinitely. Ctrl+C or Failsafe to stop.")
+        if is_infinite_loop: print("Looping indefinitely. Press Stop (or Failsafe) to stop.")
         else: print(f"Looping {loops_to_run} times.")
 
         current_loop_iter = 0
+        step_count = len(plan)
+        outcome = "completed"
+        matcher_pool = None
         try:
+            if pool_paths is not None:
+                matcher_pool = MatcherPool(pool_paths, processes=1) # Steps match one image at a time
+                print("Matching images in a worker process.")
             while True: # Outer loop for sequence repetitions
                 current_loop_iter += 1
                 if not is_infinite_loop and current_loop_iter > loops_to_run:
@@ -451,149 +591,37 @@ class DesktopAutomationApp:
                     print(f"Executing Loop {current_loop_iter}")
                 else:
                     print(f"Executing Loop {current_loop_iter}/{loops_to_run}")
+                self._post_progress("loop", loop=current_loop_iter, loops=loops_to_run)
 
-                program_counter = 0
-                while program_counter < len(self.current_steps): # Inner loop for steps
-                    step = self.current_steps[program_counter]
-                    print(f"  Step {program_counter + 1}/{len(self.current_steps)}: Action: {step['action']}, Object: {step.get('object_name', 'N/A')}, Params: {step.get('params', {})}")
+                run = SequenceRun(self._sequence_sleep, pixel_probe, self.frame_source, backoff,
+                                  on_wait=lambda step, result: self._post_progress("wait", index=step.index, found=result.found, elapsed_ms=result.elapsed * 1000),
+                                  matcher_pool=matcher_pool)
 
-                    obj_name = step.get("object_name"); action = step.get("action"); params = step.get("params", {})
-                    target_object = self.objects.get(obj_name) if obj_name else None
+                def on_step(step):
+                    print(f"  Step {step.index + 1}/{step_count}: {step.label}")
+                    self._post_progress("step", index=step.index, total=step_count, action=step.action, object_name=step.object_name)
 
-                    jump_to_pc = -1 # Use -1 to indicate no jump, otherwise set to target 0-based PC
+                def on_step_done(step, seconds): self._post_progress("step_done", index=step.index, elapsed_ms=seconds * 1000)
 
-                    try:
-                        image_path_to_use = None
-                        if target_object and target_object.get("type") == "image":
-                            image_path_to_use = target_object.get("image_path")
-                            if image_path_to_use and not os.path.exists(image_path_to_use):
-                                print(f"    ERROR: Image file missing for object '{obj_name}' at path: {image_path_to_use}")
-
-                        # --- LOGIC ACTIONS ---
-                        if action == "Goto Step":
-                            target_step_num = params.get("target_step")
-                            if isinstance(target_step_num, int) and 1 <= target_step_num <= len(self.current_steps):
-                                jump_to_pc = target_step_num - 1
-                            else: print(f"    WARN: Invalid target step for Goto: {target_step_num}.")
-
-                        elif action == "If Image Found":
-                            condition_obj_name = params.get("condition_object_name")
-                            condition_object = self.objects.get(condition_obj_name)
-                            then_step = params.get("then_step"); else_step = params.get("else_step")
-                            if condition_object and condition_object.get("type") == "image":
-                                cond_img_path = condition_object.get("image_path")
-                                confidence = params.get("confidence", condition_object.get("confidence", 0.8))
-                                if cond_img_path and os.path.exists(cond_img_path) and pyautogui.locateOnScreen(cond_img_path, confidence=confidence):
-                                    print(f"    IF: Image '{condition_obj_name}' FOUND.")
-                                    if isinstance(then_step, int) and 1 <= then_step <= len(self.current_steps):
-                                        jump_to_pc = then_step - 1
-                                    elif then_step is not None: print(f"    WARN: Invalid 'Then' step for If Image Found: {then_step}.")
-                                else: # Image NOT found
-                                    print(f"    IF: Image '{condition_obj_name}' NOT found.")
-                                    if isinstance(else_step, int) and 1 <= else_step <= len(self.current_steps):
-                                        jump_to_pc = else_step - 1
-                                    elif else_step is not None: print(f"    WARN: Invalid 'Else' step for If Image Found: {else_step}.")
-                            else: print(f"    WARN: Invalid condition object for 'If Image Found': {condition_obj_name}.")
-
-                        elif action == "If Pixel Color":
-                            condition_obj_name = params.get("condition_object_name")
-                            condition_object = self.objects.get(condition_obj_name)
-                            expected_rgb_param = params.get("expected_rgb")
-                            expected_rgb = tuple(expected_rgb_param) if isinstance(expected_rgb_param, list) else (expected_rgb_param if isinstance(expected_rgb_param, tuple) else (condition_object.get("rgb") if condition_object else None))
-                            then_step = params.get("then_step"); else_step = params.get("else_step")
-                            if condition_object and condition_object.get("type") == "pixel" and expected_rgb:
-                                px, py = condition_object["coords"]
-                                current_rgb = pyautogui.pixel(px,py)
-                                if current_rgb == expected_rgb:
-                                    print(f"    IF: Pixel '{condition_obj_name}' color MATCHED.")
-                                    if isinstance(then_step, int) and 1 <= then_step <= len(self.current_steps):
-                                        jump_to_pc = then_step - 1
-                                    elif then_step is not None: print(f"    WARN: Invalid 'Then' step for If Pixel Color: {then_step}.")
-                                else: # Pixel color NOT matched
-                                    print(f"    IF: Pixel '{condition_obj_name}' color ({current_rgb}) did NOT match {expected_rgb}.")
-                                    if isinstance(else_step, int) and 1 <= else_step <= len(self.current_steps):
-                                        jump_to_pc = else_step - 1
-                                    elif else_step is not None: print(f"    WARN: Invalid 'Else' step for If Pixel Color: {else_step}.")
-                            else: print(f"    WARN: Invalid condition object/RGB for 'If Pixel Color'. Expected RGB was {expected_rgb}")
-
-                        # --- STANDARD ACTIONS (Only if no logic jump will occur from this step) ---
-                        if jump_to_pc == -1 : # No jump determined by a logic action yet
-                            if target_object: # Object-based actions
-                                obj_type = target_object.get("type"); obj_coords = target_object.get("coords")
-                                if action == "Click":
-                                    button_type = params.get("button", "left"); num_clicks = params.get("clicks", 1)
-                                    interval_s = params.get("interval", 0.1 if num_clicks > 1 else 0.0)
-                                    click_x, click_y = None, None
-                                    if obj_type == "region" and obj_coords: click_x, click_y = obj_coords[0]+obj_coords[2]/2, obj_coords[1]+obj_coords[3]/2
-                                    elif obj_type == "pixel" and obj_coords: click_x, click_y = obj_coords[0], obj_coords[1]
-                                    elif obj_type == "image" and image_path_to_use:
-                                        loc = pyautogui.locateCenterOnScreen(image_path_to_use, confidence=params.get("confidence", target_object.get("confidence",0.8)))
-                                        if loc: click_x, click_y = loc
-                                        else: print(f"    WARN: Image '{obj_name}' not found for click.")
-                                    else: print(f"    WARN: Cannot Click obj '{obj_name}' type '{obj_type}'.")
-                                    if click_x is not None: pyautogui.click(x=click_x,y=click_y,clicks=num_clicks,interval=interval_s,button=button_type); print(f"    Clicked {button_type} {num_clicks}x at ({click_x:.0f},{click_y:.0f})")
-                                    else: print(f"    WARN: Click coords not determined for {obj_name}.")
-                                elif action == "Wait for Image" and obj_type == "image" and image_path_to_use:
-                                    start_time = time.time(); timeout = params.get("timeout_s", 10); found = False
-                                    while time.time() - start_time < timeout:
-                                        if pyautogui.locateOnScreen(image_path_to_use, confidence=params.get("confidence", target_object.get("confidence",0.8))):
-                                            print(f"    Image '{obj_name}' found."); found = True; break
-                                        time.sleep(0.25)
-                                    if not found: print(f"    TIMEOUT: Image '{obj_name}' not found after {timeout}s.")
-                                elif action == "Wait for Pixel Color" and obj_type == "pixel":
-                                    expected_rgb_wfp = params.get("expected_rgb")
-                                    expected_rgb_wfp = tuple(expected_rgb_wfp) if isinstance(expected_rgb_wfp, list) else (expected_rgb_wfp if isinstance(expected_rgb_wfp, tuple) else target_object.get("rgb"))
-                                    if not expected_rgb_wfp: print(f"    ERROR: No RGB for pixel '{obj_name}'.")
-                                    else:
-                                        timeout = params.get("timeout_s",10); start_time=time.time(); found_color=False
-                                        while time.time()-start_time < timeout:
-                                            current_rgb = pyautogui.pixel(obj_coords[0],obj_coords[1])
-                                            if current_rgb == expected_rgb_wfp: print(f"    Pixel color matched."); found_color=True; break
-                                            time.sleep(0.25)
-                                        if not found_color: print(f"    TIMEOUT: Pixel color not matched. Last: {current_rgb}")
-                            # Global actions
-                            if action == "Wait":
-                                duration = params.get("duration_s", 1.0); min_dur = params.get("min_s"); max_dur = params.get("max_s")
-                                if min_dur is not None and max_dur is not None: wait_time=random.uniform(min_dur,max_dur); print(f"    Random Wait: {wait_time:.2f}s"); time.sleep(wait_time)
-                                else: print(f"    Static Wait: {duration}s"); time.sleep(duration)
-                            elif action == "Keyboard Input":
-                                text_to_type = params.get("text_to_type", "")
-                                if text_to_type: pyautogui.typewrite(text_to_type, interval=params.get("interval", 0.01)); print(f"    Typed: '{text_to_type}'")
-                                else: print(f"    WARN: No text specified for Keyboard Input.")
-                            elif action == "Press Key":
-                                key_to_press = params.get("key_to_press")
-                                if key_to_press: pyautogui.press(key_to_press); print(f"    Pressed Key: '{key_to_press}'")
-                                else: print(f"    WARN: No key specified for Press Key.")
-                            elif action == "Hotkey Combo":
-                                selected_hotkey_name = params.get("selected_hotkey_name")
-                                if selected_hotkey_name and selected_hotkey_name in PREDEFINED_HOTKEYS:
-                                    keys_to_press = PREDEFINED_HOTKEYS[selected_hotkey_name]
-                                    pyautogui.hotkey(*keys_to_press); print(f"    Executed Hotkey Combo: {selected_hotkey_name} ({keys_to_press})")
-                                else: print(f"    WARN: Invalid or no hotkey selected: '{selected_hotkey_name}'")
-                            elif action == "Scroll":
-                                direction=params.get("direction","down"); amount=params.get("amount",10)
-                                scroll_x=params.get("x"); scroll_y=params.get("y")
-                                scroll_val = -amount if direction in ["down","left"] else amount
-                                if direction in ["up","down"]: pyautogui.scroll(scroll_val,x=scroll_x,y=scroll_y)
-                                elif direction in ["left","right"]: pyautogui.hscroll(scroll_val,x=scroll_x,y=scroll_y)
-                                print(f"    Scrolled {direction} by {abs(amount)}" + (f" at ({scroll_x},{scroll_y})" if scroll_x is not None else ""))
-
-                    except pyautogui.FailSafeException: print("!!! FAILSAFE TRIGGERED !!!"); self.root.deiconify(); return
-                    except Exception as e:
-                        import traceback
-                        print(f"    ERROR executing step {program_counter + 1} ({action} on {obj_name}): {e}")
-                        traceback.print_exc() # More detailed error for debugging
-
-                    if jump_to_pc != -1:
-                        program_counter = jump_to_pc # Execute the jump
-                    else:
-                        program_counter += 1 # No jump, normal increment
-                # End of inner while (steps loop)
+                def on_error(step, e):
+                    import traceback
+                    print(f"    ERROR executing step {step.index + 1} ({step.action} on {step.object_name}): {e}")
+                    traceback.print_exc() # More detailed error for debugging
+                    self._post_progress("error", index=step.index, message=f"{step.action} on {step.object_name}: {e}")
+
+                # Inner loop for steps: shared with benchmark_watchers.py, which times it headless
+                try: run_pass(plan, run, cancel_event.is_set, on_step, on_step_done, on_error)
+                except pyautogui.FailSafeException: print("!!! FAILSAFE TRIGGERED !!!"); outcome = "failsafe"; return
             # End of outer while (sequence repetitions loop)
-        except KeyboardInterrupt: print("\n--- Execution Interrupted by User (Ctrl+C) ---")
+        except SequenceCancelled: print("\n--- Execution Cancelled ---"); outcome = "cancelled"
+        except Exception as e:
+            print(f"\n--- Sequence aborted: {e} ---"); outcome = "error"
         finally:
-            self.root.deiconify()
-            print(f"--- Sequence Finished: {self.current_sequence_name} ---")
+            if matcher_pool is not None:
+                print(matcher_pool.summary().capitalize())
+                matcher_pool.close()
+            print(f"--- Sequence Finished: {sequence_name} ({outcome}) ---")
+            self._post_progress("finished", outcome=outcome) # The UI thread restores the window
 
 
 # --- UI Frame Classes ---
@@ -629,8 +657,59 @@ class MainFrame(BaseFrame):
         loop_frame = tk.Frame(self,bg=self["bg"]); loop_frame.pack(pady=8,padx=20,fill="x")
         tk.Label(loop_frame,text="Loops (0=inf):",bg=self["bg"]).pack(side=tk.LEFT)
         tk.Entry(loop_frame,textvariable=controller.loop_count,width=5,justify="center").pack(side=tk.LEFT,padx=5)
-
-        tk.Button(self,text="Run Sequence",width=20,font=("Arial",12,"bold"),bg="#A5D6A7",command=controller.run_sequence).pack(pady=15,padx=20,fill="x")
+        tk.Label(loop_frame,text="Capture:",bg=self["bg"]).pack(side=tk.LEFT,padx=(10,0))
+        self.source_combo = source_combo = ttk.Combobox(loop_frame,textvariable=controller.frame_source_name,values=[n for n in ("pyautogui","mss","replay") if n in available_frame_sources()],width=10,state="readonly")
+        source_combo.pack(side=tk.LEFT,padx=5)
+        source_combo.bind("<<ComboboxSelected>>",lambda e: controller.set_frame_source(controller.frame_source_name.get()))
+
+        self.run_button = tk.Button(self,text="Run Sequence",width=20,font=("Arial",12,"bold"),bg="#A5D6A7",command=self.toggle_run)
+        self.run_button.pack(pady=(15,3),padx=20,fill="x")
+        tk.Checkbutton(self,text="Minimize while running",variable=controller.minimize_while_running,bg=self["bg"]).pack()
+        tk.Checkbutton(self,text="Match images in a worker process",variable=controller.match_in_process,bg=self["bg"]).pack()
+        poll_frame = tk.Frame(self,bg=self["bg"]); poll_frame.pack(padx=20)
+        tk.Label(poll_frame,text="Wait polling (ms): fast",bg=self["bg"]).pack(side=tk.LEFT)
+        tk.Entry(poll_frame,textvariable=controller.wait_poll_min_ms,width=5,justify="center").pack(side=tk.LEFT,padx=3)
+        tk.Label(poll_frame,text="slow",bg=self["bg"]).pack(side=tk.LEFT)
+        tk.Entry(poll_frame,textvariable=controller.wait_poll_max_ms,width=5,justify="center").pack(side=tk.LEFT,padx=3)
+        self.progress_label = tk.Label(self,text="Idle",bg="white",relief=tk.SUNKEN,anchor="w"); self.progress_label.pack(pady=(5,0),padx=20,fill="x")
+        self.error_label = tk.Label(self,text="",fg="red",bg=self["bg"],anchor="w",wraplength=450,justify=tk.LEFT); self.error_label.pack(padx=20,fill="x")
+        self.loop_text = ""; self.step_text = ""; self.step_ms = None; self.wait_text = ""
+
+    def toggle_run(self):
+        if self.controller.sequence_thread and self.controller.sequence_thread.is_alive(): self.controller.stop_sequence()
+        else: self.controller.run_sequence()
+
+    def set_running(self, running, outcome=None):
+        if running:
+            self.run_button.config(text="Stop Sequence",bg="#FFBBAA")
+            self.source_combo.config(state="disabled") # The worker keeps using the source it started with
+            self.loop_text = ""; self.step_text = "Starting..."; self.step_ms = None; self.wait_text = ""
+            self.error_label.config(text="")
+        else:
+            self.run_button.config(text="Run Sequence",bg="#A5D6A7")
+            self.source_combo.config(state="readonly")
+            self.step_text = f"Finished ({outcome})"; self.loop_text = ""; self.step_ms = None
+        self._update_progress_label()
+
+    def show_progress(self, kind, data):
+        # Called on the Tk thread for each message from the sequence worker
+        if kind == "loop":
+            self.loop_text = f"Loop {data['loop']}" + (f"/{data['loops']}" if data["loops"] else "")
+        elif kind == "step":
+            self.step_text = f"Step {data['index']+1}/{data['total']}: {data['action']}" + (f" '{data['object_name']}'" if data["object_name"] else "")
+        elif kind == "step_done":
+            self.step_ms = data["elapsed_ms"]
+        elif kind == "wait":
+            self.wait_text = f"wait {'met' if data['found'] else 'timed out'} after {data['elapsed_ms']:.0f} ms"
+        elif kind == "error":
+            self.error_label.config(text=f"Step {data['index']+1} failed: {data['message']}")
+        self._update_progress_label()
+
+    def _update_progress_label(self):
+        parts = [p for p in (self.loop_text, self.step_text) if p]
+        if self.step_ms is not None: parts.append(f"last step {self.step_ms:.0f} ms")
+        if self.wait_text: parts.append(self.wait_text)
+        self.progress_label.config(text=" | ".join(parts) if parts else "Idle")
 
     def refresh_content(self):
         if self.controller.current_sequence_name == DEFAULT_PROJECT_NAME and not self.controller.current_project_path:
@@ -656,12 +735,21 @@ class ObjectCreationFrame(BaseFrame): # Mostly unchanged, ensure add_object call
         image_frame = tk.LabelFrame(self,text="Image Creation",padx=10,pady=10,bg=self["bg"]); image_frame.pack(pady=5,padx=10,fill="x")
         tk.Button(image_frame,text="Grid Mode (Capture)",command=lambda:self.set_creation_type_and_run("image",controller.create_region_grid_mode)).pack(pady=3,fill="x")
         tk.Button(image_frame,text="Drag Mode (Capture)",command=lambda:self.set_creation_type_and_run("image",controller.create_region_drag_mode)).pack(pady=3,fill="x")
+        tk.Button(image_frame,text="Image Search Settings...",command=self.edit_image_search_settings).pack(pady=3,fill="x")
         sound_frame = tk.LabelFrame(self,text="Sound Creation (Future)",padx=10,pady=10,bg=self["bg"]); sound_frame.pack(pady=5,padx=10,fill="x")
         tk.Button(sound_frame,text="Sound Recording",state=tk.DISABLED).pack(pady=3,fill="x")
         self.objects_list_frame=tk.LabelFrame(self,text="Created Objects",padx=10,pady=10,bg=self["bg"]); self.objects_list_frame.pack(pady=5,padx=10,fill="both",expand=True)
         self.objects_text=scrolledtext.ScrolledText(self.objects_list_frame,height=4,wrap=tk.WORD,state=tk.DISABLED); self.objects_text.pack(fill="both",expand=True)
         tk.Button(self,text="Back to Main Menu",command=lambda:controller.show_frame("MainFrame")).pack(pady=10,side=tk.BOTTOM)
     def set_creation_type_and_run(self,c_type,func_to_run): self.current_creation_type=c_type; func_to_run()
+    def edit_image_search_settings(self):
+        image_names = self.controller.get_object_names(object_type="image")
+        if not image_names: simpledialog.messagebox.showinfo("Image Search Settings","No image objects yet.",parent=self); return
+        dialog = ImageMatchSettingsDialog(self,"Image Search Settings",objects=self.controller.objects,image_names=image_names)
+        if dialog.result is None: return
+        obj_data = self.controller.objects[dialog.result.pop("object_name")]
+        if any(obj_data.get(k) != v for k,v in dialog.result.items()):
+            obj_data.update(dialog.result); self.controller.mark_sequence_modified(); self.update_objects_display()
     def update_objects_display(self):
         self.objects_text.config(state=tk.NORMAL); self.objects_text.delete(1.0,tk.END)
         if not self.controller.objects: self.objects_text.insert(tk.END,"No objects created yet.")
@@ -671,6 +759,7 @@ class ObjectCreationFrame(BaseFrame): # Mostly unchanged, ensure add_object call
                 if obj_type=="region" or obj_type=="image": details=f"Coords: {data.get('coords')}"
                 if obj_type=="image" and data.get('image_path'): details+=f", Path: {os.path.basename(data['image_path'])}"
                 elif obj_type=="pixel": details=f"Coords: {data.get('coords')}, RGB: {data.get('rgb')}"
+                if obj_type=="image": details+=f", Search: {describe_search(data)}, Match: {match_mode_for(data).capitalize()}/{match_strategy_for(data)}"
                 self.objects_text.insert(tk.END,f"- {name} ({obj_type.capitalize()}): {details}\n")
         self.objects_text.config(state=tk.DISABLED)
     def refresh_content(self): self.update_objects_display()
@@ -1106,7 +1195,11 @@ Welcome to the Python Desktop Automation Tool!
      - **Load Sequence**: Loads a previously saved sequence (.json file and associated images).
      - **Save Sequence As...**: Saves the current sequence to a new project folder.
    - **Loops**: Set how many times the entire sequence should run (0 for infinite).
-   - **Run Sequence**: Executes the currently defined steps.
+   - **Capture**: Where image and pixel steps read the screen from. 'pyautogui' is the default, 'mss' is a faster grabber (pip install mss), 'replay' reads a folder of recorded frames instead of the live screen.
+   - **Run Sequence**: Executes the currently defined steps in the background; the window stays responsive. Before it starts, every step is checked (missing objects or images, invalid jump targets, missing colors or keys) and any problems are listed so you can fix them or run anyway; problem steps are skipped. The button turns into **Stop Sequence**, which stops immediately, even in the middle of a wait. The line below it shows the current loop, step and how long the last step took; step errors appear in red.
+   - **Minimize while running**: Minimizes the window during a run (restore it from the taskbar to watch progress or press Stop).
+   - **Match images in a worker process**: Image steps are matched in a separate process that decodes every image object once when the run starts; the screenshot is handed over through shared memory. Keeps heavy full-screen matching from competing with the rest of the program for the Python interpreter.
+   - **Wait polling (ms)**: How often "Wait for Image" / "Wait for Pixel Color" look at the screen. They poll at the fast interval right after the watched area changes and slow down towards the slow interval while it stays the same; the image or color is only checked again when the area's pixels actually changed. Each wait prints (and shows) how long it took to notice the condition.
 
 **3. Object Creation Menu:**
    - Name all objects uniquely.
@@ -1115,7 +1208,10 @@ Welcome to the Python Desktop Automation Tool!
      - Drag Mode: Click-drag a rectangle on screen, name it.
      - Pixel Monitor: Click "Pixel Monitor", then "Capture Pixel...", move mouse to target, click. Name it.
    - **Image Creation**:
-     - Grid/Drag Mode (Capture): Similar to region, but captures as an image file. Images are saved within the project folder when the sequence is saved.
+     - Grid/Drag Mode (Capture): Similar to region, but captures as an image file. The screen is frozen when the mode opens and the image is cut from that frozen screen, so it shows exactly what was there at that moment. Images are saved in the project's 'assets' folder when the sequence is saved, named by a hash of their pixels: capturing the same image twice keeps one file, which is also decoded and loaded only once during a run.
+     - Image Search Settings: Choose where on screen an image object is looked for - the full screen, the exact spot it was captured (Fixed ROI), or that spot plus a margin in pixels. New captures default to the spot plus 20px; searching a small area is much faster than the full screen.
+       The match mode is 'Fuzzy' (confidence threshold) or 'Exact', which first looks for a pixel-identical copy (fast for toolbar buttons and other UI drawn exactly as captured) and falls back to fuzzy matching.
+       The strategy is 'dense' (score every position), 'sparse' (reject most positions from a few sample pixels first) or 'pyramid' (find candidates on a downscaled screen, then refine at full size - fastest for full-screen searches).
    - **Created Objects List**: Shows currently defined objects.
 
 **4. Step Creator Menu:**
@@ -1148,7 +1244,7 @@ Welcome to the Python Desktop Automation Tool!
 
 **5. Running & Saving:**
    - Set loop count in Main Menu, then "Run Sequence".
-   - Failsafe: Move mouse to top-left screen corner to abort PyAutoGUI. Ctrl+C in terminal also stops.
+   - Stop: Press "Stop Sequence" in the Main Menu. Failsafe: Move mouse to top-left screen corner to abort PyAutoGUI.
    - An asterisk (*) in the window title (e.g., "StepCreatorFrame*") indicates unsaved changes.
 
 **Tips:**
@@ -1358,6 +1454,48 @@ class ImageWaitParamsDialog(BaseParamsDialog): # As previously defined
     def apply(self): self.result={"confidence":float(self.confidence_var.get()),"timeout_s":float(self.timeout_var.get())}
 
 
+class ImageMatchSettingsDialog(BaseParamsDialog):
+    def __init__(self, parent, title, existing_params=None, objects=None, image_names=None):
+        self.objects = objects or {}
+        self.image_names = image_names or []
+        super().__init__(parent, title, existing_params)
+    def body(self, master):
+        tk.Label(master,text="Image object:").grid(row=0,column=0,sticky="w",padx=5,pady=2)
+        self.object_var=tk.StringVar(value=self.image_names[0])
+        self.object_combo=ttk.Combobox(master,textvariable=self.object_var,values=self.image_names,state="readonly",width=18)
+        self.object_combo.grid(row=0,column=1,sticky="w",padx=5,pady=2)
+        tk.Label(master,text="Search area:").grid(row=1,column=0,sticky="w",padx=5,pady=2)
+        self.mode_var=tk.StringVar()
+        ttk.Combobox(master,textvariable=self.mode_var,values=[SEARCH_MODE_LABELS[m] for m in SEARCH_MODES],state="readonly",width=15).grid(row=1,column=1,sticky="w",padx=5,pady=2)
+        tk.Label(master,text="Margin (px):").grid(row=2,column=0,sticky="w",padx=5,pady=2)
+        self.margin_var=tk.StringVar()
+        tk.Entry(master,textvariable=self.margin_var,width=6).grid(row=2,column=1,sticky="w",padx=5,pady=2)
+        tk.Label(master,text="Match mode:").grid(row=3,column=0,sticky="w",padx=5,pady=2)
+        self.match_var=tk.StringVar()
+        ttk.Combobox(master,textvariable=self.match_var,values=[MATCH_MODE_LABELS[m] for m in MATCH_MODES],state="readonly",width=20).grid(row=3,column=1,sticky="w",padx=5,pady=2)
+        tk.Label(master,text="Strategy:").grid(row=4,column=0,sticky="w",padx=5,pady=2)
+        self.strategy_var=tk.StringVar()
+        ttk.Combobox(master,textvariable=self.strategy_var,values=[MATCH_STRATEGY_LABELS[s] for s in MATCH_STRATEGIES],state="readonly",width=26).grid(row=4,column=1,sticky="w",padx=5,pady=2)
+        self.object_var.trace_add("write",self.load_object_settings); self.load_object_settings()
+        return self.object_combo
+    def load_object_settings(self, *args):
+        obj_data=self.objects.get(self.object_var.get(),{})
+        self.mode_var.set(SEARCH_MODE_LABELS[obj_data.get("search_mode","full")])
+        self.margin_var.set(str(obj_data.get("search_margin",DEFAULT_SEARCH_MARGIN)))
+        self.match_var.set(MATCH_MODE_LABELS[match_mode_for(obj_data)])
+        self.strategy_var.set(MATCH_STRATEGY_LABELS[match_strategy_for(obj_data)])
+    def validate(self):
+        try:
+            if int(self.margin_var.get())<0: raise ValueError("Margin must be 0 or more pixels.")
+            return 1
+        except ValueError as e: simpledialog.messagebox.showerror("Invalid Input",str(e),parent=self); return 0
+    def apply(self):
+        mode=next(m for m in SEARCH_MODES if SEARCH_MODE_LABELS[m]==self.mode_var.get())
+        match_mode=next(m for m in MATCH_MODES if MATCH_MODE_LABELS[m]==self.match_var.get())
+        strategy=next(s for s in MATCH_STRATEGIES if MATCH_STRATEGY_LABELS[s]==self.strategy_var.get())
+        self.result={"object_name":self.object_var.get(),"search_mode":mode,"search_margin":int(self.margin_var.get()),"match_mode":match_mode,"match_strategy":strategy}
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
     app_root = tk.Tk()
@@ -1369,4 +1507,5 @@ if __name__ == "__main__":
     app_instance = DesktopAutomationApp(app_root)
     if hasattr(app_instance.frames["StepCreatorFrame"], 'finalize_steps_for_controller'):
         app_instance.frames["StepCreatorFrame"].finalize_steps_for_controller()
-    app_root.mainloop()
\ No newline at end of file
+    app_root.mainloop()
+    app_instance.asset_writer.close() # Finish image writes still queued when the window closed
\ No newline at end of file
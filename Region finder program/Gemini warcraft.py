@@ -5,9 +5,27 @@ import time
 import threading
 import json
 import os
-import shutil
 import uuid # For unique listener IDs
 from PIL import Image, ImageTk, ImageGrab
+from frame_sources import create_frame_source, available_frame_sources
+from matching import (SEARCH_MODES, SEARCH_MODE_LABELS, DEFAULT_SEARCH_MODE, DEFAULT_SEARCH_MARGIN,
+                      MATCH_MODES, MATCH_MODE_LABELS, DEFAULT_MATCH_MODE, MATCH_STRATEGIES, MATCH_STRATEGY_LABELS,
+                      DEFAULT_LISTENER_STRATEGY, PREFILTER_STATS,
+                      search_region_for, match_mode_for, match_strategy_for, describe_search,
+                      measure_prefilter, MATCH_BACKEND)
+from template_cache import TemplateCache
+from tracking import LocationTracker
+from frame_diff import FrameDiff
+from matcher_pool import MatcherPool, default_process_count
+from scheduler import (ListenerScheduler, PRIORITY_LEVELS, PRIORITY_LABELS, CYCLE_BUDGET_MS, DEFAULT_SCAN_EVERY_MS,
+                       DEFAULT_COOLDOWN_S, priority_for, describe_schedule)
+from governor import ScanGovernor, GOVERNOR_TARGET_LATENCY_MS, GOVERNOR_MAX_CPU_PERCENT
+from instrumentation import WatchMetrics, METRICS_REFRESH_MS
+from recording import FrameRecorder, RecordingFrameSource, FrameRecording, replay_recording
+from frozen_capture import FrozenScreen, freeze_after_hiding
+from asset_writer import AssetWriter, describe_finished
+from asset_store import AssetStore, project_asset_path, scratch_store_dir
+from watchers import ListenerWatch, new_watch_stats
 
 # Attempt to import the keyboard library for global hotkeys
 try:
@@ -23,6 +41,7 @@ except ImportError:
 # --- Global Variables & Constants ---
 DEFAULT_PROFILE_NAME = "UntitledProfile"
 CAPTURE_HOTKEY_STORAGE = "capture_hotkey.json" # To store the preferred hotkey
+RECORDINGS_DIR = "recordings" # Frame recordings go here, inside the profile folder (or the working directory)
 
 # --- Helper Functions ---
 def get_screen_center_for_window(window_width, window_height, root):
@@ -41,7 +60,7 @@ class WoWAutomationApp:
         self.root.geometry(f"700x500+{x}+{y}")
 
         self.listeners = []  # List of listener dicts
-        self.current_project_path = None # Path to the folder where the .json and images/ are
+        self.current_project_path = None # Path to the folder where the .json and assets/ are
         self.current_profile_name = DEFAULT_PROFILE_NAME
         self.profile_modified = False
 
@@ -50,7 +69,25 @@ class WoWAutomationApp:
 
         self.watcher_thread = None
         self.watcher_active = threading.Event() # False by default
-        self.scan_interval = 0.2 # Seconds between full screen scans if no icon found
+        self.target_latency_ms = tk.IntVar(value=GOVERNOR_TARGET_LATENCY_MS) # How quickly an icon should be noticed
+        self.max_cpu_percent = tk.IntVar(value=GOVERNOR_MAX_CPU_PERCENT) # Share of one core the scan cycles may use
+        self.scan_governor = ScanGovernor() # Picks the pause between scans from the measured cycle cost and the two limits above
+        self.capture_once_per_cycle = tk.BooleanVar(value=True) # Grab one frame per cycle and match every listener against it
+        self.cycle_stats_every = 50 # Print averaged cycle timings every N watch cycles
+        self.matcher_processes = tk.IntVar(value=0) # Worker processes matching listeners in parallel (0 = match in the watcher thread)
+        self.cycle_budget_ms = tk.IntVar(value=CYCLE_BUDGET_MS) # Matching time per cycle before lower priority listeners wait a cycle
+        self.listener_scheduler = ListenerScheduler() # Which listeners each cycle checks (scan rates, cooldowns, budget)
+        self.frame_source = create_frame_source("pyautogui") # Where watch cycles get their screen frames from
+        self.frame_source_name = tk.StringVar(value=self.frame_source.name)
+        self.record_frames = tk.BooleanVar(value=False) # Record every watched frame and key press for offline replay
+        self.watch_source = self.frame_source # frame_source, wrapped in a RecordingFrameSource while recording
+        self.frame_recorder = None
+        self.replay_thread = None
+        self.template_cache = TemplateCache() # Listener icons decoded once, shared by every watch cycle
+        self.location_tracker = LocationTracker() # Where each listener's icon was last seen
+        self.frame_diff = FrameDiff() # Tiles changed between cycle frames; listeners over unchanged tiles skip matching
+        self.watch_metrics = WatchMetrics() # Per-listener match cost, hits, press latency and score histograms of the last watch session
+        self.asset_writer = AssetWriter(self.root, self._on_assets_written) # Icon PNGs and profile image copies are written off the Tk thread
 
         self.drag_select_window = None
         self.drag_start_x = None
@@ -117,21 +154,39 @@ class WoWAutomationApp:
         if self.drag_select_window and self.drag_select_window.winfo_exists():
              print("Capture already in progress.")
              return
-        self.root.after(0, self.start_icon_capture_drag_mode) # Schedule GUI update in main thread
+        try:
+            frozen = FrozenScreen.take(self.frame_source) # The screen as it is the instant the hotkey is pressed
+        except Exception as e:
+            frozen = None # Retried on the main thread, after hiding the window if it is showing
+            print(f"Could not capture screen: {e}")
+        self.root.after(0, lambda: self.begin_icon_capture(frozen)) # Schedule GUI update in main thread
 
-    def start_icon_capture_drag_mode(self):
+    def begin_icon_capture(self, frozen):
+        # The instant snapshot is only usable while our window is off screen; a visible Listener Manager would be
+        # in it, so the window is hidden first and the screen frozen once it is gone
+        if self.drag_select_window and self.drag_select_window.winfo_exists():
+            return # Already active
+        if frozen is not None and self.root.state() in ('iconic', 'withdrawn'):
+            self.start_icon_capture_drag_mode(frozen)
+            return
+        freeze_after_hiding(self.root, self.frame_source, self.start_icon_capture_drag_mode, self._on_capture_freeze_error)
+
+    def _on_capture_freeze_error(self, error):
+        simpledialog.messagebox.showerror("Capture Error", f"Could not capture screenshot: {error}", parent=self.root)
+
+    def start_icon_capture_drag_mode(self, frozen):
         if self.drag_select_window and self.drag_select_window.winfo_exists():
             return # Already active
         
-        self.root.withdraw() # Hide main window briefly
-        time.sleep(0.2) # Give screen time to settle if WoW was fullscreen
+        self.root.withdraw() # Hide main window while selecting
 
+        # The selection is drawn over the frozen screen, not the live one, and cropped from it on release
         self.drag_select_window = tk.Toplevel(self.root)
         self.drag_select_window.attributes('-fullscreen', True)
-        self.drag_select_window.attributes('-alpha', 0.3)
         self.drag_select_window.attributes('-topmost', True)
-        drag_canvas = tk.Canvas(self.drag_select_window, bg="gray", cursor="crosshair", highlightthickness=0)
+        drag_canvas = tk.Canvas(self.drag_select_window, bg="black", cursor="crosshair", highlightthickness=0)
         drag_canvas.pack(fill="both", expand=True)
+        frozen.show_on(drag_canvas)
         
         status_label_text = "Click & drag to select icon. Release to confirm. ESC to cancel."
         try: # Try to get screen dimensions for better label placement
@@ -171,12 +226,9 @@ class WoWAutomationApp:
 
             capture_coords = (int(x1), int(y1), int(x2 - x1), int(y2 - y1))
             
-            # Capture the image (main window is already hidden)
+            # Cut the icon out of the frozen screen; nothing on screen is captured after the hotkey
             try:
-                # No need to hide/deiconify root here as it was done before creating drag_select_window
-                # However, ensure drag_select_window is truly gone before screenshot
-                time.sleep(0.1) # Short delay to ensure transparent window is gone
-                img = pyautogui.screenshot(region=capture_coords)
+                img = frozen.crop(capture_coords)
             except Exception as e:
                 simpledialog.messagebox.showerror("Capture Error", f"Could not capture screenshot: {e}", parent=self.root)
                 self.root.deiconify()
@@ -223,44 +275,29 @@ class WoWAutomationApp:
         if max_seq_presses is None: max_seq_presses = 3
 
 
-        # Generate image filename
-        base_img_filename = f"{listener_name.replace(' ', '_').replace('.', '_')}_{uuid.uuid4().hex[:8]}.png"
-        
-        # Determine image save path
-        abs_image_path = ""
-        relative_image_path_for_json = ""
-
-        if self.current_project_path:
-            images_dir = os.path.join(self.current_project_path, "images")
-            os.makedirs(images_dir, exist_ok=True)
-            abs_image_path = os.path.join(images_dir, base_img_filename)
-            relative_image_path_for_json = os.path.join("images", base_img_filename)
-        else:
-            # No project loaded/saved, save to a temporary spot or current dir
-            # For simplicity, let's enforce saving the profile first or handle it more robustly.
-            # For now, save to current working directory and warn
-            images_dir = os.path.join(os.getcwd(), "images_temp") # Or just os.getcwd()
-            os.makedirs(images_dir, exist_ok=True) # Ensure it exists
-            abs_image_path = os.path.join(images_dir, base_img_filename)
-            relative_image_path_for_json = abs_image_path # Store absolute path if no project
+        # Images are stored by pixel hash: capturing the same icon again reuses its file and decoded template
+        # No project loaded/saved: it goes to the scratch store in the current directory until the profile is saved
+        asset_store = AssetStore.for_capture(self.current_project_path, self.asset_writer)
+        image_hash, abs_image_path = asset_store.add_image(image_obj, label=listener_name) # Encoded and written in the background
+        self.template_cache.put(abs_image_path, image_obj) # Matchable before the file is on disk
+        if not self.current_project_path:
             simpledialog.messagebox.showwarning("No Profile Loaded",
                                                 f"Image saved to: {abs_image_path}\n"
-                                                "This path will be relative to the profile file once you 'Save Profile As...'.",
+                                                "It is copied into the profile's folder once you 'Save Profile As...'.",
                                                 parent=self.root)
-        try:
-            image_obj.save(abs_image_path)
-        except Exception as e:
-            simpledialog.messagebox.showerror("Image Save Error", f"Could not save image: {e}", parent=self.root)
-            return
 
         new_listener = {
             "id": uuid.uuid4().hex,
             "name": listener_name,
-            "image_filename": base_img_filename, # Store filename, full path constructed at runtime
+            "image_hash": image_hash, # Names the image in the project's asset store, full path constructed at runtime
             "keybind_raw": keybind_raw.lower(),
             "active": True,
             "confidence": confidence,
             "capture_coords": capture_coords,
+            "search_mode": DEFAULT_SEARCH_MODE, # Icons rarely move: search around where it was captured
+            "search_margin": DEFAULT_SEARCH_MARGIN,
+            "match_mode": DEFAULT_MATCH_MODE,
+            "match_strategy": DEFAULT_LISTENER_STRATEGY,
             "post_press_delay": post_press_delay,
             "max_sequential_presses": max_seq_presses,
             "_image_abs_path_temp": abs_image_path if not self.current_project_path else None # Store temp abs path
@@ -269,6 +306,14 @@ class WoWAutomationApp:
         self.frames[ListenerManagerFrame.__name__].refresh_listeners_list()
         self.mark_profile_modified()
 
+    def _on_assets_written(self, jobs):
+        # Completion report from the asset writer, on the Tk thread
+        line, failures = describe_finished(jobs)
+        if line: print(line)
+        if failures:
+            details = "\n".join(f"{label}: {error}" for label, error in failures)
+            simpledialog.messagebox.showerror("Image Save Error", f"Could not write these images:\n{details}", parent=self.root)
+
     def _check_unsaved_changes(self):
         if self.profile_modified:
             response = simpledialog.messagebox.askyesnocancel("Unsaved Changes",
@@ -292,49 +337,40 @@ class WoWAutomationApp:
         self.mark_profile_modified(False)
         print("New profile created.")
 
-    def save_profile(self):
+    def save_profile(self, images_from=None):
+        # images_from: project folder the listeners' images are in now, when it differs from the one being saved to
         if not self.current_project_path:
             return self.save_profile_as()
         else:
             profile_filename = os.path.join(self.current_project_path, f"{self.current_profile_name}.json")
-            project_images_dir = os.path.join(self.current_project_path, "images")
-            os.makedirs(project_images_dir, exist_ok=True)
+            images_from = images_from or self.current_project_path
+            asset_store = AssetStore.for_project(self.current_project_path, self.asset_writer)
 
             listeners_to_save = []
             for listener in self.listeners:
                 listener_copy = listener.copy()
                 
-                # Handle image path: ensure it's relative and file is in project images dir
+                # Where the image is now: a capture made before the profile had a folder, the asset store, or
+                # the 'images' folder of profiles saved before the store existed
                 current_image_path_source = listener_copy.pop("_image_abs_path_temp", None) # Get and remove temp path
-                if not current_image_path_source: # If no temp path, construct from filename (already in project)
-                    current_image_path_source = os.path.join(project_images_dir, listener_copy["image_filename"])
-
-
-                if not os.path.isabs(current_image_path_source): # Should not happen if _image_abs_path_temp was used
-                     # This might be a relative path from a previous load, ensure it's valid
-                     potential_abs_path = os.path.join(self.current_project_path, current_image_path_source)
-                     if os.path.exists(potential_abs_path):
-                         current_image_path_source = potential_abs_path
-                     else: # Fallback if it was already just a filename from a loaded project
-                         current_image_path_source = os.path.join(project_images_dir, listener_copy["image_filename"])
-
+                if not current_image_path_source and listener_copy.get("image_hash"):
+                    current_image_path_source = project_asset_path(images_from, listener_copy["image_hash"])
+                elif not current_image_path_source and listener_copy.get("image_filename"):
+                    current_image_path_source = os.path.join(images_from, "images", listener_copy["image_filename"])
 
-                target_abs_path_in_project = os.path.join(project_images_dir, listener_copy["image_filename"])
-
-                if os.path.exists(current_image_path_source):
-                    if os.path.normpath(current_image_path_source) != os.path.normpath(target_abs_path_in_project):
-                        try:
-                            shutil.copy2(current_image_path_source, target_abs_path_in_project)
-                            print(f"Copied image for '{listener_copy['name']}' to project images.")
-                            # If original was in images_temp, we might want to clean it up later or on exit.
-                        except Exception as e:
-                            simpledialog.messagebox.showerror("Save Error", f"Could not copy image '{listener_copy['image_filename']}' to project: {e}", parent=self.root)
-                            # Continue saving JSON but image might be missing
-                elif not os.path.exists(target_abs_path_in_project):
-                     print(f"Warning: Image file for '{listener_copy['name']}' ({listener_copy['image_filename']}) not found at source or target. JSON will reference it but file may be missing.")
-
-                # JSON should always store relative path to images dir
-                listener_copy["image_filename"] = listener_copy["image_filename"] # Already just filename
+                if current_image_path_source and self.asset_writer.exists(current_image_path_source): # A capture still being written counts
+                    try:
+                        # Only assets the store lacks are copied (in the background, after any pending write of the
+                        # source); images from before the store are hashed once here and referenced by hash from now on
+                        image_hash, _ = asset_store.add_file(current_image_path_source, listener_copy.get("image_hash"), label=listener_copy['name'])
+                        listener["image_hash"] = listener_copy["image_hash"] = image_hash
+                        listener.pop("image_filename", None)
+                        listener_copy.pop("image_filename", None)
+                    except Exception as e:
+                        simpledialog.messagebox.showerror("Save Error", f"Could not add the image for '{listener_copy['name']}' to the project: {e}", parent=self.root)
+                        # Continue saving JSON but image might be missing
+                elif not (listener_copy.get("image_hash") and self.asset_writer.exists(asset_store.path(listener_copy["image_hash"]))):
+                     print(f"Warning: Image file for '{listener_copy['name']}' not found. JSON will reference it but file may be missing.")
 
                 listeners_to_save.append(listener_copy)
             
@@ -349,16 +385,13 @@ class WoWAutomationApp:
                     json.dump(data_to_save, f, indent=4)
                 simpledialog.messagebox.showinfo("Save Profile", f"Profile '{self.current_profile_name}' saved.", parent=self.root)
                 self.mark_profile_modified(False)
-                # Clean up temp images_temp if we created it
-                temp_images_dir = os.path.join(os.getcwd(), "images_temp")
-                if os.path.exists(temp_images_dir) and not os.listdir(temp_images_dir): # Check if empty
+                # Clean up the scratch store if it was created but is empty
+                temp_images_dir = scratch_store_dir()
+                if os.path.normpath(temp_images_dir) != os.path.normpath(asset_store.directory) and os.path.isdir(temp_images_dir) and not os.listdir(temp_images_dir):
                     try:
                         os.rmdir(temp_images_dir)
                     except OSError: # Not empty or other issue
                         pass 
-                elif os.path.exists(temp_images_dir) and any(l.get("_image_abs_path_temp") and temp_images_dir in l.get("_image_abs_path_temp") for l in self.listeners) :
-                    # if any listener still points to temp, don't delete, but this should not happen after copy
-                    pass
 
 
                 return True
@@ -382,10 +415,11 @@ class WoWAutomationApp:
         if not profile_file_name_base:
             return False
 
+        images_from = self.current_project_path # Listener images are copied over from the previous folder, if any
         self.current_project_path = project_dir # The selected folder is the root of the project
         self.current_profile_name = profile_file_name_base
         
-        return self.save_profile() # Now save_profile will use the new path and name
+        return self.save_profile(images_from) # Now save_profile will use the new path and name
 
     def load_profile(self):
         if not self._check_unsaved_changes():
@@ -409,13 +443,12 @@ class WoWAutomationApp:
             
             self.listeners = []
             for listener_data in loaded_data.get("listeners", []):
-                # Image path construction: image_filename is relative to "images" subfolder in project_path
-                img_filename = listener_data.get("image_filename")
-                if img_filename:
-                    abs_image_path = os.path.join(self.current_project_path, "images", img_filename)
-                    if not os.path.exists(abs_image_path):
-                        print(f"Warning: Image file '{img_filename}' for listener '{listener_data.get('name')}' not found at '{abs_image_path}'.")
-                        # Listener will be added, but image detection might fail.
+                # Image path construction: the image_hash names a file in the project's asset store; profiles saved
+                # before the store have an image_filename relative to the "images" subfolder instead
+                abs_image_path = self._listener_image_path(listener_data)
+                if abs_image_path and not os.path.exists(abs_image_path):
+                    print(f"Warning: Image file '{os.path.basename(abs_image_path)}' for listener '{listener_data.get('name')}' not found at '{abs_image_path}'.")
+                    # Listener will be added, but image detection might fail.
                 self.listeners.append(listener_data)
             
             loaded_hotkey = loaded_data.get("capture_hotkey", self.capture_hotkey)
@@ -478,6 +511,29 @@ class WoWAutomationApp:
                 print(f"Error in set_new_capture_hotkey: {e}")
 
 
+    def set_frame_source(self, source_name):
+        # Called from the Watcher > Capture Source menu; radiobutton already changed the variable
+        if self.watcher_active.is_set():
+            simpledialog.messagebox.showwarning("Warning", "Stop watching before changing the capture source.", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name)
+            return
+        options = {}
+        if source_name == "replay":
+            replay_path = filedialog.askdirectory(title="Select Folder of Recorded Frames", parent=self.root)
+            if not replay_path:
+                self.frame_source_name.set(self.frame_source.name)
+                return
+            options["path"] = replay_path
+        try:
+            new_source = create_frame_source(source_name, **options)
+        except Exception as e:
+            simpledialog.messagebox.showerror("Capture Source Error", f"Could not switch to '{source_name}': {e}", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name)
+            return
+        self.frame_source.close()
+        self.frame_source = new_source
+        print(f"Capture source set to '{source_name}'.")
+
     def start_watching(self):
         if not self.listeners:
             simpledialog.messagebox.showinfo("Start Watching", "No listeners configured.", parent=self.root)
@@ -486,12 +542,118 @@ class WoWAutomationApp:
             simpledialog.messagebox.showinfo("Start Watching", "Watcher is already running.", parent=self.root)
             return
 
+        # Decode every active listener's icon up front so the watch loop never touches the disk
+        self.asset_writer.flush() # Fresh captures may still be on their way to disk
+        active_listeners = [l for l in self.listeners if l.get('active', False)]
+        load_errors = self.template_cache.preload([self._listener_image_path(l) for l in active_listeners])
+        problems = []
+        for listener in active_listeners:
+            image_path = self._listener_image_path(listener)
+            if not image_path:
+                problems.append(f"{listener['name']}: image path information missing")
+            elif image_path in load_errors:
+                problems.append(f"{listener['name']}: {load_errors[image_path]}")
+        if problems:
+            print("Listener images that could not be loaded:\n  " + "\n  ".join(problems))
+            simpledialog.messagebox.showwarning("Listener Images",
+                                                "These listeners will be skipped:\n\n" + "\n".join(problems),
+                                                parent=self.root)
+
+        if self.replay_thread and self.replay_thread.is_alive():
+            simpledialog.messagebox.showinfo("Start Watching", "Wait for the replay to finish first.", parent=self.root)
+            return
+        self.watch_source = self.frame_source
+        self.frame_recorder = None
+        if self.record_frames.get():
+            recording_path = os.path.join(self.current_project_path or os.getcwd(), RECORDINGS_DIR, time.strftime("%Y%m%d-%H%M%S"))
+            try:
+                self.frame_recorder = FrameRecorder(recording_path)
+                self.watch_source = RecordingFrameSource(self.frame_source, self.frame_recorder)
+                print(f"Recording frames and key presses to {recording_path}")
+            except OSError as e:
+                simpledialog.messagebox.showerror("Record Frames", f"Could not start recording:\n{e}", parent=self.root)
+                return
+
+        self.scan_governor = ScanGovernor(*self.governor_limits())
         self.watcher_active.set() # Signal thread to run
-        self.watcher_thread = threading.Thread(target=self._watch_loop, daemon=True)
+        # Tk variables must not be read from the watcher thread, so pass the mode in
+        self.watcher_thread = threading.Thread(target=self._watch_loop, args=(self.capture_once_per_cycle.get(), self.matcher_processes.get(), self.cycle_budget_ms.get()),
+                                               daemon=True)
         self.watcher_thread.start()
         self.frames[ListenerManagerFrame.__name__].update_watch_button_state(True)
         print("--- Started Watching ---")
 
+    def replay_recording(self):
+        # Called from Watcher > Replay Recording...: runs the active listeners over a recording, offline
+        if self.watcher_active.is_set() or (self.replay_thread and self.replay_thread.is_alive()):
+            simpledialog.messagebox.showwarning("Replay Recording", "Stop watching (or wait for the running replay) first.", parent=self.root)
+            return
+        initial_dir = os.path.join(self.current_project_path, RECORDINGS_DIR) if self.current_project_path else os.getcwd()
+        path = filedialog.askdirectory(title="Select Frame Recording", initialdir=initial_dir, parent=self.root)
+        if not path: return
+        try:
+            recording = FrameRecording(path)
+        except (OSError, ValueError) as e:
+            simpledialog.messagebox.showerror("Replay Recording", f"Could not open recording:\n{e}", parent=self.root)
+            return
+        active_listeners = [l for l in self.listeners if l.get('active', False)]
+        self.asset_writer.flush()
+        self.template_cache.preload([self._listener_image_path(l) for l in active_listeners])
+        self.replay_thread = threading.Thread(target=self._replay_loop, args=(recording,), daemon=True)
+        self.replay_thread.start()
+
+    def _replay_loop(self, recording):
+        # Deterministic: every recorded frame is matched in order, scan intervals and cooldowns follow the
+        # recording's timestamps and there is no cycle budget (a wall-clock deadline would make runs differ)
+        print(f"--- Replaying {recording.frame_count} frames ({recording.duration:.1f} s) from {recording.path} ---")
+        self.location_tracker.forget()
+        self.location_tracker.reset_stats()
+        self.frame_diff.forget()
+        self.frame_diff.reset_stats()
+        self.watch_metrics.reset()
+        watch = self._new_watch(ListenerScheduler(0))
+        stats = new_watch_stats()
+
+        def detect(frame, now):
+            self.frame_diff.update(frame)
+            listeners = [l for l in self.listeners if l.get('active', False)]
+            found = watch.scheduler.run_cycle(listeners, lambda l: watch.check(l, frame, stats), now=now)
+            if not found: return ()
+            watch.scheduler.fired(found[0], now=now)
+            return (found[0]['name'],)
+
+        try:
+            report = replay_recording(recording, detect)
+        except Exception as e:
+            print(f"Replay failed: {e}")
+            return
+        print(f"[Replay] {report.summary()}")
+        print(f"[Replay] {self.frame_diff.summary()}")
+        print("[Replay] Per-listener cost:\n  " + "\n  ".join(self.watch_metrics.summary_lines() or ["no checks"]))
+        self.root.after(0, self.frames[ListenerManagerFrame.__name__].refresh_listeners_list)
+        self.root.after(0, lambda: simpledialog.messagebox.showinfo("Replay Finished", report.summary().capitalize(), parent=self.root))
+
+    def export_watch_metrics(self):
+        if not self.watch_metrics.listeners:
+            simpledialog.messagebox.showinfo("Export Metrics", "No watcher metrics yet. Start watching first.", parent=self.root)
+            return
+        path = filedialog.asksaveasfilename(parent=self.root, title="Export Watcher Metrics", defaultextension=".jsonl",
+                                            filetypes=[("JSON Lines (appends a snapshot)", "*.jsonl"),
+                                                       ("Prometheus text", "*.prom"), ("All files", "*.*")])
+        if not path: return
+        try:
+            self.watch_metrics.export(path)
+            print(f"Watcher metrics exported to {path}")
+        except OSError as e:
+            simpledialog.messagebox.showerror("Export Metrics", f"Could not write metrics:\n{e}", parent=self.root)
+
+    def governor_limits(self):
+        # (target latency ms, max CPU %) from the UI, falling back to the defaults while an entry is being edited
+        try:
+            return self.target_latency_ms.get(), self.max_cpu_percent.get()
+        except tk.TclError:
+            return GOVERNOR_TARGET_LATENCY_MS, GOVERNOR_MAX_CPU_PERCENT
+
     def stop_watching(self):
         self.watcher_active.clear() # Signal thread to stop
         if self.watcher_thread and self.watcher_thread.is_alive():
@@ -503,88 +665,91 @@ class WoWAutomationApp:
         self.frames[ListenerManagerFrame.__name__].update_watch_button_state(False)
         print("--- Stopped Watching ---")
 
-    def _watch_loop(self):
+    def _listener_image_path(self, listener):
+        if not self.current_project_path and listener.get("_image_abs_path_temp"):
+            return listener["_image_abs_path_temp"]
+        if self.current_project_path and listener.get("image_hash"):
+            return project_asset_path(self.current_project_path, listener["image_hash"])
+        if self.current_project_path and listener.get("image_filename"): # Saved before the asset store
+            return os.path.join(self.current_project_path, "images", listener["image_filename"])
+        return None
+
+    def _listener_template(self, listener):
+        # Decoded in memory; the cache only re-checks the file's mtime every few seconds
+        image_path = self._listener_image_path(listener)
+        return self.template_cache.get(image_path) if image_path else None
+
+    def _new_watch(self, scheduler):
+        # The watch loops live in watchers.py (benchmark_watchers.py runs them headless); the session state is ours
+        return ListenerWatch(self.listeners, self.watch_source, self._listener_template, self.watcher_active, self.location_tracker,
+                             self.frame_diff, scheduler, self.scan_governor, self.watch_metrics, self.frame_recorder, self.cycle_stats_every)
+
+    def _report_prefilter_speedup(self):
+        # Times dense vs. prefiltered matching once per listener on a real frame, so the gain is visible
+        sparse_listeners = [l for l in self.listeners if l.get('active', False)
+                            and match_strategy_for(l, DEFAULT_LISTENER_STRATEGY) == "sparse"]
+        if not sparse_listeners: return
+        try:
+            frame = self.watch_source.grab()
+        except Exception as e:
+            print(f"Prefilter check skipped, could not capture screen: {e}")
+            return
+        for listener in sparse_listeners:
+            template = self._listener_template(listener)
+            if template is None: continue
+            report = measure_prefilter(frame, template, search_region_for(listener), repeats=1)
+            if report is None:
+                print(f"[Prefilter] {listener['name']}: matched densely (too little contrast or too many candidates)")
+                continue
+            dense_ms, sparse_ms, pruned = report
+            print(f"[Prefilter] {listener['name']}: {pruned:.1%} of positions pruned, "
+                  f"{dense_ms:.1f} ms dense -> {sparse_ms:.1f} ms sparse ({dense_ms / max(sparse_ms, 1e-6):.1f}x)")
+
+    def _watch_loop(self, capture_once_per_cycle=True, matcher_processes=0, cycle_budget_ms=CYCLE_BUDGET_MS):
         self.root.iconify() # Minimize main window while watching
         time.sleep(0.5) # Give it time to minimize
 
-        while self.watcher_active.is_set():
-            processed_one_this_cycle = False
-            # Get a snapshot of listeners by priority (IDs)
-            # The actual listener data is fetched by ID to get the most current 'active' state
-            # Order is determined by self.listeners which is manipulated by UI
-            
-            # Create a temporary list of active listeners in their current UI order
-            active_listeners_in_order = [l for l in self.listeners if l.get('active', False)]
-
-            for listener in active_listeners_in_order:
-                if not self.watcher_active.is_set(): break # Check event before each potentially long operation
+        mode_text = "pipelined capture/match/press threads" if capture_once_per_cycle else "one screenshot per listener"
+        print(f"Watcher capture mode: {mode_text}, matcher: {MATCH_BACKEND} NCC")
+        self._report_prefilter_speedup()
+        PREFILTER_STATS.reset()
+        self.location_tracker.forget() # Positions from an earlier session may be stale
+        self.location_tracker.reset_stats()
+        self.frame_diff.forget()
+        self.frame_diff.reset_stats()
+        self.listener_scheduler = ListenerScheduler(cycle_budget_ms)
+        self.watch_metrics.reset()
+        watch = self._new_watch(self.listener_scheduler)
+
+        pool = None
+        if capture_once_per_cycle and matcher_processes:
+            # Listener icons are split across the worker processes, which decode them once at startup
+            image_paths = [self._listener_image_path(l) for l in self.listeners if l.get('active', False)]
+            try:
+                pool = MatcherPool(image_paths, matcher_processes)
+                print(f"Matcher pool started with {pool.process_count} processes.")
+            except Exception as e:
+                print(f"Could not start the matcher pool, matching in the watcher thread instead: {e}")
+        try:
+            if capture_once_per_cycle:
+                watch.run_pipelined(pool)
+            else:
+                watch.run_serial()
+        except pyautogui.FailSafeException:
+            print("!!! FAILSAFE TRIGGERED (mouse to top-left) !!!")
+            self.watcher_active.clear() # Stop the loop
+            self.root.after(0, lambda: self.frames[ListenerManagerFrame.__name__].update_watch_button_state(False))
+        finally:
+            if pool is not None:
+                print(f"[Watcher] {pool.summary()}")
+                pool.close()
+            print("[Watcher] Per-listener cost:\n  " + "\n  ".join(self.watch_metrics.summary_lines() or ["no checks"]))
+            if watch.shared_matches.shared:
+                print(f"[Watcher] {watch.shared_matches.shared} checks reused another listener's match of the same icon")
+            if self.frame_recorder is not None:
+                self.frame_recorder.close()
+                print(f"[Watcher] {self.frame_recorder.summary()} -> {self.frame_recorder.path}")
 
-                try:
-                    if not self.current_project_path and listener.get("_image_abs_path_temp"):
-                         image_to_check = listener["_image_abs_path_temp"]
-                    elif self.current_project_path and listener.get("image_filename"):
-                         image_to_check = os.path.join(self.current_project_path, "images", listener["image_filename"])
-                    else:
-                        print(f"Skipping listener {listener['name']}: Image path information missing.")
-                        continue
-                    
-                    if not os.path.exists(image_to_check):
-                        # This check can be frequent, consider logging less verbosely or only once
-                        # print(f"Image not found for {listener['name']}: {image_to_check}")
-                        continue
-
-                    location = pyautogui.locateOnScreen(
-                        image_to_check,
-                        confidence=listener.get('confidence', 0.8)
-                    )
-
-                    if location:
-                        print(f"Detected: {listener['name']}. Pressing: {listener['keybind_raw']}")
-                        keys_to_press = listener['keybind_raw'].split('+')
-                        
-                        press_count = 0
-                        max_presses = listener.get('max_sequential_presses', 3)
-                        delay = listener.get('post_press_delay', 0.1)
-
-                        # Inner loop: Press keybind until icon disappears or max_presses reached
-                        while self.watcher_active.is_set() and pyautogui.locateOnScreen(image_to_check, confidence=listener.get('confidence', 0.8)):
-                            if len(keys_to_press) == 1:
-                                pyautogui.press(keys_to_press[0])
-                            else:
-                                pyautogui.hotkey(*keys_to_press)
-                            
-                            press_count += 1
-                            time.sleep(delay)
-
-                            if max_presses > 0 and press_count >= max_presses:
-                                print(f"Max ({max_presses}) sequential presses for {listener['name']}. Re-evaluating.")
-                                break
-                        
-                        print(f"Icon {listener['name']} action complete (pressed {press_count} times).")
-                        processed_one_this_cycle = True
-                        # IMPORTANT: Restart scan from highest priority after an action
-                        # This is achieved by breaking this inner loop and the outer for-loop will restart
-                        break 
-                
-                except pyautogui.FailSafeException:
-                    print("!!! FAILSAFE TRIGGERED (mouse to top-left) !!!")
-                    self.watcher_active.clear() # Stop the loop
-                    # Ensure deiconify runs on main thread
-                    self.root.after(0, self.root.deiconify)
-                    self.root.after(0, lambda: self.frames[ListenerManagerFrame.__name__].update_watch_button_state(False))
-                    return # Exit thread
-                except Exception as e:
-                    import traceback
-                    print(f"Error during watch loop for listener {listener.get('name', 'Unknown')}: {e}")
-                    traceback.print_exc()
-                    # Optionally disable faulty listener or add a cooldown
-                    # For now, just continue to the next listener or next cycle
-
-            if not self.watcher_active.is_set(): break # Check again before sleep
-
-            if not processed_one_this_cycle:
-                time.sleep(self.scan_interval) # Sleep only if no icon was processed in this full pass
-        
         # Loop finished
         if self.root.state() == 'iconic': # If still minimized
             self.root.after(0, self.root.deiconify) # Ensure deiconify runs on main thread
@@ -596,11 +761,16 @@ class WoWAutomationApp:
             return # User cancelled closing
         if keyboard:
             keyboard.remove_all_hotkeys()
+        if not self.asset_writer.close():
+            print("Warning: some icon images were still being written when the program closed.")
+        self.frame_source.close()
         self.root.destroy()
 
 
 # --- UI Frame Class ---
 class ListenerManagerFrame(tk.Frame):
+    METRIC_COLUMNS = ("Hits", "Match ms", "Press ms", "Budget", "Score") # Live watcher metrics per listener
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
@@ -618,6 +788,29 @@ class ListenerManagerFrame(tk.Frame):
         filemenu.add_separator()
         filemenu.add_command(label="Exit", command=self.controller.on_closing)
         menubar.add_cascade(label="File", menu=filemenu)
+        watchermenu = tk.Menu(menubar, tearoff=0)
+        watchermenu.add_checkbutton(label="Capture Once Per Cycle", variable=self.controller.capture_once_per_cycle)
+        sourcemenu = tk.Menu(watchermenu, tearoff=0)
+        for source_name in ("pyautogui", "mss", "replay"):
+            sourcemenu.add_radiobutton(label=source_name, value=source_name, variable=self.controller.frame_source_name,
+                                       command=lambda n=source_name: self.controller.set_frame_source(n),
+                                       state=tk.NORMAL if source_name in available_frame_sources() else tk.DISABLED)
+        watchermenu.add_cascade(label="Capture Source", menu=sourcemenu)
+        poolmenu = tk.Menu(watchermenu, tearoff=0)
+        for count in sorted({0, 2, 4, default_process_count()}):
+            poolmenu.add_radiobutton(label="Off (watcher thread)" if count == 0 else f"{count} processes", value=count,
+                                     variable=self.controller.matcher_processes)
+        watchermenu.add_cascade(label="Matcher Processes", menu=poolmenu)
+        budgetmenu = tk.Menu(watchermenu, tearoff=0)
+        for budget_ms in (8, 16, 33, 100, 0):
+            budgetmenu.add_radiobutton(label=f"{budget_ms} ms" if budget_ms else "Unlimited", value=budget_ms,
+                                       variable=self.controller.cycle_budget_ms)
+        watchermenu.add_cascade(label="Cycle Budget", menu=budgetmenu)
+        watchermenu.add_separator()
+        watchermenu.add_checkbutton(label="Record Frames", variable=self.controller.record_frames)
+        watchermenu.add_command(label="Replay Recording...", command=self.controller.replay_recording)
+        watchermenu.add_command(label="Export Metrics...", command=self.controller.export_watch_metrics)
+        menubar.add_cascade(label="Watcher", menu=watchermenu)
         self.controller.root.config(menu=menubar)
 
         # --- Top Controls ---
@@ -633,12 +826,24 @@ class ListenerManagerFrame(tk.Frame):
         
         tk.Button(top_controls_frame, text="Info/Help", command=self.show_help).pack(side=tk.RIGHT)
 
+        # --- Scan Rate (governor limits and live readout) ---
+        governor_frame = tk.Frame(self, bg=self["bg"])
+        governor_frame.pack(padx=10, fill="x")
+        tk.Label(governor_frame, text="Target latency (ms):", bg=self["bg"]).pack(side=tk.LEFT)
+        tk.Spinbox(governor_frame, from_=20, to=2000, increment=10, width=6,
+                   textvariable=self.controller.target_latency_ms).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(governor_frame, text="Max CPU %:", bg=self["bg"]).pack(side=tk.LEFT)
+        tk.Spinbox(governor_frame, from_=1, to=100, increment=5, width=4,
+                   textvariable=self.controller.max_cpu_percent).pack(side=tk.LEFT, padx=(2, 10))
+        self.governor_label = tk.Label(governor_frame, text="Not watching", bg=self["bg"], fg="#555555")
+        self.governor_label.pack(side=tk.LEFT, padx=10)
+
 
         # --- Listeners List (Treeview) ---
         list_frame = tk.Frame(self, bg=self["bg"])
         list_frame.pack(pady=5, padx=10, fill="both", expand=True)
 
-        cols = ("#", "Name", "Keybind", "Active", "Confidence")
+        cols = ("#", "Name", "Keybind", "Active", "Confidence", "Search", "Match", "Schedule") + self.METRIC_COLUMNS
         self.tree = ttk.Treeview(list_frame, columns=cols, show="headings", selectmode="browse")
         
         self.tree.heading("#", text="#", anchor="w")
@@ -651,6 +856,15 @@ class ListenerManagerFrame(tk.Frame):
         self.tree.column("Active", width=60, stretch=False, anchor="center")
         self.tree.heading("Confidence", text="Confidence", anchor="w")
         self.tree.column("Confidence", width=80, stretch=False, anchor="center")
+        self.tree.heading("Search", text="Search", anchor="w")
+        self.tree.column("Search", width=70, stretch=False, anchor="center")
+        self.tree.heading("Match", text="Match", anchor="w")
+        self.tree.column("Match", width=100, stretch=False, anchor="center")
+        self.tree.heading("Schedule", text="Schedule", anchor="w")
+        self.tree.column("Schedule", width=110, stretch=False, anchor="center")
+        for col, width in zip(self.METRIC_COLUMNS, (70, 65, 65, 55, 50)):
+            self.tree.heading(col, text=col, anchor="w")
+            self.tree.column(col, width=width, stretch=False, anchor="center")
 
         vsb = ttk.Scrollbar(list_frame, orient="vertical", command=self.tree.yview)
         self.tree.configure(yscrollcommand=vsb.set)
@@ -665,6 +879,8 @@ class ListenerManagerFrame(tk.Frame):
 
         tk.Button(bottom_controls_frame, text="Remove Selected", command=self.remove_selected_listener).pack(side=tk.LEFT, padx=5)
         tk.Button(bottom_controls_frame, text="Edit Selected", command=self.edit_selected_listener).pack(side=tk.LEFT, padx=5)
+        tk.Button(bottom_controls_frame, text="Matching...", command=self.edit_selected_listener_matching).pack(side=tk.LEFT, padx=5)
+        tk.Button(bottom_controls_frame, text="Scheduling...", command=self.edit_selected_listener_scheduling).pack(side=tk.LEFT, padx=5)
         tk.Button(bottom_controls_frame, text="Move Up", command=lambda: self.move_listener(-1)).pack(side=tk.LEFT, padx=5)
         tk.Button(bottom_controls_frame, text="Move Down", command=lambda: self.move_listener(1)).pack(side=tk.LEFT, padx=5)
         tk.Button(bottom_controls_frame, text="Toggle Active", command=self.toggle_selected_listener_active).pack(side=tk.LEFT, padx=5)
@@ -683,12 +899,39 @@ class ListenerManagerFrame(tk.Frame):
     def update_watch_button_state(self, is_watching):
         if is_watching:
             self.watch_button.config(text="Stop Watching", bg="#FFBBAA") # Reddish for stop
+            self.refresh_live_status()
         else:
             self.watch_button.config(text="Start Watching", bg="#A5D6A7") # Greenish for start
 
+    def refresh_live_status(self):
+        # While watching: shows the governor's interval and CPU use, passes on edited limits and refreshes
+        # the listener metric columns
+        if not self.controller.watcher_active.is_set():
+            self.governor_label.config(text="Not watching")
+            return
+        self.controller.scan_governor.set_limits(*self.controller.governor_limits())
+        self.governor_label.config(text=self.controller.scan_governor.status())
+        shares = self.controller.watch_metrics.budget_shares()
+        for listener in self.controller.listeners:
+            if self.tree.exists(listener["id"]):
+                for col, value in zip(self.METRIC_COLUMNS, self.metric_values(listener["id"], shares)):
+                    self.tree.set(listener["id"], col, value)
+        self.after(METRICS_REFRESH_MS, self.refresh_live_status)
+
+    def metric_values(self, listener_id, shares):
+        # Texts for METRIC_COLUMNS from the current watch session's counters
+        metrics = self.controller.watch_metrics.get(listener_id)
+        if metrics is None:
+            return ("-",) * len(self.METRIC_COLUMNS)
+        latency = f"{metrics['press_latency_ms_mean']:.0f}" if metrics["detections_pressed"] else "-"
+        score = f"{metrics['last_score']:.2f}" if metrics["last_score"] is not None else "-"
+        return (f"{metrics['hits']}/{metrics['checks']}", f"{metrics['match_ms_mean']:.2f}", latency,
+                f"{shares.get(listener_id, 0.0):.0%}", score)
+
     def refresh_listeners_list(self):
         for i in self.tree.get_children():
             self.tree.delete(i)
+        shares = self.controller.watch_metrics.budget_shares()
         for idx, listener in enumerate(self.controller.listeners):
             active_str = "Yes" if listener.get("active", False) else "No"
             self.tree.insert("", "end", iid=listener["id"], values=(
@@ -696,7 +939,11 @@ class ListenerManagerFrame(tk.Frame):
                 listener["name"],
                 listener["keybind_raw"],
                 active_str,
-                f"{listener.get('confidence', 0.8):.2f}"
+                f"{listener.get('confidence', 0.8):.2f}",
+                describe_search(listener),
+                f"{match_mode_for(listener).capitalize()}/{match_strategy_for(listener, DEFAULT_LISTENER_STRATEGY)}",
+                describe_schedule(listener),
+                *self.metric_values(listener["id"], shares)
             ))
 
     def get_selected_listener_id(self):
@@ -770,6 +1017,38 @@ class ListenerManagerFrame(tk.Frame):
             self.refresh_listeners_list()
 
 
+    def edit_selected_listener_matching(self):
+        listener_id = self.get_selected_listener_id()
+        if not listener_id: return
+
+        idx = self.find_listener_index_by_id(listener_id)
+        if idx == -1: return
+
+        listener = self.controller.listeners[idx]
+        dialog = ListenerMatchingDialog(self.controller.root, f"Matching - {listener['name']}", listener)
+        if dialog.result is None: return # User cancelled
+
+        if any(listener.get(key) != value for key, value in dialog.result.items()):
+            listener.update(dialog.result)
+            self.controller.mark_profile_modified()
+            self.refresh_listeners_list()
+
+    def edit_selected_listener_scheduling(self):
+        listener_id = self.get_selected_listener_id()
+        if not listener_id: return
+
+        idx = self.find_listener_index_by_id(listener_id)
+        if idx == -1: return
+
+        listener = self.controller.listeners[idx]
+        dialog = ListenerSchedulingDialog(self.controller.root, f"Scheduling - {listener['name']}", listener)
+        if dialog.result is None: return # User cancelled
+
+        if any(listener.get(key) != value for key, value in dialog.result.items()):
+            listener.update(dialog.result)
+            self.controller.mark_profile_modified()
+            self.refresh_listeners_list()
+
     def move_listener(self, direction): # -1 for up, 1 for down
         listener_id = self.get_selected_listener_id()
         if not listener_id: return
@@ -820,12 +1099,21 @@ class ListenerManagerFrame(tk.Frame):
         help_text = """WoW Icon Listener Tool - Help
 
 File Menu:
-- New/Load/Save Profile: Manage your listener configurations. Profiles are saved as .json files, with captured icons in an 'images' subfolder.
+- New/Load/Save Profile: Manage your listener configurations. Profiles are saved as .json files, with captured icons in an 'assets' subfolder, each named by a hash of its pixels (the same icon captured twice is stored once). Icons captured before the profile has a folder wait in an 'assets' folder in the current directory and are copied in on 'Save Profile As...'.
 - Set Capture Hotkey: Change the global hotkey used to initiate icon capture (default F12). Requires an application restart if watcher was active.
 
+Watcher Menu:
+- Matcher Processes: With Capture Once Per Cycle checked, the active listeners can be matched in parallel by several worker processes, each responsible for a share of the icons (decoded once when watching starts). Every screenshot is placed in shared memory once and read by all workers without copying. Worth it for profiles with many listeners on a multi-core CPU; the console shows the parallelism achieved when watching stops.
+- Capture Once Per Cycle: When checked (default), capturing, matching and key presses run on separate threads: screenshots are taken continuously into a small buffer, every listener is matched against the newest one (older unread screenshots are dropped), and keybinds are pressed on their own thread so the search for the next icon continues while the previous one is being pressed. When unchecked, a single thread does everything in turn and each listener takes its own screenshot of just its search area. Averaged per-cycle timings are printed to the console so the two modes can be compared. Takes effect the next time watching starts.
+- Cycle Budget: Matching time each scan cycle may use (default 16 ms). Listeners are checked by priority level, then list order; once the budget is used up the remaining Normal and Low listeners wait for the next cycle, where they go first, so none is starved. High priority listeners are always checked every cycle. With matcher processes, listeners are matched a batch (one per process) at a time and the budget is checked between batches. The console statistics show how many cycles went over budget.
+- Record Frames: When checked, every frame the watcher captures and every key it presses are recorded to a 'recordings' folder inside the profile folder, with a timestamp as its name. Only the 32x32 tiles that changed since the previous frame are stored (compressed), so long sessions stay small. Region grabs (Capture Once Per Cycle unchecked) record the whole screen, which makes them slower while recording.
+- Replay Recording...: Runs the active listeners over a recording instead of the live screen, without pressing anything. Frames are processed in order on the recording's own clock (scan intervals and cooldowns follow the recorded timestamps; no cycle budget), so the same recording gives the same result every time, on any machine, with no game running. Reports frames and detections per second and how many of the recorded key presses were reproduced; the metric columns show the replay's figures. Use it to check matcher and setting changes against a missed proc. 'python recording.py <folder>' describes a recording.
+- Capture Source: Where screen frames come from. 'pyautogui' is the default; 'mss' is a faster raw grabber (pip install mss); 'replay' plays back a folder of recorded frames instead of the live screen. Run frame_sources.py on its own to compare capture speeds.
+
 Main Window:
 - Start/Stop Watching: Toggles the icon detection and key pressing. The main window will minimize while watching.
 - Capture Hotkey Display: Shows the currently active hotkey. Press this key anywhere to start capturing an icon.
+- Target latency / Max CPU %: Instead of a fixed pause between scans, the pause is worked out from how long a scan cycle actually takes. Max CPU % sets the shortest pause (scans may not use more than that share of one core); the target latency sets the longest (an icon should be noticed within that time). Right after a keybind is pressed scanning runs as fast as the CPU limit allows, and relaxes towards the latency target while nothing is found. If the two conflict, the CPU limit wins. Both can be changed while watching; the current pause, cycle cost and measured CPU use are shown next to them.
 
 Listener List:
 - Displays configured listeners. Priority is top-down.
@@ -834,17 +1122,25 @@ Listener List:
 - Keybind: Key(s) to press (e.g., '1', 'ctrl+s').
 - Active: 'Yes' if this listener is currently enabled for watching.
 - Confidence: How closely the screen image must match the captured icon (0.1-1.0).
+- Search: Where on screen the icon is looked for. 'Full' scans the whole screen, 'ROI' only the spot where the icon was captured, 'ROI+N' that spot plus N pixels on every side. New captures default to ROI+20; searching a small area is far cheaper than scanning the whole screen.
+- Schedule: Priority level, check interval and cooldown (see Scheduling...).
+- Hits, Match ms, Press ms, Budget, Score: Live figures for the current (or last) watch session: hits out of checks, average time per check, average time from detection to the first key press, share of all matching time spent on this listener (the ones eating the cycle budget have the highest), and the best match score of the last check (useful for setting Confidence). Watcher > Export Metrics... writes these, the capture time per cycle and a histogram of best scores per listener to a .jsonl file (one snapshot appended per export) or a Prometheus .prom text file.
+- Match: match mode / strategy. 'Fuzzy' compares with the confidence threshold. 'Exact' first looks for a pixel-identical copy of the icon (very fast for action-bar icons, which are drawn exactly as captured) and falls back to fuzzy matching when there is none.
+- Fuzzy matching first rejects most screen positions by checking a few high-contrast pixel pairs of the icon, and only scores the survivors in full (the 'sparse' strategy, default for listeners). The 'pyramid' strategy instead looks for the icon on a 1/2-1/8 scale copy of the screen (depth chosen from the icon size, shared by all listeners) and refines only around the best spots; it is the fastest choice for full-screen searches. 'dense' scores every position. When watching starts the console shows, per listener, how many positions were pruned and the speedup over scoring every position.
+- Each cycle's screenshot is compared with the previous one in 32x32 tiles. A listener whose search area lies only in unchanged tiles reuses its last result instead of matching again; the periodic console statistics show how many checks were skipped this way.
 
 Buttons:
 - Remove Selected: Deletes the selected listener from the list.
 - Edit Selected: Modify parameters of the selected listener.
-- Move Up/Down: Change priority of the selected listener.
+- Matching...: Choose the search area (full screen, fixed ROI or ROI plus a margin) match mode (fuzzy or exact) and matching strategy (dense, sparse or pyramid) for the selected listener.
+- Scheduling...: Priority level (High, Normal, Low), how often the listener is checked ('Check every', 0 = every cycle; e.g. 500 ms for a rare buff) and a cooldown after its keybind was pressed during which it is not checked at all.
+- Move Up/Down: Change priority of the selected listener within its priority level.
 - Toggle Active: Enable/disable the selected listener. (Or double-click list item)
 
 How to Use:
 1. (Optional) Set your preferred Capture Hotkey via File menu.
-2. Press the global Capture Hotkey. The screen will dim.
-3. Click and drag a rectangle around the WoW icon you want to track. Release the mouse.
+2. Press the global Capture Hotkey. The screen freezes as it was the moment you pressed it (if this window is showing, it is hidden first and the screen freezes just after).
+3. Click and drag a rectangle around the WoW icon you want to track on the frozen screen. Release the mouse.
 4. Enter a name, the keybind to press, confidence, and other parameters in the dialogs.
 5. The listener is added to the list. Adjust its priority with Move Up/Down.
 6. Configure multiple listeners as needed.
@@ -856,6 +1152,7 @@ Detection Logic:
   - If the icon remains, the key is pressed again after a short 'Post-Press Delay'.
   - This repeats up to 'Max Sequential Presses' times or until the icon disappears.
   - After an action, the tool rescans from the highest priority listener.
+  - Each listener remembers where its icon was last found. The next checks (and the re-checks between presses) only look at a few pixels around that spot; after 3 misses in a row the listener's full search area is used again.
 
 Failsafe: Quickly move your mouse to the top-left corner of your primary screen to stop PyAutoGUI (and thus the watcher).
 """
@@ -874,6 +1171,83 @@ Failsafe: Quickly move your mouse to the top-left corner of your primary screen
         help_win.focus_set()
 
 
+class ListenerMatchingDialog(simpledialog.Dialog):
+    def __init__(self, parent, title, listener):
+        self.listener = listener
+        self.result = None # Dict of changed matching settings if OK is pressed
+        super().__init__(parent, title)
+
+    def body(self, master):
+        tk.Label(master, text="Search area:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        self.mode_var = tk.StringVar(value=SEARCH_MODE_LABELS[self.listener.get("search_mode", "full")])
+        self.mode_combo = ttk.Combobox(master, textvariable=self.mode_var, values=[SEARCH_MODE_LABELS[m] for m in SEARCH_MODES], state="readonly", width=15)
+        self.mode_combo.grid(row=0, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="Margin (px):").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        self.margin_var = tk.StringVar(value=str(self.listener.get("search_margin", DEFAULT_SEARCH_MARGIN)))
+        tk.Entry(master, textvariable=self.margin_var, width=6).grid(row=1, column=1, sticky="w", padx=5, pady=2)
+        capture_coords = self.listener.get("capture_coords")
+        coords_text = f"Captured at: {tuple(capture_coords)}" if capture_coords else "No capture position stored (full screen only)"
+        tk.Label(master, text=coords_text, fg="gray").grid(row=2, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="Match mode:").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        self.match_var = tk.StringVar(value=MATCH_MODE_LABELS[match_mode_for(self.listener)])
+        ttk.Combobox(master, textvariable=self.match_var, values=[MATCH_MODE_LABELS[m] for m in MATCH_MODES],
+                     state="readonly", width=20).grid(row=3, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="Strategy:").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        self.strategy_var = tk.StringVar(value=MATCH_STRATEGY_LABELS[match_strategy_for(self.listener, DEFAULT_LISTENER_STRATEGY)])
+        ttk.Combobox(master, textvariable=self.strategy_var, values=[MATCH_STRATEGY_LABELS[s] for s in MATCH_STRATEGIES],
+                     state="readonly", width=26).grid(row=4, column=1, sticky="w", padx=5, pady=2)
+        return self.mode_combo
+
+    def validate(self):
+        try:
+            if int(self.margin_var.get()) < 0: raise ValueError("Margin must be 0 or more pixels.")
+            return 1
+        except ValueError as e:
+            simpledialog.messagebox.showerror("Invalid Input", str(e), parent=self)
+            return 0
+
+    def apply(self):
+        mode = next(m for m in SEARCH_MODES if SEARCH_MODE_LABELS[m] == self.mode_var.get())
+        match_mode = next(m for m in MATCH_MODES if MATCH_MODE_LABELS[m] == self.match_var.get())
+        strategy = next(s for s in MATCH_STRATEGIES if MATCH_STRATEGY_LABELS[s] == self.strategy_var.get())
+        self.result = {"search_mode": mode, "search_margin": int(self.margin_var.get()), "match_mode": match_mode,
+                       "match_strategy": strategy}
+
+
+class ListenerSchedulingDialog(simpledialog.Dialog):
+    def __init__(self, parent, title, listener):
+        self.listener = listener
+        self.result = None # Dict of scheduling settings if OK is pressed
+        super().__init__(parent, title)
+
+    def body(self, master):
+        tk.Label(master, text="Priority:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        self.priority_var = tk.StringVar(value=PRIORITY_LABELS[priority_for(self.listener)])
+        self.priority_combo = ttk.Combobox(master, textvariable=self.priority_var, values=[PRIORITY_LABELS[p] for p in PRIORITY_LEVELS], state="readonly", width=10)
+        self.priority_combo.grid(row=0, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="Check every (ms, 0 = every cycle):").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        self.scan_var = tk.StringVar(value=str(self.listener.get("scan_every_ms", DEFAULT_SCAN_EVERY_MS)))
+        tk.Entry(master, textvariable=self.scan_var, width=8).grid(row=1, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="Cooldown after pressing (s):").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        self.cooldown_var = tk.StringVar(value=str(self.listener.get("cooldown_s", DEFAULT_COOLDOWN_S)))
+        tk.Entry(master, textvariable=self.cooldown_var, width=8).grid(row=2, column=1, sticky="w", padx=5, pady=2)
+        tk.Label(master, text="High priority listeners are checked every cycle, whatever the cycle budget.", fg="gray").grid(row=3, column=0, columnspan=2, sticky="w", padx=5, pady=2)
+        return self.priority_combo
+
+    def validate(self):
+        try:
+            if int(self.scan_var.get()) < 0: raise ValueError("Check interval must be 0 or more milliseconds.")
+            if float(self.cooldown_var.get()) < 0: raise ValueError("Cooldown must be 0 or more seconds.")
+            return 1
+        except ValueError as e:
+            simpledialog.messagebox.showerror("Invalid Input", str(e), parent=self)
+            return 0
+
+    def apply(self):
+        priority = next(p for p in PRIORITY_LEVELS if PRIORITY_LABELS[p] == self.priority_var.get())
+        self.result = {"priority": priority, "scan_every_ms": int(self.scan_var.get()), "cooldown_s": float(self.cooldown_var.get())}
+
+
 # --- Main Execution ---
 if __name__ == "__main__":
     app_root = tk.Tk()
@@ -1,16 +1,27 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog, filedialog, colorchooser, scrolledtext
-import pyautogui
-import time
 import threading
 import json
 import os
 import random
-import shutil
 from PIL import Image, ImageTk, ImageGrab # Pillow for pixel color and image ops
+from frame_sources import create_frame_source, available_frame_sources
+from matching import (SEARCH_MODES, SEARCH_MODE_LABELS, DEFAULT_SEARCH_MODE, DEFAULT_SEARCH_MARGIN,
+                      MATCH_MODES, MATCH_MODE_LABELS, DEFAULT_MATCH_MODE, MATCH_STRATEGIES, MATCH_STRATEGY_LABELS,
+                      DEFAULT_LISTENER_STRATEGY, match_mode_for, match_strategy_for)
+from template_cache import TemplateCache
+from governor import ScanGovernor, GOVERNOR_MAX_CPU_PERCENT
+from frozen_capture import freeze_after_hiding
+from asset_writer import AssetWriter, describe_finished
+from asset_store import AssetStore, project_asset_path
+from watchers import monitor_icons
 
 # --- Global Variables & Constants ---
 DEFAULT_PROJECT_NAME = "WarcraftAutomation"
+LISTENER_TARGET_LATENCY_MS = 100 # Longest pause between captures (plus a cycle) while no icon is found
+LISTENER_MAX_CPU_PERCENT = GOVERNOR_MAX_CPU_PERCENT # Share of one core the monitoring cycles may use
+LISTENER_METRICS_FILE = "listener_metrics.jsonl" # Per-icon metrics appended to the project folder when monitoring stops
+PRESS_SETTLE_S = 0.15 # After a press, frames captured sooner than this are ignored for the pressed icon (the game redraws)
 
 # --- Helper Functions ---
 def get_screen_center_for_window(window_width, window_height, root):
@@ -34,6 +45,11 @@ class WarcraftAutomationApp:
         self.current_sequence_name = DEFAULT_PROJECT_NAME
         self.sequence_modified = False
 
+        self.frame_source = create_frame_source("pyautogui") # Where the listener loop gets its screen frames from
+        self.frame_source_name = tk.StringVar(value=self.frame_source.name)
+        self.template_cache = TemplateCache() # Icon images decoded once, shared by every listener pass
+        self.asset_writer = AssetWriter(self.root, self._on_assets_written) # Captured icon PNGs are written off the Tk thread
+
         self.drag_select_window = None
         self.drag_start_x = None
         self.drag_start_y = None
@@ -53,6 +69,14 @@ class WarcraftAutomationApp:
 
         self.show_frame("MainFrame")
 
+    def _on_assets_written(self, jobs):
+        # Completion report from the asset writer, on the Tk thread
+        line, failures = describe_finished(jobs)
+        if line: print(line)
+        if failures:
+            details = "\n".join(f"{label}: {error}" for label, error in failures)
+            simpledialog.messagebox.showerror("Error", f"Could not write these icon images:\n{details}", parent=self.root)
+
     def mark_sequence_modified(self, modified=True):
         self.sequence_modified = modified
         current_title = self.root.title()
@@ -109,9 +133,15 @@ class WarcraftAutomationApp:
 
     def create_region_drag_mode(self):
         if self.drag_select_window and self.drag_select_window.winfo_exists(): return
+        # Freeze the screen once; the rectangle is dragged over the frozen image and the icon is cropped from it
+        freeze_after_hiding(self.root, self.frame_source, self._open_icon_drag_overlay,
+                            lambda e: simpledialog.messagebox.showerror("Error",f"Could not capture screen: {e}",parent=self.root))
+
+    def _open_icon_drag_overlay(self, frozen):
         self.drag_select_window = tk.Toplevel(self.root)
-        self.drag_select_window.attributes('-fullscreen',True); self.drag_select_window.attributes('-alpha',0.3); self.drag_select_window.attributes('-topmost',True)
-        drag_canvas = tk.Canvas(self.drag_select_window,bg="gray",cursor="crosshair",highlightthickness=0); drag_canvas.pack(fill="both",expand=True)
+        self.drag_select_window.attributes('-fullscreen',True); self.drag_select_window.attributes('-topmost',True)
+        drag_canvas = tk.Canvas(self.drag_select_window,bg="black",cursor="crosshair",highlightthickness=0); drag_canvas.pack(fill="both",expand=True)
+        frozen.show_on(drag_canvas)
         tk.Label(drag_canvas,text="Click & drag. Release to confirm. ESC to cancel.",bg="lightyellow",fg="black").place(x=10,y=10)
         def on_b1_press(event): self.drag_start_x=event.x; self.drag_start_y=event.y; self.drag_rect_id=drag_canvas.create_rectangle(self.drag_start_x,self.drag_start_y,self.drag_start_x,self.drag_start_y,outline='red',width=2)
         def on_b1_motion(event):
@@ -120,6 +150,7 @@ class WarcraftAutomationApp:
             if self.drag_start_x is None: return
             x1,y1=min(self.drag_start_x,event.x),min(self.drag_start_y,event.y); x2,y2=max(self.drag_start_x,event.x),max(self.drag_start_y,event.y)
             self.drag_select_window.destroy(); self.drag_select_window=None; self.drag_start_x,self.drag_start_y,self.drag_rect_id = None,None,None
+            self.root.deiconify()
             if abs(x1-x2)<5 or abs(y1-y2)<5: simpledialog.messagebox.showinfo("Info","Selection too small.",parent=self.root); return
             coords=(int(x1),int(y1),int(x2-x1),int(y2-y1)) # x, y, width, height
             
@@ -132,26 +163,26 @@ class WarcraftAutomationApp:
             if not keybind: return
 
             try:
-                self.root.withdraw(); time.sleep(0.2); img = pyautogui.screenshot(region=coords); self.root.deiconify()
-                base_img_filename=f"{obj_name.replace(' ','_').replace('.','_')}.png"; final_abs_img_path=""
+                img = frozen.crop(coords) # Cut from the frozen screen, not what is on screen after the dialogs
                 
-                # Save image to a project-specific 'icons' directory
-                if self.current_project_path:
-                    icons_dir=os.path.join(self.current_project_path,"icons"); os.makedirs(icons_dir,exist_ok=True)
-                    final_abs_img_path=os.path.join(icons_dir,base_img_filename)
-                else:
-                    # If no project, save to current working directory and inform user
-                    final_abs_img_path=os.path.join(os.getcwd(),base_img_filename)
-                    simpledialog.messagebox.showinfo("Icon Saved (No Project)",f"Icon: {final_abs_img_path}\nRelative after 'Save As...'.",parent=self.root)
-                
-                img.save(final_abs_img_path)
+                # Save image to the project's asset store, named by pixel hash: capturing the same icon again reuses the file
+                # (and its decoded template). Without a project it goes to the current working directory's store.
+                image_hash,final_abs_img_path=AssetStore.for_capture(self.current_project_path,self.asset_writer).add_image(img,label=obj_name) # Encoded and written in the background
+                self.template_cache.put(final_abs_img_path, img) # Matchable before the file is on disk
+                if not self.current_project_path:
+                    simpledialog.messagebox.showinfo("Icon Saved (No Project)",f"Icon: {final_abs_img_path}\nCopied into the project on 'Save As...'.",parent=self.root)
                 
                 obj_data={
                     "type":"icon",
                     "image_path":final_abs_img_path,
+                    "image_hash":image_hash,
                     "capture_coords":coords,
                     "keybind":keybind,
-                    "confidence":0.8 # Default confidence
+                    "confidence":0.8, # Default confidence
+                    "search_mode":DEFAULT_SEARCH_MODE, # Search around the capture spot, icons rarely move
+                    "search_margin":DEFAULT_SEARCH_MARGIN,
+                    "match_mode":DEFAULT_MATCH_MODE,
+                    "match_strategy":DEFAULT_LISTENER_STRATEGY
                 }
                 if self.add_object(obj_name,obj_data):
                     simpledialog.messagebox.showinfo("Icon Created",f"Icon '{obj_name}' captured and linked to '{keybind}'.",parent=self.root)
@@ -159,14 +190,24 @@ class WarcraftAutomationApp:
                     self.current_listeners.append({"name": obj_name, "object_data": obj_data, "active": False, "priority": len(self.current_listeners) + 1})
                     self.frames["MainFrame"].update_listeners_display()
 
-            except Exception as e: self.root.deiconify(); simpledialog.messagebox.showerror("Error",f"Capture icon error: {e}",parent=self.root)
+            except Exception as e: simpledialog.messagebox.showerror("Error",f"Capture icon error: {e}",parent=self.root)
         def on_escape_drag(event=None):
             if self.drag_select_window: self.drag_select_window.destroy(); self.drag_select_window=None
             self.drag_start_x,self.drag_start_y,self.drag_rect_id=None,None,None; print("Drag selection cancelled.")
+            self.root.deiconify()
         drag_canvas.bind("<ButtonPress-1>",on_b1_press); drag_canvas.bind("<B1-Motion>",on_b1_motion)
         drag_canvas.bind("<ButtonRelease-1>",on_b1_release); self.drag_select_window.bind("<Escape>",on_escape_drag)
         self.drag_select_window.focus_force()
 
+    def update_icon_settings(self, obj_name, **settings):
+        # Loaded projects keep separate copies of an icon's data in objects and in its listener
+        if obj_name not in self.objects: return
+        self.objects[obj_name].update(settings)
+        for listener in self.current_listeners:
+            if listener["name"] == obj_name:
+                listener["object_data"].update(settings)
+        self.mark_sequence_modified()
+
     def _check_unsaved_changes(self):
         if self.sequence_modified:
             response = simpledialog.messagebox.askyesnocancel("Unsaved Changes", f"Sequence '{self.current_sequence_name}' has unsaved changes. Save now?", parent=self.root)
@@ -189,6 +230,7 @@ class WarcraftAutomationApp:
         if not self.current_project_path:
             return self.save_sequence_as()
         
+        self._add_icons_to_store()
         try:
             project_data = {
                 "objects": self.objects,
@@ -205,6 +247,23 @@ class WarcraftAutomationApp:
             simpledialog.messagebox.showerror("Error", f"Failed to save sequence: {e}", parent=self.root)
             return False
 
+    def _add_icons_to_store(self):
+        # Copies the icons the project's asset store lacks (captured before the project had a folder, or saved before
+        # the store existed) and points objects and listeners at the stored file. Existing assets are not rewritten.
+        store = AssetStore.for_project(self.current_project_path, self.asset_writer)
+        for obj_data in list(self.objects.values()) + [l["object_data"] for l in self.current_listeners]:
+            image_path = obj_data.get("image_path")
+            if obj_data.get("type") != "icon" or not image_path: continue
+            if not self.asset_writer.exists(image_path): # A capture still being written counts
+                print(f"Warning: Icon image not found: {image_path}")
+                continue
+            try:
+                image_hash, stored_path = store.add_file(image_path, obj_data.get("image_hash"))
+            except Exception as e:
+                print(f"Could not add icon image {image_path} to the project: {e}")
+                continue
+            obj_data.update(image_path=stored_path, image_hash=image_hash)
+
     def save_sequence_as(self):
         project_name = simpledialog.askstring("Save Sequence As", "Enter project name:", initialvalue=self.current_sequence_name, parent=self.root)
         if not project_name: return False
@@ -238,6 +297,9 @@ class WarcraftAutomationApp:
             
             self.objects = project_data.get("objects", {})
             self.current_listeners = project_data.get("listeners", [])
+            # Icons in the asset store are found by hash, so the project folder can be moved
+            for obj_data in list(self.objects.values()) + [l["object_data"] for l in self.current_listeners]:
+                if obj_data.get("image_hash"): obj_data["image_path"] = project_asset_path(load_dir, obj_data["image_hash"])
             self.current_sequence_name = project_data.get("sequence_name", project_name)
             self.current_project_path = load_dir
             self.mark_sequence_modified(False)
@@ -248,6 +310,29 @@ class WarcraftAutomationApp:
         except Exception as e:
             simpledialog.messagebox.showerror("Error", f"Failed to load sequence: {e}", parent=self.root)
 
+    def set_frame_source(self, source_name):
+        # Called from the Monitoring > Capture Source menu; radiobutton already changed the variable
+        if hasattr(self, '_listener_thread') and self._listener_thread.is_alive():
+            simpledialog.messagebox.showwarning("Warning", "Stop monitoring before changing the capture source.", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name)
+            return
+        options = {}
+        if source_name == "replay":
+            replay_path = filedialog.askdirectory(title="Select Folder of Recorded Frames", parent=self.root)
+            if not replay_path:
+                self.frame_source_name.set(self.frame_source.name)
+                return
+            options["path"] = replay_path
+        try:
+            new_source = create_frame_source(source_name, **options)
+        except Exception as e:
+            simpledialog.messagebox.showerror("Capture Source Error", f"Could not switch to '{source_name}': {e}", parent=self.root)
+            self.frame_source_name.set(self.frame_source.name)
+            return
+        self.frame_source.close()
+        self.frame_source = new_source
+        print(f"Capture source set to '{source_name}'.")
+
     def start_listening(self):
         # This will be the main loop for monitoring icons and pressing keys
         # Needs to run in a separate thread to not block the UI
@@ -260,6 +345,14 @@ class WarcraftAutomationApp:
             simpledialog.messagebox.showinfo("Info", "No active listeners to start.", parent=self.root)
             return
 
+        # Decode every icon up front so the listener loop never reads from disk
+        self.asset_writer.flush() # Fresh captures may still be on their way to disk
+        load_errors = self.template_cache.preload([l["object_data"].get("image_path") for l in active_listeners])
+        if load_errors:
+            problems = [f"{l['name']}: {load_errors[l['object_data'].get('image_path')]}" for l in active_listeners
+                        if l["object_data"].get("image_path") in load_errors]
+            simpledialog.messagebox.showwarning("Icon Images", "These icons could not be loaded and will be skipped:\n\n" + "\n".join(problems), parent=self.root)
+
         self._stop_listening_flag = threading.Event()
         self._listener_thread = threading.Thread(target=self._listener_loop, args=(active_listeners, self._stop_listening_flag))
         self._listener_thread.daemon = True # Allow thread to exit with main program
@@ -274,43 +367,10 @@ class WarcraftAutomationApp:
             simpledialog.messagebox.showinfo("Info", "No active listeners to stop.", parent=self.root)
 
     def _listener_loop(self, listeners, stop_flag):
-        # Sort listeners by priority (lower number = higher priority)
-        listeners.sort(key=lambda x: x["priority"])
-
-        while not stop_flag.is_set():
-            found_and_pressed = False
-            for listener in listeners:
-                obj_data = listener["object_data"]
-                if obj_data["type"] == "icon":
-                    image_path = obj_data["image_path"]
-                    confidence = obj_data.get("confidence", 0.8)
-                    keybind = obj_data["keybind"]
-
-                    try:
-                        # Check if the icon is on screen
-                        # pyautogui.locateOnScreen is resource intensive, consider optimizations
-                        location = pyautogui.locateOnScreen(image_path, confidence=confidence)
-                        if location:
-                            print(f"Found {listener['name']} at {location}. Pressing {keybind}.")
-                            # Simulate key press
-                            if '+' in keybind: # Handle hotkeys like 'alt+q'
-                                keys = keybind.split('+')
-                                pyautogui.hotkey(*keys)
-                            else:
-                                pyautogui.press(keybind)
-                            found_and_pressed = True
-                            # Add a small delay to prevent rapid re-detection and spamming
-                            time.sleep(0.5) 
-                            break # Press only the highest priority active icon
-                    except pyautogui.ImageNotFoundException:
-                        pass # Icon not found, continue to next listener
-                    except Exception as e:
-                        print(f"Error monitoring {listener['name']}: {e}")
-            
-            if not found_and_pressed:
-                time.sleep(0.1) # Small delay if no icon was found to reduce CPU usage
-
-        print("Listener loop stopped.")
+        # The loop itself lives in watchers.py, where benchmark_watchers.py runs it against a headless scene
+        governor = ScanGovernor(LISTENER_TARGET_LATENCY_MS, LISTENER_MAX_CPU_PERCENT) # Pause between captures from the measured cycle cost
+        metrics_path = os.path.join(self.current_project_path, LISTENER_METRICS_FILE) if self.current_project_path else None
+        monitor_icons(listeners, self.frame_source, self.template_cache, governor, lambda: not stop_flag.is_set(), PRESS_SETTLE_S, metrics_path)
 
 
 # --- UI Frames ---
@@ -349,6 +409,15 @@ class MainFrame(tk.Frame):
         file_menu.add_separator()
         file_menu.add_command(label="Exit", command=self.controller.root.quit)
 
+        monitoring_menu = tk.Menu(menu_bar, tearoff=0)
+        menu_bar.add_cascade(label="Monitoring", menu=monitoring_menu)
+        source_menu = tk.Menu(monitoring_menu, tearoff=0)
+        for source_name in ("pyautogui", "mss", "replay"):
+            source_menu.add_radiobutton(label=source_name, value=source_name, variable=self.controller.frame_source_name,
+                                        command=lambda n=source_name: self.controller.set_frame_source(n),
+                                        state=tk.NORMAL if source_name in available_frame_sources() else tk.DISABLED)
+        monitoring_menu.add_cascade(label="Capture Source", menu=source_menu)
+
         # Listener List Display
         self.listener_list_frame = ttk.LabelFrame(self, text="Active Listeners (Priority)")
         self.listener_list_frame.pack(pady=10, padx=10, fill="both", expand=True)
@@ -483,6 +552,35 @@ class ObjectCreationFrame(tk.Frame):
             tk.Label(icon_frame, text=f"Keybind: {obj_data['keybind']}").pack(anchor="w")
             tk.Label(icon_frame, text=f"Path: {os.path.basename(obj_data['image_path'])}").pack(anchor="w")
 
+            # Search area: full screen, the capture spot, or the capture spot plus a margin
+            search_frame = tk.Frame(icon_frame)
+            search_frame.pack(anchor="w")
+            tk.Label(search_frame, text="Search:").pack(side="left")
+            mode_var = tk.StringVar(value=SEARCH_MODE_LABELS[obj_data.get("search_mode", "full")])
+            mode_combo = ttk.Combobox(search_frame, textvariable=mode_var, values=[SEARCH_MODE_LABELS[m] for m in SEARCH_MODES], state="readonly", width=13)
+            mode_combo.pack(side="left", padx=2)
+            tk.Label(search_frame, text="Margin:").pack(side="left")
+            margin_var = tk.StringVar(value=str(obj_data.get("search_margin", DEFAULT_SEARCH_MARGIN)))
+            margin_entry = ttk.Entry(search_frame, textvariable=margin_var, width=4)
+            margin_entry.pack(side="left", padx=2)
+            apply_search = lambda e=None, name=icon_name, mv=mode_var, gv=margin_var: self.set_search_area(name, mv.get(), gv.get())
+            mode_combo.bind("<<ComboboxSelected>>", apply_search)
+            margin_entry.bind("<FocusOut>", apply_search)
+            margin_entry.bind("<Return>", apply_search)
+
+            # Exact mode looks for a pixel-identical copy before falling back to confidence matching
+            match_frame = tk.Frame(icon_frame)
+            match_frame.pack(anchor="w")
+            tk.Label(match_frame, text="Match:").pack(side="left")
+            match_var = tk.StringVar(value=MATCH_MODE_LABELS[match_mode_for(obj_data)])
+            match_combo = ttk.Combobox(match_frame, textvariable=match_var, values=[MATCH_MODE_LABELS[m] for m in MATCH_MODES], state="readonly", width=20)
+            match_combo.pack(side="left", padx=2)
+            match_combo.bind("<<ComboboxSelected>>", lambda e=None, name=icon_name, mv=match_var: self.set_match_mode(name, mv.get()))
+            strategy_var = tk.StringVar(value=MATCH_STRATEGY_LABELS[match_strategy_for(obj_data, DEFAULT_LISTENER_STRATEGY)])
+            strategy_combo = ttk.Combobox(match_frame, textvariable=strategy_var, values=[MATCH_STRATEGY_LABELS[s] for s in MATCH_STRATEGIES], state="readonly", width=26)
+            strategy_combo.pack(side="left", padx=2)
+            strategy_combo.bind("<<ComboboxSelected>>", lambda e=None, name=icon_name, sv=strategy_var: self.set_match_strategy(name, sv.get()))
+
             # Add a delete button
             delete_btn = ttk.Button(icon_frame, text="Delete", command=lambda name=icon_name: self.delete_object(name))
             delete_btn.pack(pady=2)
@@ -490,18 +588,36 @@ class ObjectCreationFrame(tk.Frame):
         self.objects_inner_frame.update_idletasks()
         self.objects_canvas.config(scrollregion=self.objects_canvas.bbox("all"))
 
+    def set_search_area(self, obj_name, mode_label, margin_text):
+        obj_data = self.controller.objects.get(obj_name)
+        if obj_data is None: return
+        mode = next(m for m in SEARCH_MODES if SEARCH_MODE_LABELS[m] == mode_label)
+        try:
+            margin = max(0, int(margin_text))
+        except ValueError:
+            margin = obj_data.get("search_margin", DEFAULT_SEARCH_MARGIN)
+        if obj_data.get("search_mode", "full") != mode or obj_data.get("search_margin", DEFAULT_SEARCH_MARGIN) != margin:
+            self.controller.update_icon_settings(obj_name, search_mode=mode, search_margin=margin)
+
+    def set_match_mode(self, obj_name, mode_label):
+        obj_data = self.controller.objects.get(obj_name)
+        if obj_data is None: return
+        mode = next(m for m in MATCH_MODES if MATCH_MODE_LABELS[m] == mode_label)
+        if match_mode_for(obj_data) != mode:
+            self.controller.update_icon_settings(obj_name, match_mode=mode)
+
+    def set_match_strategy(self, obj_name, strategy_label):
+        obj_data = self.controller.objects.get(obj_name)
+        if obj_data is None: return
+        strategy = next(s for s in MATCH_STRATEGIES if MATCH_STRATEGY_LABELS[s] == strategy_label)
+        if match_strategy_for(obj_data, DEFAULT_LISTENER_STRATEGY) != strategy:
+            self.controller.update_icon_settings(obj_name, match_strategy=strategy)
+
     def delete_object(self, obj_name):
         if simpledialog.messagebox.askyesno("Confirm Delete", f"Are you sure you want to delete '{obj_name}'?", parent=self.controller.root):
             if obj_name in self.controller.objects:
-                # Remove associated image file
-                image_path = self.controller.objects[obj_name].get("image_path")
-                if image_path and os.path.exists(image_path):
-                    try:
-                        os.remove(image_path)
-                        print(f"Deleted image file: {image_path}")
-                    except Exception as e:
-                        print(f"Error deleting image file {image_path}: {e}")
-
+                # The image file stays: the asset store is keyed by pixel content, so the same file may back another
+                # icon, a listener, another tool's capture or an unsaved session
                 del self.controller.objects[obj_name]
                 # Also remove from current_listeners if it exists there
                 self.controller.current_listeners = [l for l in self.controller.current_listeners if l["name"] != obj_name]
@@ -524,4 +640,5 @@ class ObjectCreationFrame(tk.Frame):
 if __name__ == "__main__":
     root = tk.Tk()
     app = WarcraftAutomationApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.asset_writer.close() # Finish icon writes still queued when the window closed
\ No newline at end of file
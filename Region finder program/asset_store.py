@@ -0,0 +1,89 @@
+import hashlib
+import os
+
+from PIL import Image
+
+from frame_sources import image_to_pixels
+
+
+ASSET_STORE_DIR = "assets" # Project subfolder holding every image, one file per distinct pixel content
+ASSET_HASH_LENGTH = 16 # Hex digits of the SHA-256 kept in file names and objects (64 bits)
+
+
+# --- Content Hashes ---
+def pixel_hash(image):
+    # Hash of an image's size and RGB pixels: the same capture hashes the same however its file was encoded
+    pixels = image_to_pixels(image)
+    digest = hashlib.sha256(f"{pixels.shape[1]}x{pixels.shape[0]}:".encode())
+    digest.update(pixels.tobytes())
+    return digest.hexdigest()[:ASSET_HASH_LENGTH]
+
+
+def file_pixel_hash(path):
+    with Image.open(path) as image:
+        return pixel_hash(image)
+
+
+def asset_filename(image_hash):
+    return f"{image_hash}.png"
+
+
+def asset_relative_path(image_hash):
+    # Path stored in project files, relative to the project folder
+    return os.path.join(ASSET_STORE_DIR, asset_filename(image_hash))
+
+
+def project_asset_path(project_path, image_hash):
+    return os.path.join(project_path, asset_relative_path(image_hash))
+
+
+def scratch_store_root():
+    return os.getcwd()
+
+
+def scratch_store_dir():
+    return os.path.join(scratch_store_root(), ASSET_STORE_DIR)
+
+
+# --- Store ---
+class AssetStore:
+    """A folder of images named by pixel hash (<hash>.png), written through an AssetWriter.
+
+    Objects and listeners keep the hash, so re-capturing or duplicating an icon adds no file, identical
+    icons resolve to one path (and so one decoded template), and saving a project only writes the assets
+    its folder does not have yet.
+    """
+
+    def __init__(self, directory, writer):
+        self.directory = directory
+        self.writer = writer
+
+    @classmethod
+    def for_project(cls, project_path, writer):
+        return cls(os.path.join(project_path, ASSET_STORE_DIR), writer)
+
+    @classmethod
+    def for_capture(cls, project_path, writer):
+        # Where new captures go: the project's store, or before the project has a folder, a scratch store in the
+        # current directory (copied into the project when it is first saved)
+        return cls.for_project(project_path or scratch_store_root(), writer)
+
+    def path(self, image_hash):
+        return os.path.join(self.directory, asset_filename(image_hash))
+
+    def add_image(self, image, label=None):
+        # Returns (hash, path); the PNG is only queued if no file (or queued write) holds these pixels yet
+        image_hash = pixel_hash(image)
+        path = self.path(image_hash)
+        if not self.writer.exists(path):
+            self.writer.save_image(image, path, label)
+        return image_hash, path
+
+    def add_file(self, source, image_hash=None, label=None):
+        # Returns (hash, path) for an image file, copying it in if the store lacks it. Pass image_hash when it is
+        # known (e.g. a capture still being written); otherwise the file is decoded to hash it.
+        image_hash = image_hash or file_pixel_hash(source)
+        path = self.path(image_hash)
+        if os.path.normpath(source) != os.path.normpath(path) and not self.writer.exists(path):
+            self.writer.copy_file(source, path, label)
+        return image_hash, path
@@ -0,0 +1,142 @@
+import os
+import queue
+import shutil
+import threading
+import time
+
+
+ASSET_PNG_COMPRESS_LEVEL = 1 # zlib level for captured PNGs (0-9); 1 encodes several times faster than PIL's default 6 for slightly larger files
+ASSET_POLL_MS = 100 # How often the UI collects finished writes while any are pending
+ASSET_CLOSE_TIMEOUT_S = 30.0 # How long closing the program waits for queued writes
+
+
+class AssetJob:
+    """One queued write: an image encoded to a PNG file, or an existing file copied into place."""
+
+    def __init__(self, kind, target, label, image=None, source=None):
+        self.kind = kind # "image" or "copy"
+        self.target = target
+        self.label = label or os.path.basename(target) # Shown in reports, e.g. the object or listener name
+        self.image = image
+        self.source = source
+        self.error = None
+        self.seconds = 0.0
+
+
+# --- Background Asset Writer ---
+class AssetWriter:
+    """Writes project assets (fresh captures, images copied into a project folder) on a worker thread so
+    the Tk thread never waits for PNG encoding or the disk.
+
+    Jobs run one at a time in the order they were queued, so a copy of a file queued after that file's
+    write always sees the finished file. Each file is written under a temporary name and renamed into
+    place, so nothing ever reads half a PNG. Finished jobs are handed to on_done (a list per call) on the
+    Tk thread by polling with after(), like the sequence runner's progress messages.
+    """
+
+    def __init__(self, root, on_done=None, compress_level=ASSET_PNG_COMPRESS_LEVEL):
+        self.root = root
+        self.on_done = on_done
+        self.compress_level = compress_level
+        self._jobs = queue.Queue()
+        self._finished = queue.Queue()
+        self._pending = {} # Target path -> number of queued jobs writing it
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._polling = False
+        self._thread = threading.Thread(target=self._run, name="AssetWriter", daemon=True)
+        self._thread.start()
+
+    # Tk thread
+    def save_image(self, image, path, label=None):
+        # Queues image (a PIL image the caller no longer modifies) to be written to path as a PNG
+        return self._submit(AssetJob("image", path, label, image=image))
+
+    def copy_file(self, source, target, label=None):
+        return self._submit(AssetJob("copy", target, label, source=source))
+
+    def _submit(self, job):
+        with self._lock:
+            self._pending[os.path.normpath(job.target)] = self._pending.get(os.path.normpath(job.target), 0) + 1
+        self._jobs.put(job)
+        if not self._polling:
+            self._polling = True
+            self.root.after(ASSET_POLL_MS, self._poll)
+        return job
+
+    def is_pending(self, path):
+        with self._lock:
+            return os.path.normpath(path) in self._pending
+
+    def exists(self, path):
+        # True if path exists on disk or is about to (a queued write targets it)
+        return self.is_pending(path) or os.path.exists(path)
+
+    @property
+    def pending(self):
+        with self._lock:
+            return sum(self._pending.values())
+
+    def flush(self, timeout=None):
+        # Blocks until every queued job has run, e.g. before something reads the files; False on timeout
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._pending, timeout)
+
+    def close(self, timeout=ASSET_CLOSE_TIMEOUT_S):
+        # Waits for queued writes (program exit) and stops the worker; False if some were still running
+        done = self.flush(timeout)
+        self._jobs.put(None)
+        return done
+
+    def _poll(self):
+        finished = []
+        while True:
+            try: finished.append(self._finished.get_nowait())
+            except queue.Empty: break
+        if finished and self.on_done: self.on_done(finished)
+        if self.pending or not self._finished.empty():
+            self.root.after(ASSET_POLL_MS, self._poll)
+        else:
+            self._polling = False
+
+    # Worker thread
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None: return
+            started = time.perf_counter()
+            try:
+                self._write(job)
+            except Exception as e:
+                job.error = e
+            job.seconds = time.perf_counter() - started
+            job.image = None # Let the pixels go
+            self._finished.put(job)
+            with self._idle:
+                target = os.path.normpath(job.target)
+                self._pending[target] -= 1
+                if not self._pending[target]: del self._pending[target]
+                self._idle.notify_all()
+
+    def _write(self, job):
+        directory = os.path.dirname(job.target)
+        if directory: os.makedirs(directory, exist_ok=True)
+        partial = job.target + ".part"
+        try:
+            if job.kind == "image":
+                job.image.save(partial, format="PNG", compress_level=self.compress_level)
+            else:
+                shutil.copy2(job.source, partial)
+            os.replace(partial, job.target)
+        finally:
+            if os.path.exists(partial): os.remove(partial)
+
+
+def describe_finished(jobs):
+    # One console line summing up a batch of finished jobs, plus the (label, error) of each failure
+    failures = [(job.label, job.error) for job in jobs if job.error is not None]
+    written = [job for job in jobs if job.error is None]
+    images = sum(1 for job in written if job.kind == "image")
+    line = (f"Wrote {images} image(s) and copied {len(written) - images} file(s) in the background "
+            f"({sum(job.seconds for job in written) * 1000:.0f} ms)") if written else ""
+    return line, failures
@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from frame_sources import Frame, image_to_pixels
+from matching import search_region, locate_in_frame, MATCH_BACKEND
+from template_cache import TemplateCache
+
+# Optional: the locate pyautogui itself uses, for comparison (pip install pyscreeze; confidence needs OpenCV)
+try:
+    import pyscreeze
+except ImportError:
+    pyscreeze = None
+
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) # The icon PNGs live in the repo root
+CORPUS_TEMPLATES = ("Lava_burst.png", "Flame_shock.png", "icefury.png", "tempest.png", "spender.png", "system.png")
+CORPUS_DECOYS = ("performance.png", "manual.png", "Clicker.png", "automatic_toggle.png") # Pasted as clutter, never searched for
+CORPUS_FRAME_SIZE = (1280, 720)
+CORPUS_FRAMES = 24
+CORPUS_PRESENT_RATE = 0.6 # Chance that a template is pasted into a frame at all
+CORPUS_BACKGROUNDS = ("gradient", "noise", "clutter", "flat")
+CORPUS_VARIANTS = ("clean", "brightness", "noise") # How a pasted icon differs from its template
+CORPUS_SEED = 0
+MATCH_CONFIDENCE = 0.8
+ROI_MARGIN = 20 # The "roi" strategy searches the icon's home position plus this margin, like a listener's ROI
+POSITION_TOLERANCE = 2 # Pixels a found box may be off and still count as correct
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_matching_baseline.json")
+BASELINE_TIME_TOLERANCE = 1.5 # A strategy fails if it gets this many times slower than its baseline
+BASELINE_ACCURACY_TOLERANCE = 0.02 # ...or loses more than this much precision or recall
+
+
+# --- Corpus ---
+class CorpusFrame:
+    def __init__(self, pixels, homes, present, kind):
+        self.pixels = pixels
+        self.homes = homes # template path -> (left, top, width, height) where it is (or would be) pasted
+        self.present = present # template paths actually pasted
+        self.kind = kind # "background/variant", for reports
+
+
+def _load(names):
+    images = {}
+    for name in names:
+        path = os.path.normpath(os.path.join(REPO_DIR, name))
+        with Image.open(path) as image:
+            images[path] = image_to_pixels(image)
+    return images
+
+
+def _background(kind, rng, decoys):
+    width, height = CORPUS_FRAME_SIZE
+    ys, xs = np.mgrid[0:height, 0:width]
+    if kind == "noise":
+        return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    if kind == "flat":
+        return np.clip(np.full((height, width, 3), (20, 20, 25)) + rng.integers(-2, 3, size=(height, width, 3)), 0, 255).astype(np.uint8)
+    base = np.stack([60 + 80 * xs / width, 40 + 60 * ys / height, 90 + 40 * (xs + ys) / (width + height)], axis=-1)
+    pixels = np.clip(base + rng.integers(-5, 6, size=(height, width, 3)), 0, 255).astype(np.uint8)
+    if kind == "clutter":
+        for _ in range(40): # UI-like boxes
+            w, h = rng.integers(20, 200), rng.integers(10, 80)
+            x, y = rng.integers(0, width - w), rng.integers(0, height - h)
+            pixels[y:y + h, x:x + w] = rng.integers(0, 256, size=3)
+        for decoy in decoys.values():
+            for _ in range(2):
+                h, w = decoy.shape[:2]
+                x, y = rng.integers(0, width - w), rng.integers(0, height - h)
+                pixels[y:y + h, x:x + w] = decoy
+    return pixels
+
+
+def _perturb(icon, variant, rng):
+    if variant == "brightness":
+        return np.clip(icon.astype(np.int16) + 12, 0, 255).astype(np.uint8)
+    if variant == "noise":
+        return np.clip(icon + rng.normal(0, 4, size=icon.shape), 0, 255).astype(np.uint8)
+    return icon
+
+
+def _place(sizes, rng):
+    # Non-overlapping top-left positions for boxes of the given (width, height) sizes
+    width, height = CORPUS_FRAME_SIZE
+    taken = []
+    positions = []
+    for w, h in sizes:
+        while True:
+            x, y = int(rng.integers(0, width - w)), int(rng.integers(0, height - h))
+            if all(x + w + 8 <= tx or tx + tw + 8 <= x or y + h + 8 <= ty or ty + th + 8 <= y for tx, ty, tw, th in taken):
+                break
+        taken.append((x, y, w, h))
+        positions.append((x, y))
+    return positions
+
+
+def build_corpus(frames=CORPUS_FRAMES, seed=CORPUS_SEED):
+    # The repo's icon PNGs pasted at known positions onto varied backgrounds; same seed, same corpus
+    rng = np.random.default_rng(seed)
+    templates = _load(CORPUS_TEMPLATES)
+    decoys = _load(CORPUS_DECOYS)
+    corpus = []
+    for index in range(frames):
+        kind = CORPUS_BACKGROUNDS[index % len(CORPUS_BACKGROUNDS)]
+        variant = CORPUS_VARIANTS[(index // len(CORPUS_BACKGROUNDS)) % len(CORPUS_VARIANTS)]
+        pixels = _background(kind, rng, decoys)
+        positions = _place([(t.shape[1], t.shape[0]) for t in templates.values()], rng)
+        homes, present = {}, set()
+        for (path, icon), (x, y) in zip(templates.items(), positions):
+            h, w = icon.shape[:2]
+            homes[path] = (x, y, w, h)
+            if rng.random() < CORPUS_PRESENT_RATE:
+                pixels[y:y + h, x:x + w] = _perturb(icon, variant, rng)
+                present.add(path)
+        corpus.append(CorpusFrame(pixels, homes, present, f"{kind}/{variant}"))
+    return corpus, templates
+
+
+# --- Strategies ---
+def _locate_with(match_mode, strategy, roi=False):
+    def locate(frame, template, home):
+        region = search_region(home, "margin", ROI_MARGIN) if roi else None
+        return locate_in_frame(template, frame, MATCH_CONFIDENCE, region, match_mode, strategy)
+    return locate
+
+
+def _locate_pyscreeze(grayscale):
+    def locate(frame, template, home):
+        try:
+            box = pyscreeze.locate(template.image, frame.to_image(), grayscale=grayscale,
+                                   **({"confidence": MATCH_CONFIDENCE} if pyscreeze.useOpenCV else {}))
+        except pyscreeze.ImageNotFoundException:
+            return None
+        return tuple(box) if box else None
+    return locate
+
+
+STRATEGIES = {
+    "pyautogui": _locate_pyscreeze(False) if pyscreeze else None, # What pyautogui.locateOnScreen does
+    "pyautogui-gray": _locate_pyscreeze(True) if pyscreeze else None,
+    "dense": _locate_with("fuzzy", "dense"), # Grayscale NCC at every position of the full frame
+    "roi": _locate_with("fuzzy", "dense", roi=True),
+    "pyramid": _locate_with("fuzzy", "pyramid"),
+    "exact": _locate_with("exact", "dense"), # Pixel hash first, NCC fallback
+    "sparse": _locate_with("fuzzy", "sparse"),
+}
+
+
+class StrategyResult:
+    def __init__(self, name):
+        self.name = name
+        self.true_positives = self.false_positives = self.false_negatives = self.true_negatives = 0
+        self.seconds = 0.0
+        self.frames = 0
+        self.locates = 0
+
+    @property
+    def precision(self):
+        found = self.true_positives + self.false_positives
+        return self.true_positives / found if found else 1.0
+
+    @property
+    def recall(self):
+        actual = self.true_positives + self.false_negatives
+        return self.true_positives / actual if actual else 1.0
+
+    @property
+    def ms_per_template(self):
+        return self.seconds * 1000 / self.locates if self.locates else 0.0
+
+    @property
+    def fps(self):
+        # Frames per second with every template searched in each frame
+        return self.frames / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {"ms_per_template": round(self.ms_per_template, 3), "fps": round(self.fps, 2),
+                "precision": round(self.precision, 4), "recall": round(self.recall, 4)}
+
+
+def evaluate(name, locate, corpus, templates):
+    result = StrategyResult(name)
+    for corpus_frame in corpus:
+        frame = Frame(corpus_frame.pixels, 0, 0) # Fresh per strategy: per-frame match caches must not carry over
+        for path, template in templates.items():
+            home = corpus_frame.homes[path]
+            started = time.perf_counter()
+            box = locate(frame, template, home)
+            result.seconds += time.perf_counter() - started
+            result.locates += 1
+            correct = box is not None and abs(box[0] - home[0]) <= POSITION_TOLERANCE and abs(box[1] - home[1]) <= POSITION_TOLERANCE
+            if path in corpus_frame.present:
+                if correct: result.true_positives += 1
+                else:
+                    result.false_negatives += 1
+                    if box is not None: result.false_positives += 1 # Found something, but in the wrong place
+            elif box is not None: result.false_positives += 1
+            else: result.true_negatives += 1
+        result.frames += 1
+    return result
+
+
+# --- Baseline ---
+def compare_with_baseline(results, baseline, corpus_settings):
+    # Returns the regression messages (empty if none)
+    if baseline.get("corpus") != corpus_settings:
+        return [f"baseline was made with corpus {baseline.get('corpus')}, this run used {corpus_settings}; "
+                f"rerun with the same settings or --update-baseline"]
+    failures = []
+    same_backend = baseline.get("matcher_backend") == MATCH_BACKEND
+    if not same_backend:
+        print(f"Note: baseline timings are from the {baseline.get('matcher_backend')} matcher, only accuracy is compared.")
+    for result in results:
+        reference = baseline["strategies"].get(result.name)
+        if reference is None: continue
+        if same_backend and result.ms_per_template > reference["ms_per_template"] * BASELINE_TIME_TOLERANCE:
+            failures.append(f"{result.name}: {result.ms_per_template:.2f} ms/template, baseline {reference['ms_per_template']:.2f}")
+        for metric in ("precision", "recall"):
+            if getattr(result, metric) < reference[metric] - BASELINE_ACCURACY_TOLERANCE:
+                failures.append(f"{result.name}: {metric} {getattr(result, metric):.3f}, baseline {reference[metric]:.3f}")
+    missing = set(baseline["strategies"]) - {r.name for r in results}
+    for name in sorted(missing):
+        print(f"Note: '{name}' is in the baseline but was not run here.")
+    return failures
+
+
+if __name__ == "__main__":
+    # python benchmark_matching.py                   compare with the baseline, exit code 1 on a regression
+    # python benchmark_matching.py --update-baseline  accept this run as the new baseline
+    parser = argparse.ArgumentParser(description="Speed and accuracy of every locate strategy over a synthetic icon corpus.")
+    parser.add_argument("strategies", nargs="*", help=f"any of {', '.join(STRATEGIES)} (default: all available)")
+    parser.add_argument("--frames", type=int, default=CORPUS_FRAMES)
+    parser.add_argument("--seed", type=int, default=CORPUS_SEED)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="write this run's results as the baseline")
+    args = parser.parse_args()
+    unknown = [name for name in args.strategies if name not in STRATEGIES]
+    if unknown: parser.error(f"unknown strategies: {', '.join(unknown)}")
+
+    corpus, images = build_corpus(args.frames, args.seed)
+    cache = TemplateCache()
+    templates = {path: cache.put(path, Image.fromarray(pixels)) for path, pixels in images.items()}
+    print(f"Corpus: {len(corpus)} frames of {CORPUS_FRAME_SIZE[0]}x{CORPUS_FRAME_SIZE[1]}, {len(templates)} templates, "
+          f"{sum(len(f.present) for f in corpus)} pasted icons; matcher backend: {MATCH_BACKEND}")
+    print(f"{'strategy':15s} {'ms/template':>11s} {'fps':>8s} {'precision':>9s} {'recall':>7s}")
+    results = []
+    for name in args.strategies or STRATEGIES:
+        if STRATEGIES[name] is None:
+            print(f"{name:15s} skipped (pyscreeze not installed)")
+            continue
+        evaluate(name, STRATEGIES[name], corpus[:1], templates) # Warm-up: FFT sizes, pyramids, sample points
+        result = evaluate(name, STRATEGIES[name], corpus, templates)
+        results.append(result)
+        print(f"{name:15s} {result.ms_per_template:11.2f} {result.fps:8.2f} {result.precision:9.3f} {result.recall:7.3f}", flush=True)
+
+    corpus_settings = {"frames": args.frames, "seed": args.seed, "size": list(CORPUS_FRAME_SIZE)}
+    if args.update_baseline:
+        baseline = {"corpus": corpus_settings, "matcher_backend": MATCH_BACKEND,
+                    "strategies": {r.name: r.to_dict() for r in results}}
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    elif os.path.isfile(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = compare_with_baseline(results, json.load(f), corpus_settings)
+        if failures:
+            print("\n" + "!" * 70 + "\nMATCHING REGRESSION against " + args.baseline)
+            for failure in failures: print("  " + failure)
+            print("!" * 70)
+            sys.exit(1)
+        print("No regressions against the baseline.")
+    else:
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create one.")
@@ -0,0 +1,200 @@
+import argparse
+import contextlib
+import io
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from headless import ActionBarScene, HeadlessBackend, install_backend, PROC_DEFAULT_LIFETIME_S
+from matching import search_region, locate_in_frame, DEFAULT_LISTENER_STRATEGY
+from template_cache import TemplateCache
+
+
+BENCH_ICONS = ("Lava_burst.png", "Flame_shock.png", "icefury.png", "tempest.png", "spender.png", "system.png")
+BENCH_ICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir) # The icons live in the repo root
+BENCH_DURATION_S = 10.0
+BENCH_PROC_EVERY_S = 0.4 # Mean gap between procs (exponentially distributed)
+BENCH_SEARCH_MARGIN = 20 # Listeners search their slot plus this margin, like new captures in the listener tool
+BENCH_CONFIDENCE = 0.8
+BENCH_PRESS_SETTLE_S = 0.15 # The WA monitor's PRESS_SETTLE_S
+BENCH_MONITOR_LATENCY_MS = 100 # The WA monitor's LISTENER_TARGET_LATENCY_MS
+BENCH_SEQUENCE_POLL_S = 0.05 # Wait step at the end of each pass of the benchmark's rotation sequence
+
+
+# --- Scenario ---
+def load_icons(names=BENCH_ICONS):
+    icons = {}
+    for name in names:
+        path = os.path.normpath(os.path.join(BENCH_ICON_DIR, name))
+        with Image.open(path) as image:
+            icons[path] = image.convert("RGB")
+    return icons
+
+
+def build_scenario(duration_s, proc_every_s, seed, search_mode="margin"):
+    # Scene with one action bar slot per icon and a random, reproducible proc schedule, plus the listeners
+    # (dicts shaped like the listener tool's) that watch those slots, and the cache holding their templates
+    rng = np.random.default_rng(seed)
+    scene = ActionBarScene(seed=seed)
+    template_cache = TemplateCache()
+    listeners = []
+    for slot, (path, image) in enumerate(load_icons().items()):
+        x, y, w, h = scene.slot_box(slot)
+        capture_coords = (x + (w - image.width) // 2, y + (h - image.height) // 2, image.width, image.height)
+        listeners.append({"id": str(slot), "name": os.path.splitext(os.path.basename(path))[0], "keybind_raw": str(slot + 1),
+                          "image": image, "template": template_cache.put(path, image), "confidence": BENCH_CONFIDENCE,
+                          "capture_coords": capture_coords, "search_mode": search_mode, "search_margin": BENCH_SEARCH_MARGIN,
+                          "region": search_region(capture_coords, search_mode, BENCH_SEARCH_MARGIN), "active": True})
+    busy_until = [0.0] * len(listeners)
+    t = 0.5
+    while t < duration_s - PROC_DEFAULT_LIFETIME_S:
+        free = [slot for slot, until in enumerate(busy_until) if until <= t]
+        if free:
+            slot = int(rng.choice(free))
+            listener = listeners[slot]
+            scene.add_proc(listener["name"], listener["image"], slot, listener["keybind_raw"], t)
+            busy_until[slot] = t + PROC_DEFAULT_LIFETIME_S
+        t += float(rng.exponential(proc_every_s))
+    return scene, listeners, template_cache
+
+
+def warm_up(scene, listeners):
+    # First matches build per-template caches (FFT plans, pyramids); keep that out of the measurements
+    frame = scene.grab()
+    for listener in listeners:
+        locate_in_frame(listener["template"], frame, listener["confidence"], listener["region"], strategy=DEFAULT_LISTENER_STRATEGY)
+
+
+class BenchResult:
+    def __init__(self, name, scene, backend, wall_s, cpu_s):
+        self.name = name
+        procs = [p for p in scene.procs if p.appear_s < wall_s]
+        self.shown = len(procs)
+        latencies = sorted(p.latency for p in procs if p.latency is not None)
+        self.pressed = len(latencies)
+        self.missed = self.shown - self.pressed
+        self.latencies_ms = np.array(latencies) * 1000
+        self.spurious = len(scene.unmatched_keys) # Presses that cleared no proc (repeats, false positives)
+        self.inputs = len(backend.events) # Everything injected, presses included
+        self.wall_s = wall_s
+        self.frames = scene.grabs
+        self.cpu_percent = 100 * cpu_s / wall_s if wall_s else 0.0
+
+    def row(self):
+        lat = self.latencies_ms
+        stats = (f"{lat.mean():7.1f} {np.percentile(lat, 50):7.1f} {np.percentile(lat, 95):7.1f} {lat.max():7.1f}"
+                 if len(lat) else f"{'-':>7} {'-':>7} {'-':>7} {'-':>7}")
+        return (f"{self.name:12s} {self.pressed:4d}/{self.shown:<4d} {self.missed:6d} {self.spurious:8d} {stats} "
+                f"{self.pressed / self.wall_s:8.2f} {self.frames / self.wall_s:8.1f} {self.cpu_percent:5.0f}%")
+
+
+HEADER = (f"{'benchmark':12s} {'pressed':>9s} {'missed':>6s} {'spurious':>8s} {'mean':>7s} {'p50':>7s} {'p95':>7s} {'max':>7s} "
+          f"{'procs/s':>8s} {'frames/s':>8s} {'CPU':>6s}\n"
+          f"{'':12s} {'':>9s} {'':>6s} {'':>8s} {'detection->keypress latency (ms)':>31s}")
+
+
+def _run(name, duration_s, proc_every_s, seed, search_mode, body):
+    scene, listeners, template_cache = build_scenario(duration_s, proc_every_s, seed, search_mode)
+    backend = HeadlessBackend(scene)
+    install_backend(backend)
+    warm_up(scene, listeners)
+    scene.grabs = 0
+    cpu_started = time.process_time()
+    scene.start()
+    with contextlib.redirect_stdout(io.StringIO()): # The watchers narrate every press
+        body(scene, listeners, template_cache, duration_s)
+    return BenchResult(name, scene, backend, scene.now(), time.process_time() - cpu_started)
+
+
+# --- Watchers Under Test ---
+# Each runs an app's own watch loop (watchers.py, sequence_plan.py) with the scene as its frame source
+def _listener_watch(scene, listeners, duration_s):
+    # The listener tool's watch session, set up like WoWAutomationApp._watch_loop; stops when the scene time is up
+    from frame_diff import FrameDiff
+    from governor import ScanGovernor
+    from instrumentation import WatchMetrics
+    from scheduler import ListenerScheduler
+    from tracking import LocationTracker
+    from watchers import ListenerWatch
+    active = threading.Event()
+    active.set()
+    threading.Timer(max(0.0, duration_s - scene.now()), active.clear).start()
+    return ListenerWatch(listeners, scene, lambda l: l["template"], active, LocationTracker(), FrameDiff(), ListenerScheduler(),
+                         ScanGovernor(), WatchMetrics())
+
+
+def _pipelined(scene, listeners, template_cache, duration_s):
+    # The listener tool's pipelined watch mode: capture, match and press threads, frame diffing, location
+    # tracking, listener scheduling and the scan governor
+    _listener_watch(scene, listeners, duration_s).run_pipelined()
+
+
+def _serial(scene, listeners, template_cache, duration_s):
+    # The listener tool's serial watch mode: each listener grabs just its search area, one after another
+    _listener_watch(scene, listeners, duration_s).run_serial()
+
+
+def _monitor(scene, listeners, template_cache, duration_s):
+    # The WA monitor's listener loop: the highest priority icon on screen wins, presses go to the actuator thread
+    from governor import ScanGovernor
+    from watchers import monitor_icons
+    monitored = [{"name": l["name"], "priority": slot, "active": True,
+                  "object_data": {"type": "icon", "image_path": l["template"].path, "confidence": l["confidence"], "keybind": l["keybind_raw"],
+                                  "capture_coords": l["capture_coords"], "search_mode": l["search_mode"], "search_margin": l["search_margin"]}}
+                 for slot, l in enumerate(listeners)]
+    monitor_icons(monitored, scene, template_cache, ScanGovernor(BENCH_MONITOR_LATENCY_MS), lambda: scene.now() < duration_s,
+                  BENCH_PRESS_SETTLE_S)
+
+
+def _sequence(scene, listeners, template_cache, duration_s):
+    # An Automation maker rotation run by the real step compiler and step loop: one If Image Found per icon,
+    # jumping to that icon's Press Key (then back to the top), and a short Wait when nothing is up
+    from pixel_probe import PixelProbe
+    from sequence_plan import compile_sequence, SequenceRun, SequenceCancelled, run_pass
+    count = len(listeners)
+    objects = {}
+    steps = []
+    presses = []
+    for i, listener in enumerate(listeners):
+        objects[listener["name"]] = {"type": "image", "image_path": listener["template"].path, "confidence": listener["confidence"],
+                                     "capture_coords": listener["capture_coords"], "search_mode": listener["search_mode"],
+                                     "search_margin": listener["search_margin"]}
+        press_step = count + 3 + 2 * i # 1-based, after the checks, the Wait and the Goto
+        steps.append({"action": "If Image Found", "object_name": "_control_",
+                      "params": {"condition_object_name": listener["name"], "then_step": press_step}})
+        presses += [{"action": "Press Key", "object_name": None, "params": {"key_to_press": listener["keybind_raw"]}},
+                    {"action": "Goto Step", "object_name": "_control_", "params": {"target_step": 1}}]
+    steps += [{"action": "Wait", "object_name": None, "params": {"duration_s": BENCH_SEQUENCE_POLL_S}},
+              {"action": "Goto Step", "object_name": "_control_", "params": {"target_step": 1}}] + presses
+    plan = compile_sequence(steps, objects, template_cache, {})
+    if plan.errors: raise ValueError("Benchmark sequence does not compile: " + "; ".join(plan.errors))
+    try:
+        run_pass(plan, SequenceRun(time.sleep, PixelProbe(scene), scene), lambda: scene.now() >= duration_s)
+    except SequenceCancelled:
+        pass # Time is up
+
+
+BENCHMARKS = {"pipelined": _pipelined, "serial": _serial, "monitor": _monitor, "sequence": _sequence}
+
+
+def run_benchmarks(names=tuple(BENCHMARKS), duration_s=BENCH_DURATION_S, proc_every_s=BENCH_PROC_EVERY_S, seed=0, search_mode="margin"):
+    return [_run(name, duration_s, proc_every_s, seed, search_mode, BENCHMARKS[name]) for name in names]
+
+
+if __name__ == "__main__":
+    # End-to-end latency and throughput without a display: python benchmark_watchers.py [--duration 10]
+    parser = argparse.ArgumentParser(description="Headless end-to-end benchmarks of the icon watchers and sequence runner.")
+    parser.add_argument("benchmarks", nargs="*", help=f"any of {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--duration", type=float, default=BENCH_DURATION_S, help="seconds per benchmark")
+    parser.add_argument("--proc-every", type=float, default=BENCH_PROC_EVERY_S, help="mean seconds between procs")
+    parser.add_argument("--seed", type=int, default=0, help="proc schedule seed (same seed, same schedule)")
+    parser.add_argument("--search", choices=("margin", "roi", "full"), default="margin", help="listener search area")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown: parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    print(HEADER)
+    for name in args.benchmarks or BENCHMARKS:
+        print(_run(name, args.duration, args.proc_every, args.seed, args.search, BENCHMARKS[name]).row(), flush=True)
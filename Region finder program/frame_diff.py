@@ -0,0 +1,132 @@
+import time
+
+import numpy as np
+
+
+DIRTY_TILE_SIZE = 32 # Side of the square tiles consecutive captures are compared in, in pixels
+DIRTY_TILE_THRESHOLD = 0 # Sum of absolute RGB differences a tile may have and still count as unchanged (0 = exact)
+
+
+def _row_words(pixels, tile_size):
+    # (height, width, 3) uint8 -> 2D view with one row per pixel row, in the widest unsigned words that divide
+    # both a row and a tile's width in bytes, plus the number of words per tile; comparing words is far cheaper
+    rows = pixels.reshape(pixels.shape[0], -1)
+    tile_bytes = tile_size * 3
+    for dtype in (np.uint64, np.uint32, np.uint16):
+        size = np.dtype(dtype).itemsize
+        if rows.shape[1] % size == 0 and tile_bytes % size == 0:
+            return rows.view(dtype), tile_bytes // size
+    return rows, tile_bytes
+
+
+def changed_tiles(previous, current, tile_size=DIRTY_TILE_SIZE):
+    # Bool grid: True for every tile_size x tile_size tile where two equally sized RGB uint8 arrays differ at all
+    old, words_per_tile = _row_words(previous, tile_size)
+    new, _ = _row_words(current, tile_size)
+    differs = (old != new).view(np.uint8)
+    per_row = np.maximum.reduceat(differs, np.arange(0, differs.shape[1], words_per_tile), axis=1)
+    return np.maximum.reduceat(per_row, np.arange(0, differs.shape[0], tile_size), axis=0).astype(bool)
+
+
+def tile_differences(previous, current, tile_size=DIRTY_TILE_SIZE):
+    # Sum of absolute differences of two equally sized RGB uint8 arrays, per tile_size x tile_size tile
+    old = previous.reshape(previous.shape[0], -1)
+    new = current.reshape(current.shape[0], -1)
+    absdiff = np.maximum(old, new)
+    absdiff -= np.minimum(old, new) # uint8 |a - b| without overflow
+    per_row = np.add.reduceat(absdiff, np.arange(0, absdiff.shape[1], tile_size * 3), axis=1, dtype=np.uint32)
+    return np.add.reduceat(per_row, np.arange(0, absdiff.shape[0], tile_size), axis=0)
+
+
+class FrameDiff:
+    """Finds which tiles of the screen changed since the previous capture, and replays match results for
+    searches that only cover unchanged tiles.
+
+    A search over identical pixels with identical settings gives an identical result, so a listener whose
+    search area did not change since its last check can reuse that check's result instead of matching again.
+    """
+
+    def __init__(self, tile_size=DIRTY_TILE_SIZE, threshold=DIRTY_TILE_THRESHOLD):
+        self.tile_size = tile_size
+        self.threshold = threshold
+        self._previous = None # Last Frame passed to update()
+        self._dirty = None # Bool grid, one entry per tile; None means everything changed
+        self._results = {} # key -> (region, settings, result) of the last real match
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.dirty_tiles = 0 # Summed over frames, for the changed-tile share
+        self.total_tiles = 0
+        self.diff_time = 0.0
+        self.skipped = 0 # Checks answered from a previous result
+        self.matched = 0
+
+    def forget(self):
+        self._previous = None
+        self._dirty = None
+        self._results.clear()
+
+    def update(self, frame):
+        # Compares a new capture with the previous one; call once per capture, before any lookup()
+        started = time.perf_counter()
+        previous = self._previous
+        if previous is None or previous.region != frame.region:
+            self._dirty = None
+            self._results.clear() # Different area or size: nothing can be reused
+        elif previous.pixels is frame.pixels: # Sources that return their cached array for a repeated frame
+            t = self.tile_size
+            self._dirty = np.zeros((-(-frame.height // t), -(-frame.width // t)), dtype=bool)
+            self.total_tiles += self._dirty.size
+        else:
+            if self.threshold:
+                self._dirty = tile_differences(previous.pixels, frame.pixels, self.tile_size) > self.threshold
+            else:
+                self._dirty = changed_tiles(previous.pixels, frame.pixels, self.tile_size)
+            self.dirty_tiles += int(self._dirty.sum())
+            self.total_tiles += self._dirty.size
+        self._previous = frame
+        # A remembered result stays valid only while every capture since it left its area untouched
+        self._results = {key: entry for key, entry in self._results.items() if self.unchanged(entry[0])}
+        self.frames += 1
+        self.diff_time += time.perf_counter() - started
+
+    def unchanged(self, region=None):
+        # True if every tile overlapping region (screen coordinates; None = whole frame) is unchanged
+        if self._dirty is None or self._previous is None:
+            return False
+        frame = self._previous
+        if region is None:
+            return not self._dirty.any()
+        x1 = max(region[0], frame.left) - frame.left
+        y1 = max(region[1], frame.top) - frame.top
+        x2 = min(region[0] + region[2], frame.left + frame.width) - frame.left
+        y2 = min(region[1] + region[3], frame.top + frame.height) - frame.top
+        if x2 <= x1 or y2 <= y1:
+            return True # Nothing of the region is on the frame, so nothing in it can have changed
+        t = self.tile_size
+        return not self._dirty[y1 // t:(y2 - 1) // t + 1, x1 // t:(x2 - 1) // t + 1].any()
+
+    def lookup(self, key, region, settings):
+        # (True, result) if key's last match searched the same region with the same settings and that
+        # region has not changed since; otherwise (False, None) and the caller matches and calls remember()
+        entry = self._results.get(key)
+        if entry is not None and entry[0] == region and entry[1] == settings:
+            self.skipped += 1
+            return True, entry[2]
+        self.matched += 1
+        return False, None
+
+    def remember(self, key, region, settings, result):
+        self._results[key] = (region, settings, result)
+
+    def skip_rate(self):
+        checks = self.skipped + self.matched
+        return self.skipped / checks if checks else 0.0
+
+    def summary(self):
+        checks = self.skipped + self.matched
+        changed = self.dirty_tiles / self.total_tiles if self.total_tiles else 1.0
+        diff_ms = self.diff_time * 1000 / self.frames if self.frames else 0.0
+        return (f"frame diff: {self.skip_rate():.0%} of {checks} checks skipped (area unchanged), "
+                f"{changed:.1%} of tiles changed, {diff_ms:.1f} ms/frame")
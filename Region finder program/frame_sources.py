@@ -0,0 +1,392 @@
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+# Optional fast grabber (raw XGetImage/XShm on X11, BitBlt on Windows): pip install mss
+try:
+    import mss
+except ImportError:
+    mss = None
+
+# Optional, only needed to replay video files rather than folders of frames
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# pyautogui needs a display at import time on Linux, so the replay and synthetic
+# backends must keep working without it (headless runs against recorded footage)
+try:
+    import pyautogui
+except Exception:
+    pyautogui = None
+
+
+REPLAY_IMAGE_EXTENSIONS = (".png", ".bmp", ".jpg", ".jpeg")
+REPLAY_VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov")
+
+
+# --- Frames ---
+class Frame:
+    """One capture of the screen (or part of it) as an RGB uint8 array of shape (height, width, 3)."""
+
+    def __init__(self, pixels, left=0, top=0, timestamp=None):
+        self.pixels = pixels
+        self.left = left # Screen position of pixels[0, 0]
+        self.top = top
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self._image = None
+
+    @property
+    def width(self):
+        return self.pixels.shape[1]
+
+    @property
+    def height(self):
+        return self.pixels.shape[0]
+
+    @property
+    def region(self):
+        return (self.left, self.top, self.width, self.height)
+
+    def to_image(self):
+        # PIL view of the frame for APIs that want an Image (pyscreeze, saving)
+        if self._image is None:
+            self._image = Image.fromarray(self.pixels)
+        return self._image
+
+    def pixel(self, x, y):
+        # (x, y) are screen coordinates, like pyautogui.pixel
+        r, g, b = self.pixels[y - self.top, x - self.left]
+        return (int(r), int(g), int(b))
+
+    def crop(self, region):
+        # region is (left, top, width, height) in screen coordinates; clipped to the frame.
+        # Returns a Frame sharing memory with this one, or None if the region lies outside it.
+        x1 = max(region[0], self.left)
+        y1 = max(region[1], self.top)
+        x2 = min(region[0] + region[2], self.left + self.width)
+        y2 = min(region[1] + region[3], self.top + self.height)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        pixels = self.pixels[y1 - self.top:y2 - self.top, x1 - self.left:x2 - self.left]
+        return Frame(pixels, x1, y1, self.timestamp)
+
+
+def image_to_pixels(image):
+    # PIL image (any mode) -> contiguous RGB uint8 array
+    return np.asarray(image.convert("RGB"))
+
+
+def rgb_to_gray(pixels):
+    # RGB uint8 array -> float32 luma (ITU-R 601 weights, same as PIL "L" and OpenCV)
+    return pixels[..., 0] * np.float32(0.299) + pixels[..., 1] * np.float32(0.587) + pixels[..., 2] * np.float32(0.114)
+
+
+# --- Frame Source Backends ---
+class FrameSource:
+    name = "base"
+    description = ""
+
+    @classmethod
+    def is_available(cls):
+        return True
+
+    def grab(self, region=None):
+        # region is (left, top, width, height) in screen coordinates; None grabs the whole screen
+        raise NotImplementedError
+
+    def screen_size(self):
+        frame = self.grab()
+        return (frame.width, frame.height)
+
+    def close(self):
+        pass
+
+
+class PyAutoGUIFrameSource(FrameSource):
+    name = "pyautogui"
+    description = "pyautogui.screenshot (default)"
+
+    @classmethod
+    def is_available(cls):
+        return pyautogui is not None
+
+    def grab(self, region=None):
+        image = pyautogui.screenshot(region=tuple(region) if region else None)
+        left, top = (region[0], region[1]) if region else (0, 0)
+        return Frame(image_to_pixels(image), left, top)
+
+    def screen_size(self):
+        width, height = pyautogui.size()
+        return (width, height)
+
+
+class MSSFrameSource(FrameSource):
+    name = "mss"
+    description = "mss raw grabber (fast)"
+
+    def __init__(self, monitor=1):
+        self.monitor = monitor # mss numbering: 0 is all monitors combined, 1 the primary
+        self._local = threading.local() # mss handles must not be shared between threads
+
+    @classmethod
+    def is_available(cls):
+        return mss is not None
+
+    def _handle(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None:
+            sct = mss.mss()
+            self._local.sct = sct
+        return sct
+
+    def grab(self, region=None):
+        sct = self._handle()
+        if region is None:
+            monitor = sct.monitors[self.monitor]
+            area = {"left": monitor["left"], "top": monitor["top"], "width": monitor["width"], "height": monitor["height"]}
+        else:
+            area = {"left": int(region[0]), "top": int(region[1]), "width": int(region[2]), "height": int(region[3])}
+        shot = sct.grab(area)
+        bgra = np.frombuffer(shot.bgra, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        pixels = np.ascontiguousarray(bgra[:, :, 2::-1]) # BGRA -> RGB
+        return Frame(pixels, area["left"], area["top"])
+
+    def screen_size(self):
+        monitor = self._handle().monitors[self.monitor]
+        return (monitor["width"], monitor["height"])
+
+    def close(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is not None:
+            sct.close()
+            self._local.sct = None
+
+
+class ReplayFrameSource(FrameSource):
+    name = "replay"
+    description = "Replay a folder of frames or a video file"
+
+    def __init__(self, path, loop=True, fps=None):
+        # fps=None serves the next frame on every grab; otherwise frames follow the wall clock
+        self.path = path
+        self.loop = loop
+        self.fps = fps
+        self._lock = threading.Lock()
+        self._index = 0
+        self._started_at = None
+        self._cached_index = None
+        self._cached_pixels = None
+        self._video = None
+        if os.path.isdir(path):
+            self.frame_files = sorted(os.path.join(path, f) for f in os.listdir(path)
+                                      if f.lower().endswith(REPLAY_IMAGE_EXTENSIONS))
+            if not self.frame_files:
+                raise ValueError(f"No image frames found in '{path}'.")
+            self.frame_count = len(self.frame_files)
+        elif path.lower().endswith(REPLAY_VIDEO_EXTENSIONS):
+            if cv2 is None:
+                raise ValueError("Replaying video files needs OpenCV (pip install opencv-python).")
+            self._video = cv2.VideoCapture(path)
+            if not self._video.isOpened():
+                raise ValueError(f"Could not open video '{path}'.")
+            self.frame_files = []
+            self.frame_count = int(self._video.get(cv2.CAP_PROP_FRAME_COUNT))
+            if self.fps is None and self._video.get(cv2.CAP_PROP_FPS) > 0:
+                self.fps = self._video.get(cv2.CAP_PROP_FPS)
+        else:
+            raise ValueError(f"'{path}' is not a folder of frames or a supported video file.")
+
+    def _next_index(self):
+        if self.fps:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            index = int((time.monotonic() - self._started_at) * self.fps)
+        else:
+            index = self._index
+            self._index += 1
+        if self.loop and self.frame_count:
+            return index % self.frame_count
+        return min(index, self.frame_count - 1)
+
+    def _load(self, index):
+        if index == self._cached_index:
+            return self._cached_pixels
+        if self._video is not None:
+            if index != (self._cached_index or 0) + 1:
+                self._video.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ok, bgr = self._video.read()
+            if not ok:
+                raise ValueError(f"Could not read frame {index} from '{self.path}'.")
+            pixels = np.ascontiguousarray(bgr[:, :, ::-1])
+        else:
+            with Image.open(self.frame_files[index]) as image:
+                pixels = image_to_pixels(image)
+        self._cached_index = index
+        self._cached_pixels = pixels
+        return pixels
+
+    def grab(self, region=None):
+        with self._lock:
+            index = self._next_index()
+            frame = Frame(self._load(index))
+        if region is not None:
+            cropped = frame.crop(region)
+            if cropped is None:
+                raise ValueError(f"Region {region} is outside the replayed frames.")
+            return cropped
+        return frame
+
+    def screen_size(self):
+        with self._lock:
+            pixels = self._load(self._cached_index if self._cached_index is not None else 0)
+        return (pixels.shape[1], pixels.shape[0])
+
+    def close(self):
+        if self._video is not None:
+            self._video.release()
+            self._video = None
+
+
+class SyntheticFrameSource(FrameSource):
+    name = "synthetic"
+    description = "Generated scene (headless testing)"
+
+    def __init__(self, width=1920, height=1080, background=(32, 32, 32), noise=0, seed=0):
+        self.width = width
+        self.height = height
+        self.noise = noise # Amplitude of per-frame random noise, 0 for a static background
+        self._rng = np.random.default_rng(seed)
+        if isinstance(background, np.ndarray):
+            self.background = np.ascontiguousarray(background[:height, :width, :3], dtype=np.uint8)
+        else:
+            self.background = np.empty((height, width, 3), dtype=np.uint8)
+            self.background[:] = background
+        self.sprites = []
+        self.frame_index = 0
+        self._started_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add_sprite(self, pixels, x, y, visible=None):
+        # pixels: RGB array or PIL image drawn with its top-left at (x, y).
+        # visible: optional callable(frame_index, elapsed_s) -> bool deciding when it is drawn.
+        if isinstance(pixels, Image.Image):
+            pixels = image_to_pixels(pixels)
+        sprite = {"pixels": pixels, "x": x, "y": y, "visible": visible}
+        with self._lock:
+            self.sprites.append(sprite)
+        return sprite
+
+    def render(self, frame_index, elapsed_s):
+        canvas = self.background.copy()
+        if self.noise:
+            jitter = self._rng.integers(-self.noise, self.noise + 1, size=canvas.shape, dtype=np.int16)
+            canvas = np.clip(canvas.astype(np.int16) + jitter, 0, 255).astype(np.uint8)
+        for sprite in self.sprites:
+            if sprite["visible"] is not None and not sprite["visible"](frame_index, elapsed_s):
+                continue
+            h, w = sprite["pixels"].shape[:2]
+            x, y = sprite["x"], sprite["y"]
+            x2, y2 = min(x + w, self.width), min(y + h, self.height)
+            if x2 > x and y2 > y:
+                canvas[y:y2, x:x2] = sprite["pixels"][:y2 - y, :x2 - x, :3]
+        return canvas
+
+    def grab(self, region=None):
+        with self._lock:
+            frame_index = self.frame_index
+            self.frame_index += 1
+            frame = Frame(self.render(frame_index, time.monotonic() - self._started_at))
+        if region is not None:
+            cropped = frame.crop(region)
+            if cropped is None:
+                raise ValueError(f"Region {region} is outside the synthetic screen.")
+            return cropped
+        return frame
+
+    def screen_size(self):
+        return (self.width, self.height)
+
+
+FRAME_SOURCES = {
+    PyAutoGUIFrameSource.name: PyAutoGUIFrameSource,
+    MSSFrameSource.name: MSSFrameSource,
+    ReplayFrameSource.name: ReplayFrameSource,
+    SyntheticFrameSource.name: SyntheticFrameSource,
+}
+
+
+def available_frame_sources():
+    return [name for name, source_class in FRAME_SOURCES.items() if source_class.is_available()]
+
+
+def create_frame_source(name, **options):
+    source_class = FRAME_SOURCES.get(name)
+    if source_class is None:
+        raise ValueError(f"Unknown frame source '{name}'. Choose from: {', '.join(FRAME_SOURCES)}")
+    if not source_class.is_available():
+        raise ValueError(f"Frame source '{name}' is not available (missing library).")
+    return source_class(**options)
+
+
+# --- Change Detection ---
+class ChangeDetector:
+    """Grabs one screen region over and over and tells whether its pixels changed since the last grab.
+
+    Waiters re-run their (expensive) check only on frames where something changed; identical frames are
+    skipped after a cheap array comparison.
+    """
+
+    def __init__(self, frame_source, region=None):
+        self.frame_source = frame_source
+        self.region = region # (left, top, width, height); None watches the whole screen
+        self._last_pixels = None
+        self.grabs = 0 # For diagnostics
+        self.changes = 0
+
+    def grab(self):
+        # Returns (frame, changed); the first grab always counts as a change
+        frame = self.frame_source.grab(region=self.region)
+        self.grabs += 1
+        last = self._last_pixels
+        changed = last is None or (frame.pixels is not last and not np.array_equal(frame.pixels, last))
+        if changed:
+            self.changes += 1
+            self._last_pixels = frame.pixels
+        return frame, changed
+
+    def reset(self):
+        self._last_pixels = None
+
+
+# --- Benchmarking ---
+def benchmark_frame_source(source, duration_s=2.0, region=None):
+    # Grabs frames back to back for duration_s and reports throughput
+    source.grab(region) # Warm-up (lazy handles, first-frame decode)
+    frames = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration_s:
+        source.grab(region)
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return {"source": source.name, "frames": frames, "fps": frames / elapsed, "ms_per_frame": elapsed * 1000 / frames}
+
+
+if __name__ == "__main__":
+    # Compare live capture backends on this machine: python frame_sources.py
+    for source_name in ("pyautogui", "mss"):
+        if source_name not in available_frame_sources():
+            print(f"{source_name:10s} not available")
+            continue
+        frame_source = create_frame_source(source_name)
+        try:
+            result = benchmark_frame_source(frame_source)
+            print(f"{source_name:10s} {result['fps']:7.1f} fps  {result['ms_per_frame']:6.2f} ms/frame")
+        except Exception as e:
+            print(f"{source_name:10s} failed: {e}")
+        finally:
+            frame_source.close()
@@ -0,0 +1,50 @@
+import numpy as np
+from PIL import Image, ImageTk
+
+
+CAPTURE_HIDE_DELAY_MS = 150 # Time the window manager gets to take our own window off screen before freezing; the Tk loop keeps running
+
+
+# --- Frozen Screen ---
+class FrozenScreen:
+    """The whole screen, captured once when a capture mode starts. The selection overlay shows it as its
+    background and the selection is cropped from it in memory, so the saved pixels are exactly what was on
+    screen at that instant, however long the drag takes."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._photo = None # Tk image for the overlay; Tk only draws it while something holds a reference
+
+    @classmethod
+    def take(cls, frame_source):
+        return cls(frame_source.grab())
+
+    def crop(self, region):
+        # region is (left, top, width, height) in screen coordinates -> PIL image of that part of the frozen screen
+        cropped = self.frame.crop(region)
+        if cropped is None:
+            raise ValueError(f"Selection {tuple(region)} is outside the captured screen.")
+        return Image.fromarray(np.ascontiguousarray(cropped.pixels))
+
+    def show_on(self, canvas):
+        # Draws the frozen screen under everything else on a canvas that covers the screen from (0, 0)
+        self._photo = ImageTk.PhotoImage(self.frame.to_image(), master=canvas)
+        canvas.create_image(self.frame.left, self.frame.top, image=self._photo, anchor="nw", tags="frozen_screen")
+        canvas.tag_lower("frozen_screen")
+
+
+def freeze_after_hiding(root, frame_source, on_frozen, on_error):
+    # For capture modes started from our own window: hides root, freezes the screen once it is gone and calls
+    # on_frozen(FrozenScreen) on the Tk thread. Scheduled with after() rather than slept, so Tk never blocks.
+    root.withdraw()
+
+    def freeze():
+        try:
+            frozen = FrozenScreen.take(frame_source)
+        except Exception as e:
+            root.deiconify()
+            on_error(e)
+            return
+        on_frozen(frozen)
+
+    root.after(CAPTURE_HIDE_DELAY_MS, freeze)
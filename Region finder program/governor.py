@@ -0,0 +1,82 @@
+import threading
+import time
+
+
+GOVERNOR_TARGET_LATENCY_MS = 150 # How long an icon may be on screen before it is detected
+GOVERNOR_MAX_CPU_PERCENT = 25 # Share of one core the watcher's scan cycles may use
+GOVERNOR_HIT_HOLD_S = 2.0 # After a hit, scanning stays at its fastest for this long
+GOVERNOR_RELAX_S = 10.0 # Quiet time over which the interval relaxes from fastest to the latency limit
+GOVERNOR_SMOOTHING = 0.2 # Weight of the newest cycle in the moving average of the cycle cost
+GOVERNOR_CPU_SAMPLE_S = 1.0 # Seconds between measurements of the process CPU usage
+
+
+class ScanGovernor:
+    """Chooses the pause between scan cycles from what a cycle actually costs on this machine.
+
+    The CPU limit sets the shortest pause: cost / (cost + pause) must stay under the allowed share. The
+    latency target sets the longest: an icon appearing just after a cycle started is seen by the next one,
+    after pause + cost. Right after a hit the governor scans as fast as the CPU limit allows; while nothing
+    is found the pause relaxes towards the latency limit. The CPU limit always wins if the two conflict.
+    """
+
+    def __init__(self, target_latency_ms=GOVERNOR_TARGET_LATENCY_MS, max_cpu_percent=GOVERNOR_MAX_CPU_PERCENT):
+        self.set_limits(target_latency_ms, max_cpu_percent)
+        self.cycle_cost = None # Moving average of a cycle's busy time, in seconds
+        self.current_interval = 0.0 # Last interval handed out, for display
+        self.cpu_percent = 0.0 # Measured process CPU usage (all threads), in % of one core
+        self._last_hit = None
+        self._started = time.monotonic()
+        self._cpu_sample = (time.monotonic(), time.process_time())
+        self._lock = threading.Lock()
+
+    def set_limits(self, target_latency_ms, max_cpu_percent):
+        # May be called while watching; the next interval() uses the new limits
+        self.target_latency = max(0.0, target_latency_ms / 1000)
+        self.max_cpu = min(max(max_cpu_percent, 1), 100) / 100
+
+    def record_cycle(self, busy_s):
+        # Busy time (capture + matching) of one scan cycle
+        with self._lock:
+            if self.cycle_cost is None:
+                self.cycle_cost = busy_s
+            else:
+                self.cycle_cost += GOVERNOR_SMOOTHING * (busy_s - self.cycle_cost)
+            self._sample_cpu()
+
+    def record_hit(self):
+        with self._lock:
+            self._last_hit = time.monotonic()
+
+    def _sample_cpu(self):
+        wall, cpu = time.monotonic(), time.process_time()
+        last_wall, last_cpu = self._cpu_sample
+        if wall - last_wall >= GOVERNOR_CPU_SAMPLE_S:
+            self.cpu_percent = 100 * (cpu - last_cpu) / (wall - last_wall)
+            self._cpu_sample = (wall, cpu)
+
+    def limits(self):
+        # (shortest pause the CPU limit allows, longest pause the latency target allows), in seconds
+        cost = self.cycle_cost or 0.0
+        cpu_floor = cost * (1 - self.max_cpu) / self.max_cpu
+        latency_ceiling = max(0.0, self.target_latency - cost)
+        return cpu_floor, latency_ceiling
+
+    def interval(self):
+        # Pause before the next scan cycle
+        with self._lock:
+            cpu_floor, latency_ceiling = self.limits()
+            since_hit = time.monotonic() - (self._last_hit if self._last_hit is not None else self._started - GOVERNOR_HIT_HOLD_S - GOVERNOR_RELAX_S)
+            quiet = min(max((since_hit - GOVERNOR_HIT_HOLD_S) / GOVERNOR_RELAX_S, 0.0), 1.0) # 0 right after a hit, 1 when quiet
+            self.current_interval = max(cpu_floor, cpu_floor + quiet * (latency_ceiling - cpu_floor))
+            return self.current_interval
+
+    def status(self):
+        # Short live text for the UI
+        cost_ms = (self.cycle_cost or 0.0) * 1000
+        return f"Interval {self.current_interval * 1000:.0f} ms | cycle {cost_ms:.1f} ms | CPU {self.cpu_percent:.0f}%"
+
+    def summary(self):
+        cpu_floor, latency_ceiling = self.limits()
+        return (f"governor: interval {self.current_interval * 1000:.0f} ms (CPU limit >= {cpu_floor * 1000:.0f} ms, "
+                f"latency target <= {latency_ceiling * 1000:.0f} ms), cycle {(self.cycle_cost or 0.0) * 1000:.1f} ms, "
+                f"CPU {self.cpu_percent:.0f}%")
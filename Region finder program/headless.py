@@ -0,0 +1,237 @@
+import sys
+import threading
+import time
+import types
+
+import numpy as np
+from PIL import Image
+
+from frame_sources import Frame, FrameSource, image_to_pixels
+
+
+HEADLESS_SCREEN_SIZE = (1920, 1080)
+ACTION_BAR_SLOTS = 12
+ACTION_BAR_SLOT_SIZE = 64 # Pixels; icons are drawn centred in their slot at their own size
+ACTION_BAR_GAP = 6
+ACTION_BAR_BOTTOM_MARGIN = 40 # Distance of the bar from the bottom of the screen
+PROC_DEFAULT_LIFETIME_S = 2.0 # A proc nobody presses disappears after this long and counts as missed
+
+
+class HeadlessFailSafeException(Exception):
+    pass
+
+
+# --- Scripted Scene ---
+class Proc:
+    """One scripted icon appearance: drawn over an action bar slot from appear_s (scene time) until its key is
+    pressed or it expires."""
+
+    def __init__(self, name, pixels, slot, key, appear_s, lifetime_s=PROC_DEFAULT_LIFETIME_S):
+        self.name = name
+        self.pixels = pixels
+        self.slot = slot
+        self.key = key
+        self.appear_s = appear_s
+        self.expire_s = appear_s + lifetime_s
+        self.pressed_s = None # Scene time of the key press that cleared it
+
+    def visible(self, now):
+        return self.appear_s <= now < self.expire_s and self.pressed_s is None
+
+    @property
+    def latency(self):
+        return self.pressed_s - self.appear_s if self.pressed_s is not None else None
+
+
+class ActionBarScene(FrameSource):
+    """A synthetic game screen: a textured background with an action bar, on which scripted procs light up
+    icons until the matching key is pressed. Time starts at start(); the scene is also a FrameSource, so the
+    watchers can capture from it directly."""
+    name = "headless"
+    description = "Scripted action bar scene (no display needed)"
+
+    def __init__(self, width=HEADLESS_SCREEN_SIZE[0], height=HEADLESS_SCREEN_SIZE[1], slots=ACTION_BAR_SLOTS, seed=0):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        rng = np.random.default_rng(seed)
+        # Smooth gradient plus low-amplitude texture, so nothing on screen is flat or accidentally icon-like
+        ys, xs = np.mgrid[0:height, 0:width]
+        base = np.stack([40 + 30 * xs / width, 35 + 25 * ys / height, 50 + 20 * (xs + ys) / (width + height)], axis=-1)
+        self.background = np.clip(base + rng.integers(-6, 7, size=(height, width, 3)), 0, 255).astype(np.uint8)
+        for slot in range(slots):
+            x, y, w, h = self.slot_box(slot)
+            self.background[y:y + h, x:x + w] = rng.integers(10, 30, size=3, dtype=np.uint8) # Empty, dark slot
+        self.procs = []
+        self.unmatched_keys = [] # (scene time, key) of presses that cleared no proc
+        self.grabs = 0
+        self._started = None
+        self._lock = threading.Lock()
+
+    def slot_box(self, slot):
+        bar_width = self.slots * ACTION_BAR_SLOT_SIZE + (self.slots - 1) * ACTION_BAR_GAP
+        x = (self.width - bar_width) // 2 + slot * (ACTION_BAR_SLOT_SIZE + ACTION_BAR_GAP)
+        y = self.height - ACTION_BAR_BOTTOM_MARGIN - ACTION_BAR_SLOT_SIZE
+        return (x, y, ACTION_BAR_SLOT_SIZE, ACTION_BAR_SLOT_SIZE)
+
+    def add_proc(self, name, icon, slot, key, appear_s, lifetime_s=PROC_DEFAULT_LIFETIME_S):
+        # icon: RGB array or PIL image, at most ACTION_BAR_SLOT_SIZE on each side
+        pixels = image_to_pixels(icon) if isinstance(icon, Image.Image) else icon
+        proc = Proc(name, pixels[:ACTION_BAR_SLOT_SIZE, :ACTION_BAR_SLOT_SIZE], slot, key, appear_s, lifetime_s)
+        with self._lock:
+            self.procs.append(proc)
+        return proc
+
+    def start(self):
+        self._started = time.perf_counter()
+
+    def now(self):
+        # Seconds since start()
+        return time.perf_counter() - self._started if self._started is not None else 0.0
+
+    def render(self, now):
+        canvas = self.background.copy()
+        with self._lock:
+            visible = [p for p in self.procs if p.visible(now)]
+        for proc in visible:
+            x, y, w, h = self.slot_box(proc.slot)
+            ph, pw = proc.pixels.shape[:2]
+            top, left = y + (h - ph) // 2, x + (w - pw) // 2
+            canvas[top:top + ph, left:left + pw] = proc.pixels[:, :, :3]
+        return canvas
+
+    def grab(self, region=None):
+        now = self.now()
+        frame = Frame(self.render(now))
+        self.grabs += 1
+        if region is not None:
+            cropped = frame.crop(region)
+            if cropped is None:
+                raise ValueError(f"Region {region} is outside the headless screen.")
+            return cropped
+        return frame
+
+    def screen_size(self):
+        return (self.width, self.height)
+
+    def key_pressed(self, key, now=None):
+        # Clears the oldest visible proc bound to key; presses that clear nothing are remembered
+        now = self.now() if now is None else now
+        with self._lock:
+            for proc in sorted(self.procs, key=lambda p: p.appear_s):
+                if proc.key == key and proc.visible(now):
+                    proc.pressed_s = now
+                    return proc
+            self.unmatched_keys.append((now, key))
+        return None
+
+
+# --- pyautogui Stand-in ---
+class InputEvent:
+    def __init__(self, time_s, kind, value, position=None):
+        self.time = time_s # Scene time
+        self.kind = kind # "key", "hotkey", "type", "click", "move", "scroll", "hscroll"
+        self.value = value
+        self.position = position
+
+    def __repr__(self):
+        return f"InputEvent({self.time:.4f}, {self.kind!r}, {self.value!r}, {self.position})"
+
+
+class HeadlessBackend(types.ModuleType):
+    """Drop-in replacement for the parts of the pyautogui module these tools use, driven by an ActionBarScene
+    (or any FrameSource) instead of a display. Every injected key, click, scroll and mouse move is recorded
+    with its scene time in events; key presses are also passed to the scene so procs react to them."""
+
+    FailSafeException = HeadlessFailSafeException
+
+    def __init__(self, scene):
+        super().__init__("pyautogui")
+        self.scene = scene
+        self.events = []
+        self.FAILSAFE = False
+        self.PAUSE = 0.0
+        self._position = (0, 0)
+        self._lock = threading.Lock()
+
+    def _now(self):
+        return self.scene.now() if hasattr(self.scene, "now") else time.perf_counter()
+
+    def _record(self, kind, value, position=None):
+        event = InputEvent(self._now(), kind, value, position)
+        with self._lock:
+            self.events.append(event)
+        return event
+
+    def _key(self, key, kind="key"):
+        event = self._record(kind, key)
+        if hasattr(self.scene, "key_pressed"): self.scene.key_pressed(key, event.time)
+
+    # Screen
+    def size(self):
+        return self.scene.screen_size()
+
+    def screenshot(self, imageFilename=None, region=None):
+        image = self.scene.grab(region=tuple(region) if region else None).to_image()
+        if imageFilename: image.save(imageFilename)
+        return image
+
+    def pixel(self, x, y):
+        return self.scene.grab(region=(x, y, 1, 1)).pixel(x, y)
+
+    def position(self):
+        return self._position
+
+    def onScreen(self, x, y):
+        width, height = self.size()
+        return 0 <= x < width and 0 <= y < height
+
+    # Mouse
+    def moveTo(self, x=None, y=None, duration=0.0, **kwargs):
+        self._position = (x if x is not None else self._position[0], y if y is not None else self._position[1])
+        self._record("move", None, self._position)
+
+    def click(self, x=None, y=None, clicks=1, interval=0.0, button="left", duration=0.0, **kwargs):
+        if x is not None or y is not None: self._position = (x if x is not None else self._position[0], y if y is not None else self._position[1])
+        for _ in range(clicks):
+            self._record("click", button, self._position)
+
+    def doubleClick(self, x=None, y=None, **kwargs):
+        self.click(x, y, clicks=2, **kwargs)
+
+    def rightClick(self, x=None, y=None, **kwargs):
+        self.click(x, y, button="right", **kwargs)
+
+    def scroll(self, clicks, x=None, y=None, **kwargs):
+        self._record("scroll", clicks, (x, y) if x is not None else self._position)
+
+    def hscroll(self, clicks, x=None, y=None, **kwargs):
+        self._record("hscroll", clicks, (x, y) if x is not None else self._position)
+
+    # Keyboard
+    def press(self, keys, presses=1, interval=0.0, **kwargs):
+        for _ in range(presses):
+            for key in ([keys] if isinstance(keys, str) else keys):
+                self._key(key)
+
+    def hotkey(self, *keys, **kwargs):
+        self._key("+".join(keys), kind="hotkey")
+
+    def keyDown(self, key, **kwargs):
+        self._record("keydown", key)
+
+    def keyUp(self, key, **kwargs):
+        self._record("keyup", key)
+
+    def typewrite(self, message, interval=0.0, **kwargs):
+        self._record("type", message if isinstance(message, str) else list(message))
+
+    write = typewrite
+
+
+def install_backend(backend):
+    # Makes `import pyautogui`, and every module that already imported it, use backend instead
+    sys.modules["pyautogui"] = backend
+    for module in list(sys.modules.values()):
+        if isinstance(module, types.ModuleType) and module is not backend and "pyautogui" in getattr(module, "__dict__", {}):
+            module.pyautogui = backend
@@ -0,0 +1,192 @@
+import json
+import threading
+import time
+
+
+SCORE_BINS = 20 # Histogram bins over best match scores 0..1 (scores below 0 count in the first bin)
+METRICS_REFRESH_MS = 1000 # How often the UI shows fresh numbers while watching
+METRICS_PREFIX = "watcher" # Prometheus metric name prefix
+
+
+class ListenerMetrics:
+    """Counters for one listener: how often it was checked and found, what its checks cost, how quickly
+    its keybind followed a detection, and how its best match scores are distributed."""
+
+    def __init__(self, name):
+        self.name = name
+        self.checks = 0
+        self.hits = 0
+        self.misses = 0
+        self.reused = 0 # Checks answered without matching (search area unchanged)
+        self.match_time = 0.0
+        self.match_max = 0.0
+        self.detections_pressed = 0 # Detections that led to at least one key press
+        self.presses = 0
+        self.press_latency = 0.0 # Summed detection -> first key press time
+        self.press_latency_max = 0.0
+        self.scores = [0] * SCORE_BINS
+        self.score_sum = 0.0
+        self.last_score = None
+
+    def record_check(self, seconds, found, score=None, reused=False):
+        self.checks += 1
+        if found: self.hits += 1
+        else: self.misses += 1
+        if reused: self.reused += 1
+        self.match_time += seconds
+        self.match_max = max(self.match_max, seconds)
+        if score is not None:
+            self.scores[min(max(int(score * SCORE_BINS), 0), SCORE_BINS - 1)] += 1
+            self.score_sum += score
+            self.last_score = score
+
+    def record_press(self, count, latency):
+        # count: key presses for one detection; latency: detection -> first press, None if nothing was pressed
+        self.presses += count
+        if latency is not None:
+            self.detections_pressed += 1
+            self.press_latency += latency
+            self.press_latency_max = max(self.press_latency_max, latency)
+
+    def mean_match_ms(self):
+        return self.match_time * 1000 / self.checks if self.checks else 0.0
+
+    def mean_latency_ms(self):
+        return self.press_latency * 1000 / self.detections_pressed if self.detections_pressed else 0.0
+
+    def to_dict(self):
+        return {"name": self.name, "checks": self.checks, "hits": self.hits, "misses": self.misses,
+                "reused": self.reused, "match_ms_total": round(self.match_time * 1000, 3),
+                "match_ms_mean": round(self.mean_match_ms(), 3), "match_ms_max": round(self.match_max * 1000, 3),
+                "presses": self.presses, "detections_pressed": self.detections_pressed,
+                "press_latency_ms_mean": round(self.mean_latency_ms(), 3),
+                "press_latency_ms_max": round(self.press_latency_max * 1000, 3),
+                "score_histogram": list(self.scores), "last_score": self.last_score}
+
+
+class WatchMetrics:
+    """Instrumentation for a watcher session: ListenerMetrics per listener plus per-cycle capture times.
+
+    Written to by the watcher threads and read by the UI, so every access takes the lock. Snapshots can be
+    appended to a JSONL file (one line per export, so repeated exports form a time series) or written as a
+    Prometheus text exposition file.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.listeners = {} # key -> ListenerMetrics
+            self.cycles = 0
+            self.capture_time = 0.0
+            self.capture_max = 0.0
+            self.started = time.time()
+
+    def _listener(self, key, name):
+        metrics = self.listeners.get(key)
+        if metrics is None:
+            metrics = self.listeners[key] = ListenerMetrics(name)
+        metrics.name = name # Follows renames
+        return metrics
+
+    def record_check(self, key, name, seconds, found, score=None, reused=False):
+        with self._lock:
+            self._listener(key, name).record_check(seconds, found, score, reused)
+
+    def record_press(self, key, name, count, latency):
+        with self._lock:
+            self._listener(key, name).record_press(count, latency)
+
+    def record_cycle(self, capture_s):
+        with self._lock:
+            self.cycles += 1
+            self.capture_time += capture_s
+            self.capture_max = max(self.capture_max, capture_s)
+
+    def get(self, key):
+        # Copy of a listener's counters as a dict, or None if it has not been checked yet
+        with self._lock:
+            metrics = self.listeners.get(key)
+            return metrics.to_dict() if metrics else None
+
+    def budget_shares(self):
+        # key -> share of all listeners' match time, to find the listeners eating the cycle budget
+        with self._lock:
+            total = sum(m.match_time for m in self.listeners.values())
+            return {key: (m.match_time / total if total else 0.0) for key, m in self.listeners.items()}
+
+    def snapshot(self):
+        with self._lock:
+            return {"time": time.time(), "elapsed_s": round(time.time() - self.started, 3), "cycles": self.cycles,
+                    "capture_ms_mean": round(self.capture_time * 1000 / self.cycles, 3) if self.cycles else 0.0,
+                    "capture_ms_max": round(self.capture_max * 1000, 3), "score_bins": SCORE_BINS,
+                    "listeners": {str(key): m.to_dict() for key, m in self.listeners.items()}}
+
+    def export_jsonl(self, path):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+    def export_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+    def prometheus_text(self):
+        snapshot = self.snapshot()
+        p = METRICS_PREFIX
+        lines = [f"# HELP {p}_cycles_total Watch cycles run.", f"# TYPE {p}_cycles_total counter",
+                 f"{p}_cycles_total {snapshot['cycles']}",
+                 f"# HELP {p}_capture_seconds_mean Mean screen capture time per cycle.", f"# TYPE {p}_capture_seconds_mean gauge",
+                 f"{p}_capture_seconds_mean {snapshot['capture_ms_mean'] / 1000:.6f}"]
+        counters = [("checks", "checks", "Checks of the listener's icon."),
+                    ("hits", "hits", "Checks that found the icon."),
+                    ("misses", "misses", "Checks that did not find the icon."),
+                    ("reused", "reused_checks", "Checks answered from an unchanged search area."),
+                    ("presses", "presses", "Key presses sent for the listener.")]
+        listeners = snapshot["listeners"]
+        for field, metric, help_text in counters:
+            lines += [f"# HELP {p}_listener_{metric}_total {help_text}", f"# TYPE {p}_listener_{metric}_total counter"]
+            lines += [f"{p}_listener_{metric}_total{{listener=\"{_label(m['name'])}\"}} {m[field]}" for m in listeners.values()]
+        lines += [f"# HELP {p}_listener_match_seconds_total Time spent matching the listener's icon.",
+                  f"# TYPE {p}_listener_match_seconds_total counter"]
+        lines += [f"{p}_listener_match_seconds_total{{listener=\"{_label(m['name'])}\"}} {m['match_ms_total'] / 1000:.6f}"
+                  for m in listeners.values()]
+        lines += [f"# HELP {p}_listener_press_latency_seconds_mean Mean time from detection to the first key press.",
+                  f"# TYPE {p}_listener_press_latency_seconds_mean gauge"]
+        lines += [f"{p}_listener_press_latency_seconds_mean{{listener=\"{_label(m['name'])}\"}} {m['press_latency_ms_mean'] / 1000:.6f}"
+                  for m in listeners.values()]
+        lines += [f"# HELP {p}_listener_best_score Best match score of each check.", f"# TYPE {p}_listener_best_score histogram"]
+        with self._lock:
+            histograms = [(m.name, m.scores, m.score_sum) for m in self.listeners.values()]
+        for name, scores, score_sum in histograms:
+            label = _label(name)
+            cumulative = 0
+            for index, count in enumerate(scores):
+                cumulative += count
+                lines.append(f"{p}_listener_best_score_bucket{{listener=\"{label}\",le=\"{(index + 1) / SCORE_BINS:g}\"}} {cumulative}")
+            lines.append(f"{p}_listener_best_score_bucket{{listener=\"{label}\",le=\"+Inf\"}} {cumulative}")
+            lines.append(f"{p}_listener_best_score_sum{{listener=\"{label}\"}} {score_sum:.6f}")
+            lines.append(f"{p}_listener_best_score_count{{listener=\"{label}\"}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # Prometheus text for .prom/.txt files, JSONL otherwise
+        if path.lower().endswith((".prom", ".txt")):
+            self.export_prometheus(path)
+        else:
+            self.export_jsonl(path)
+
+    def summary_lines(self):
+        # One line per listener, most expensive first
+        with self._lock:
+            ranked = sorted(self.listeners.values(), key=lambda m: m.match_time, reverse=True)
+            total = sum(m.match_time for m in ranked)
+            return [f"{m.name}: {m.hits}/{m.checks} hits, {m.mean_match_ms():.2f} ms/check "
+                    f"({m.match_time / total if total else 0.0:.0%} of match time), {m.presses} presses, "
+                    f"detection->press {m.mean_latency_ms():.0f} ms" for m in ranked]
+
+
+def _label(value):
+    # Escapes a Prometheus label value
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
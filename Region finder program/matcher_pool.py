@@ -0,0 +1,174 @@
+import multiprocessing
+import os
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from frame_sources import Frame
+from matching import match_template, DEFAULT_MATCH_MODE, DEFAULT_MATCH_STRATEGY
+from template_cache import TemplateCache
+
+
+POOL_START_TIMEOUT = 30.0 # Seconds to wait for the worker processes to start and decode their templates
+POOL_RESULT_TIMEOUT = 10.0 # Seconds to wait for one frame's results before giving up on the pool
+
+
+def default_process_count():
+    # One worker per core, leaving one for capture, the UI and key presses
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _attach(name):
+    # Opens an existing shared memory block without registering it for cleanup in this process
+    # (the pool that created it unlinks it); track= only exists from Python 3.13
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+# --- Worker Process ---
+def _worker_main(worker_index, template_paths, jobs, results):
+    cache = TemplateCache()
+    results.put(("ready", worker_index, cache.preload(template_paths)))
+    block = None
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        frame_id, block_name, shape, left, top, requests = job
+        if block is None or block.name != block_name:
+            if block is not None: block.close()
+            block = _attach(block_name)
+        started = time.perf_counter()
+        # Zero-copy view of the published frame; valid until the pool publishes the next one
+        frame = Frame(np.ndarray(shape, dtype=np.uint8, buffer=block.buf), left, top)
+        found = []
+        for request_id, path, confidence, region, match_mode, strategy in requests:
+            template = cache.get(path)
+            if template is None:
+                found.append((request_id, None, None))
+                continue
+            result = match_template(frame, template, region, match_mode, strategy)
+            box = result.box if result.found(confidence) else None
+            found.append((request_id, tuple(int(v) for v in box) if box else None, result.score))
+        del frame # Drop the view before the block can be closed
+        results.put(("done", frame_id, worker_index, found, time.perf_counter() - started))
+    if block is not None:
+        block.close()
+
+
+# --- Pool ---
+class MatcherPool:
+    """Worker processes that match templates against frames in parallel, outside the GIL.
+
+    Each frame is copied once into a shared memory block that every worker maps as a NumPy array.
+    Templates are partitioned across the workers by path (each worker decodes its share at startup and
+    keeps it cached), and match requests are routed to the worker that owns their template.
+    """
+
+    def __init__(self, template_paths=(), processes=None):
+        self.process_count = processes or default_process_count()
+        context = multiprocessing.get_context("spawn") # Same behaviour on Windows and Linux, safe with Tk threads
+        self._owner = {} # template path -> worker index
+        partitions = [[] for _ in range(self.process_count)]
+        for path in dict.fromkeys(p for p in template_paths if p):
+            worker = len(self._owner) % self.process_count
+            self._owner[path] = worker
+            partitions[worker].append(path)
+        self._jobs = [context.Queue() for _ in range(self.process_count)]
+        self._results = context.Queue()
+        self._workers = [context.Process(target=_worker_main, args=(i, partitions[i], self._jobs[i], self._results), daemon=True)
+                         for i in range(self.process_count)]
+        for worker in self._workers: worker.start()
+        self._block = None
+        self._published_frame = None # Frame currently in the shared block
+        self._published_shape = None
+        self._frame_id = 0
+        self.load_errors = {}
+        self.last_scores = {} # request_id -> best score of the last match() (None for unloadable templates)
+        for _ in range(self.process_count):
+            kind, _, errors = self._results.get(timeout=POOL_START_TIMEOUT)
+            self.load_errors.update(errors)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.requests = 0
+        self.wall_time = 0.0 # Publish -> last result, summed over frames
+        self.worker_time = 0.0 # Matching time summed over every worker
+
+    def _publish(self, frame):
+        # A frame matched in several batches is copied into shared memory once
+        if frame is self._published_frame:
+            return self._published_shape
+        pixels = np.ascontiguousarray(frame.pixels)
+        if self._block is None or self._block.size < pixels.nbytes:
+            old = self._block
+            self._block = shared_memory.SharedMemory(create=True, size=pixels.nbytes)
+            if old is not None: # Workers switch blocks on their next job; unlinking only removes the name
+                old.close()
+                old.unlink()
+        np.ndarray(pixels.shape, dtype=np.uint8, buffer=self._block.buf)[:] = pixels
+        self._published_frame, self._published_shape = frame, pixels.shape
+        return pixels.shape
+
+    def match(self, frame, requests):
+        # requests: (request_id, template_path, confidence, region, match_mode, strategy) tuples.
+        # Returns {request_id: (left, top, width, height) or None} once every worker is done with the frame.
+        if not requests:
+            return {}
+        started = time.perf_counter()
+        shape = self._publish(frame)
+        self._frame_id += 1
+        batches = {}
+        for request in requests:
+            worker = self._owner.setdefault(request[1], len(self._owner) % self.process_count) # New paths load lazily
+            batches.setdefault(worker, []).append(request)
+        for worker, batch in batches.items():
+            self._jobs[worker].put((self._frame_id, self._block.name, shape, frame.left, frame.top, batch))
+        found = {}
+        scores = {}
+        pending = len(batches)
+        while pending:
+            try:
+                kind, frame_id, _, results, elapsed = self._results.get(timeout=POOL_RESULT_TIMEOUT)
+            except queue.Empty:
+                raise RuntimeError("Matcher pool did not answer in time (a worker process may have died).")
+            if kind != "done" or frame_id != self._frame_id:
+                continue # Late answer to a frame that timed out
+            for request_id, box, score in results:
+                found[request_id] = box
+                scores[request_id] = score
+            self.worker_time += elapsed
+            pending -= 1
+        self.frames += 1
+        self.requests += len(requests)
+        self.wall_time += time.perf_counter() - started
+        self.last_scores = scores
+        return found
+
+    def locate(self, template_path, frame, confidence=0.8, region=None, match_mode=DEFAULT_MATCH_MODE,
+               strategy=DEFAULT_MATCH_STRATEGY):
+        # Single-template equivalent of matching.locate_in_frame, run in the template's worker
+        return self.match(frame, [(0, template_path, confidence, region, match_mode, strategy)]).get(0)
+
+    def close(self):
+        for jobs in self._jobs:
+            jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=2)
+            if worker.is_alive(): worker.terminate()
+        if self._block is not None:
+            self._block.close()
+            self._block.unlink()
+            self._block = None
+
+    def summary(self):
+        wall_ms = self.wall_time * 1000 / self.frames if self.frames else 0.0
+        parallelism = self.worker_time / self.wall_time if self.wall_time else 0.0
+        return (f"matcher pool: {self.process_count} processes, {self.frames} frames, "
+                f"{self.requests / max(self.frames, 1):.1f} templates/frame, {wall_ms:.1f} ms/frame, "
+                f"{parallelism:.1f}x parallelism")
@@ -0,0 +1,653 @@
+import time
+
+import numpy as np
+
+from frame_sources import rgb_to_gray
+
+# Optional: OpenCV's matchTemplate is used for the correlation step when installed
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+MATCH_BACKEND = "opencv" if cv2 is not None else "numpy"
+FLAT_WINDOW_VARIANCE = 1e-3 # Per-pixel variance below which a window counts as a solid colour
+FLAT_TEMPLATE_MAX_STD = 2.0 # Solid-colour templates only match windows at least this flat
+
+# --- Search Areas ---
+# Every listener/image object remembers where it was dragged out (capture_coords), and
+# UI icons rarely move, so matching can be limited to that spot instead of the whole screen.
+SEARCH_MODES = ("full", "roi", "margin")
+SEARCH_MODE_LABELS = {"full": "Full screen", "roi": "Fixed ROI", "margin": "ROI + margin"}
+DEFAULT_SEARCH_MODE = "margin" # For newly captured objects; objects saved before search modes existed use "full"
+DEFAULT_SEARCH_MARGIN = 20 # Pixels added on every side in "margin" mode
+
+# --- Match Modes ---
+# "exact" suits icons drawn pixel-for-pixel like their capture (action bars, toolbar buttons)
+MATCH_MODES = ("fuzzy", "exact")
+MATCH_MODE_LABELS = {"fuzzy": "Fuzzy (confidence)", "exact": "Exact, fuzzy fallback"}
+DEFAULT_MATCH_MODE = "fuzzy"
+
+# --- Match Strategies ---
+# "dense" scores every position; "sparse" first rejects positions using a few sample pixels
+# "pyramid" finds candidates on a downscaled frame and refines them at full resolution
+MATCH_STRATEGIES = ("dense", "sparse", "pyramid")
+MATCH_STRATEGY_LABELS = {"dense": "Dense (score every position)", "sparse": "Sparse prefilter",
+                         "pyramid": "Pyramid (coarse to fine)"}
+DEFAULT_MATCH_STRATEGY = "dense"
+DEFAULT_LISTENER_STRATEGY = "sparse" # Watchers re-scan the same icons every cycle, where the prefilter pays off most
+SAMPLE_POINT_COUNT = 32 # Discriminative pixels per template checked by the sparse prefilter (8-32 sensible)
+PAIR_MIN_CONTRAST = 16.0 # Gray levels a bright/dark sample pair must differ by to be used
+PAIRS_PER_POINT = 3 # Dark points each bright sample point is compared with
+PREFILTER_MIN_PAIRS = 6 # Templates with fewer usable pairs (low contrast) are always matched densely
+PREFILTER_STRICT_PAIRS = 4 # Highest-contrast pairs that must hold, checked at every position
+PREFILTER_MISS_RATIO = 10 # One of the remaining pairs in this many may fail at a true match
+PREFILTER_MAX_SURVIVORS = 16384 # Beyond this the dense path is cheaper than scoring survivors one by one
+PYRAMID_MIN_TEMPLATE_SIDE = 8 # Pyramid depth stops before the template's shorter side drops below this
+PYRAMID_MAX_DEPTH = 3 # Coarsest level is 1/8 scale
+PYRAMID_CANDIDATES = 8 # Best coarse positions refined at full resolution
+
+
+def search_region(capture_coords, search_mode="full", margin=DEFAULT_SEARCH_MARGIN):
+    # Returns (left, top, width, height) to search, or None to search the full frame
+    if search_mode not in ("roi", "margin") or not capture_coords:
+        return None
+    x, y, w, h = (int(v) for v in capture_coords)
+    if search_mode == "margin":
+        margin = max(0, int(margin))
+        x, y, w, h = x - margin, y - margin, w + 2 * margin, h + 2 * margin
+    return (x, y, w, h)
+
+
+def search_region_for(obj):
+    # obj is a listener / image object dict holding capture_coords, search_mode and search_margin
+    return search_region(obj.get("capture_coords"), obj.get("search_mode", "full"),
+                         obj.get("search_margin", DEFAULT_SEARCH_MARGIN))
+
+
+def describe_search(obj):
+    # Short label for lists, e.g. "Full", "ROI", "ROI+20"
+    mode = obj.get("search_mode", "full")
+    if mode == "roi":
+        return "ROI"
+    if mode == "margin":
+        return f"ROI+{obj.get('search_margin', DEFAULT_SEARCH_MARGIN)}"
+    return "Full"
+
+
+def match_mode_for(obj):
+    return obj.get("match_mode", DEFAULT_MATCH_MODE)
+
+
+def match_strategy_for(obj, default=DEFAULT_MATCH_STRATEGY):
+    return obj.get("match_strategy", default)
+
+
+def clip_region(region, screen_width, screen_height):
+    # Keeps a search region on screen so it can be grabbed directly; None if nothing is left
+    if region is None:
+        return None
+    x1, y1 = max(0, region[0]), max(0, region[1])
+    x2, y2 = min(screen_width, region[0] + region[2]), min(screen_height, region[1] + region[3])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+# --- Frame Statistics ---
+def _fast_len(n):
+    # Smallest 2^a * 3^b * 5^c >= n; FFTs of these sizes are fast
+    best = 1 << max(0, (n - 1).bit_length())
+    f5 = 1
+    while f5 < best:
+        f35 = f5
+        while f35 < best:
+            f = f35
+            while f < n:
+                f *= 2
+            best = min(best, f)
+            f35 *= 3
+        f5 *= 5
+    return best
+
+
+def _box_sums(table, th, tw):
+    # Sum of every th x tw window from a summed-area table with a leading row/column of zeros
+    return table[th:, tw:] - table[:-th, tw:] - table[th:, :-tw] + table[:-th, :-tw]
+
+
+class SearchWindow:
+    """One searched area of a frame. Derived data (gray, SATs, FFTs, hashes) is built on first use."""
+
+    def __init__(self, rgb, left, top, gray=None):
+        self.rgb = rgb
+        self.left = left # Screen position of rgb[0, 0]
+        self.top = top
+        self._gray = gray
+        self._gray32 = None
+        self._gray8 = None
+        self._sat = None
+        self._sat_sq = None
+        self._row_prefix = None
+        self._row_hashes = {}
+        self._fft = {}
+        self._levels = [self] # Image pyramid, level i at 1/2^i scale
+
+    def level(self, depth):
+        # Downscaled copy of this window (gray only), built once and shared by every template
+        while len(self._levels) <= depth:
+            finer = self._levels[-1]
+            gray = _downscale(finer.gray())
+            if gray is None:
+                return None
+            self._levels.append(SearchWindow(None, finer.left, finer.top, gray))
+        return self._levels[depth]
+
+    @property
+    def shape(self):
+        return self.rgb.shape[:2] if self.rgb is not None else self._gray.shape
+
+    def gray(self):
+        if self._gray is None:
+            self._gray = rgb_to_gray(self.rgb)
+        return self._gray
+
+    def gray32(self):
+        if self._gray32 is None:
+            self._gray32 = np.ascontiguousarray(self.gray(), dtype=np.float32)
+        return self._gray32
+
+    def gray8(self):
+        # Rounded uint8 luma: the prefilter only compares pixels, and bytes are the cheapest to compare
+        if self._gray8 is None:
+            self._gray8 = np.rint(self.gray()).astype(np.uint8)
+        return self._gray8
+
+    def window_sums(self, th, tw):
+        # Sum and sum of squares of every th x tw window (valid positions only)
+        if self._sat is None:
+            # Summed-area tables of the window and its square, so any window sum is four lookups
+            gray64 = self.gray().astype(np.float64)
+            self._sat = np.zeros((gray64.shape[0] + 1, gray64.shape[1] + 1), dtype=np.float64)
+            self._sat_sq = np.zeros_like(self._sat)
+            np.cumsum(np.cumsum(gray64, axis=0), axis=1, out=self._sat[1:, 1:])
+            np.cumsum(np.cumsum(gray64 * gray64, axis=0), axis=1, out=self._sat_sq[1:, 1:])
+        return _box_sums(self._sat, th, tw), _box_sums(self._sat_sq, th, tw)
+
+    def fft(self, shape):
+        # rfft2 of the (mean-removed) window at a padded size, shared by every template of that size class
+        spectrum = self._fft.get(shape)
+        if spectrum is None:
+            gray = self.gray()
+            centered = gray - gray.mean() # Smaller magnitudes, same correlation with a zero-mean template
+            spectrum = np.fft.rfft2(centered.astype(np.float64), shape)
+            self._fft[shape] = spectrum
+        return spectrum
+
+    def row_hashes(self, tw):
+        # Rabin-Karp hash of every 1 x tw run of pixels, still weighted by COL^x of the run's start (see find_exact);
+        # shared by every template of that width
+        hashes = self._row_hashes.get(tw)
+        if hashes is None:
+            if self._row_prefix is None:
+                H, W = self.shape
+                weighted = _pixel_keys(self.rgb)
+                weighted *= _powers(HASH_COL_BASE, W)
+                self._row_prefix = np.zeros((H, W + 1), dtype=np.uint32)
+                np.cumsum(weighted, axis=1, dtype=np.uint32, out=self._row_prefix[:, 1:])
+            hashes = self._row_prefix[:, tw:] - self._row_prefix[:, :-tw]
+            self._row_hashes[tw] = hashes
+        return hashes
+
+
+class FrameStats:
+    """Everything derived from a frame that can be shared by all templates matched against it."""
+
+    def __init__(self, frame):
+        self.frame = frame
+        self._windows = {}
+
+    def window(self, region=None):
+        # SearchWindow for region (screen coordinates, clipped to the frame); None = whole frame
+        frame = self.frame
+        if region is None:
+            x1, y1, x2, y2 = 0, 0, frame.width, frame.height
+        else:
+            x1 = max(region[0] - frame.left, 0)
+            y1 = max(region[1] - frame.top, 0)
+            x2 = min(region[0] + region[2] - frame.left, frame.width)
+            y2 = min(region[1] + region[3] - frame.top, frame.height)
+            if x2 <= x1 or y2 <= y1:
+                return None
+        key = (x1, y1, x2, y2)
+        window = self._windows.get(key)
+        if window is None:
+            full = self._windows.get((0, 0, frame.width, frame.height))
+            gray = full._gray[y1:y2, x1:x2] if full is not None and full._gray is not None else None
+            window = SearchWindow(frame.pixels[y1:y2, x1:x2], frame.left + x1, frame.top + y1, gray)
+            self._windows[key] = window
+        return window
+
+
+def frame_stats(frame):
+    # Computed on first use and kept on the frame, so every template matched this cycle shares it
+    stats = getattr(frame, "match_stats", None)
+    if stats is None:
+        stats = FrameStats(frame)
+        frame.match_stats = stats
+    return stats
+
+
+# --- Exact Matching ---
+# Row-wise Rabin-Karp hashes: each pixel's 24-bit colour is weighted by COL^x, and one prefix
+# sum per row (arithmetic wraps mod 2^32) hashes every run of a template's width in linear
+# time. Rather than rescaling the whole map to position-free hashes, each template row hash is
+# multiplied by COL^x once per column, so checking a row at every position is a single compare.
+# The template's most varied row gates the positions, its other rows thin them out, and what is
+# left is confirmed pixel-for-pixel, so collisions can never produce a false match.
+HASH_COL_BASE = 0x27D4EB4F # Odd, so no power of it is 0 mod 2^32; 32-bit hashes halve the memory traffic of 64-bit ones
+EXACT_MAX_CANDIDATES = 64 # Hash hits verified per search before giving up (only repetitive screens get near this)
+_power_tables = {}
+
+
+def _powers(base, count):
+    # [1, base, base^2, ...] mod 2^32, grown on demand and shared
+    table = _power_tables.get(base)
+    if table is None or len(table) < count:
+        table = np.full(max(count, 1), base, dtype=np.uint32)
+        table[0] = 1
+        np.cumprod(table, out=table)
+        _power_tables[base] = table
+    return table[:count]
+
+
+def _pixel_keys(rgb):
+    # RGB uint8 -> 0xRRGGBB as uint32, packed in place (several times faster than shifting astype copies)
+    keys = np.empty(rgb.shape[:2], dtype=np.uint32)
+    keys[...] = rgb[..., 0]
+    for channel in (1, 2):
+        keys <<= 8
+        keys |= rgb[..., channel]
+    return keys
+
+
+def _template_rows(template):
+    # (hash of each row, row indices with the most distinct colours first), comparable with row_hashes
+    rows = template.match_cache.get("row_hashes")
+    if rows is None:
+        keys = _pixel_keys(template.rgb)
+        hashes = (keys * _powers(HASH_COL_BASE, template.width)[None, :]).sum(axis=1, dtype=np.uint32)
+        order = sorted(range(template.height), key=lambda r: -len(np.unique(keys[r])))
+        rows = (hashes, order)
+        template.match_cache["row_hashes"] = rows
+    return rows
+
+
+def find_exact(window, template):
+    # (x, y) of the first pixel-identical occurrence in the window (row-major order), or None
+    th, tw = template.height, template.width
+    H, W = window.shape
+    if th > H or tw > W:
+        return None
+    runs = window.row_hashes(tw)
+    hashes, order = _template_rows(template)
+    shifts = _powers(HASH_COL_BASE, W - tw + 1) # A run starting at x carries COL^x
+    gate = order[0]
+    hits = np.flatnonzero(runs[gate:gate + H - th + 1] == hashes[gate] * shifts) # Far cheaper than 2D np.nonzero
+    ys, xs = np.divmod(hits, W - tw + 1)
+    for row in order[1:]:
+        if len(ys) <= EXACT_MAX_CANDIDATES: break
+        keep = runs[ys + row, xs] == hashes[row] * shifts[xs]
+        ys, xs = ys[keep], xs[keep]
+    for y, x in zip(ys[:EXACT_MAX_CANDIDATES], xs[:EXACT_MAX_CANDIDATES]):
+        if np.array_equal(window.rgb[y:y + th, x:x + tw], template.rgb):
+            return (int(x), int(y))
+    return None
+
+
+# --- Normalised Cross-Correlation ---
+class MatchResult:
+    def __init__(self, box, score, exact=False):
+        self.box = box # (left, top, width, height) of the best position in screen coordinates, None if nothing fits
+        self.score = score # Best normalised cross-correlation, -1.0 to 1.0
+        self.exact = exact # Found by the exact (hash) path rather than correlation
+
+    def found(self, confidence):
+        return self.box is not None and self.score >= confidence
+
+
+NO_MATCH = MatchResult(None, -1.0)
+
+
+def _template_fft(template, shape):
+    spectrum = template.match_cache.get(("fft", shape))
+    if spectrum is None:
+        spectrum = np.conj(np.fft.rfft2(template.normalized.astype(np.float64), shape))
+        template.match_cache[("fft", shape)] = spectrum
+    return spectrum
+
+
+def ncc_map(window, template):
+    # Score of every valid template position in the window (TM_CCOEFF_NORMED semantics), or None if it does not fit
+    th, tw = template.height, template.width
+    H, W = window.shape
+    if th > H or tw > W:
+        return None
+    n = th * tw
+    sums, sums_sq = window.window_sums(th, tw)
+    variance = sums_sq - sums * sums / n # n * per-pixel variance of each window
+    if template.is_flat:
+        # A solid-colour template has no pattern to correlate: score flat windows by how close their colour is
+        means = sums / n
+        flat_value = float(template.gray[0, 0])
+        scores = 1.0 - np.abs(means - flat_value) / 255.0
+        scores[variance > n * FLAT_TEMPLATE_MAX_STD ** 2] = 0.0
+        return scores
+    if cv2 is not None:
+        scores = cv2.matchTemplate(window.gray32(), template.gray.astype(np.float32), cv2.TM_CCOEFF_NORMED)
+        scores = np.nan_to_num(scores, nan=0.0, posinf=0.0, neginf=0.0)
+    else:
+        shape = (_fast_len(H), _fast_len(W))
+        correlation = np.fft.irfft2(window.fft(shape) * _template_fft(template, shape), shape)
+        numerator = correlation[:H - th + 1, :W - tw + 1] # Sum of window * normalised template at each offset
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = numerator / np.sqrt(np.maximum(variance, 0.0))
+    scores[variance <= n * FLAT_WINDOW_VARIANCE] = 0.0 # Solid-colour windows correlate with nothing
+    return np.clip(scores, -1.0, 1.0, out=scores)
+
+
+# --- Sparse Prefilter ---
+# Sample points are paired brightest-with-darkest. At the true position each pair must keep
+# its order (the bright point brighter than the dark one), which survives the brightness and
+# contrast changes NCC tolerates, while a random position keeps each order only half the time.
+# Checking pairs one after another and dropping positions as soon as they fail too many
+# rejects nearly every position after a few pixel reads.
+def select_sample_points(gray, count=SAMPLE_POINT_COUNT):
+    # The pixels that differ most from the template's mean, one per cell of a grid over the
+    # template so they are spread out. Returns (ys, xs) index arrays.
+    h, w = gray.shape
+    deviation = np.abs(gray - gray.mean())
+    rows = max(1, min(h, int(round(np.sqrt(count * h / w)))))
+    cols = max(1, min(w, -(-count // rows)))
+    ys, xs = [], []
+    for gy in range(rows):
+        y1, y2 = gy * h // rows, (gy + 1) * h // rows
+        for gx in range(cols):
+            x1, x2 = gx * w // cols, (gx + 1) * w // cols
+            if y2 <= y1 or x2 <= x1:
+                continue
+            cy, cx = np.unravel_index(int(np.argmax(deviation[y1:y2, x1:x2])), (y2 - y1, x2 - x1))
+            ys.append(y1 + int(cy))
+            xs.append(x1 + int(cx))
+    return np.array(ys, dtype=np.intp), np.array(xs, dtype=np.intp)
+
+
+def sample_pairs(gray, ys, xs, min_contrast=PAIR_MIN_CONTRAST):
+    # [(bright_index, dark_index), ...] into ys/xs, most contrasting first; low-contrast pairs
+    # are left out because noise could flip them at the true position
+    order = np.argsort(gray[ys, xs])
+    half = len(order) // 2
+    dark, bright = order[:half], order[::-1][:half]
+    pairs = []
+    for shift in range(PAIRS_PER_POINT): # Each bright point against several dark ones multiplies the checks
+        for i in range(half):
+            b, d = int(bright[i]), int(dark[(i + shift) % half])
+            contrast = float(gray[ys[b], xs[b]] - gray[ys[d], xs[d]])
+            if contrast >= min_contrast:
+                pairs.append((contrast, b, d))
+    pairs.sort(reverse=True)
+    return [(b, d) for _, b, d in pairs]
+
+
+class PrefilterStats:
+    """Running totals of how much work the sparse prefilter saved."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.searches = 0
+        self.positions = 0 # Candidate positions considered
+        self.survivors = 0 # Positions that needed full scoring
+        self.dense_fallbacks = 0 # Searches where too many positions survived to be worth it
+
+    @property
+    def pruned_fraction(self):
+        return 1.0 - self.survivors / self.positions if self.positions else 0.0
+
+    def summary(self):
+        return (f"prefilter pruned {self.pruned_fraction:.1%} of {self.positions} positions "
+                f"over {self.searches} searches ({self.dense_fallbacks} fell back to dense)")
+
+
+PREFILTER_STATS = PrefilterStats()
+
+
+def prefilter_positions(window, template):
+    # (ys, xs) of the positions that pass the pair cascade, or None if the template has too few pairs
+    pairs = template.sample_pairs
+    if len(pairs) < PREFILTER_MIN_PAIRS:
+        return None
+    th, tw = template.height, template.width
+    H, W = window.shape
+    rows, cols = H - th + 1, W - tw + 1
+    gray = window.gray8()
+    sy, sx = template.sample_ys, template.sample_xs
+    # The most contrasting pairs must all hold; they are checked at every position at once (whole-array slices)
+    passed = np.ones((rows, cols), dtype=bool)
+    for b, d in pairs[:PREFILTER_STRICT_PAIRS]:
+        passed &= gray[sy[b]:sy[b] + rows, sx[b]:sx[b] + cols] > gray[sy[d]:sy[d] + rows, sx[d]:sx[d] + cols]
+    ys, xs = np.nonzero(passed)
+    # The rest only over the survivors, tolerating a few misses (cursor over the icon, glow, noise)
+    rest = pairs[PREFILTER_STRICT_PAIRS:]
+    allowed = len(rest) // PREFILTER_MISS_RATIO
+    flat_gray = gray.ravel()
+    flat = ys * W + xs
+    missed = np.zeros(len(flat), dtype=np.uint8)
+    for b, d in rest:
+        if not len(flat):
+            break
+        missed += flat_gray[flat + (sy[b] * W + sx[b])] <= flat_gray[flat + (sy[d] * W + sx[d])]
+        keep = missed <= allowed
+        flat, missed = flat[keep], missed[keep]
+    return flat // W, flat % W
+
+
+def sparse_match(window, template):
+    # Full NCC only at positions that pass the prefilter.
+    # Returns a MatchResult, or None when the dense path should be used instead.
+    th, tw = template.height, template.width
+    H, W = window.shape
+    if template.is_flat or th > H or tw > W:
+        return None
+    survivors = prefilter_positions(window, template)
+    if survivors is None:
+        return None
+    ys, xs = survivors
+    positions = (H - th + 1) * (W - tw + 1)
+    PREFILTER_STATS.searches += 1
+    PREFILTER_STATS.positions += positions
+    if len(ys) > PREFILTER_MAX_SURVIVORS:
+        PREFILTER_STATS.survivors += positions
+        PREFILTER_STATS.dense_fallbacks += 1
+        return None
+    PREFILTER_STATS.survivors += len(ys)
+    if len(ys) == 0:
+        return NO_MATCH
+    n = th * tw
+    views = np.lib.stride_tricks.sliding_window_view(window.gray(), (th, tw))
+    normalized = template.normalized.astype(np.float64).ravel()
+    scores = np.empty(len(ys))
+    for start in range(0, len(ys), 256): # Chunked so a few thousand survivors never need a huge buffer
+        patches = views[ys[start:start + 256], xs[start:start + 256]].reshape(-1, n).astype(np.float64)
+        sums = patches.sum(axis=1)
+        variance = np.einsum("ij,ij->i", patches, patches) - sums * sums / n
+        with np.errstate(invalid="ignore", divide="ignore"):
+            chunk = (patches @ normalized) / np.sqrt(np.maximum(variance, 0.0))
+        chunk[variance <= n * FLAT_WINDOW_VARIANCE] = 0.0
+        scores[start:start + len(chunk)] = chunk
+    scores = np.clip(np.nan_to_num(scores, nan=0.0), -1.0, 1.0)
+    best = int(np.argmax(scores))
+    box = (window.left + int(xs[best]), window.top + int(ys[best]), tw, th)
+    return MatchResult(box, float(scores[best]))
+
+
+# --- Pyramid Matching ---
+def _downscale(gray):
+    # Halves both dimensions by averaging 2x2 blocks; None once the image is too small
+    h, w = gray.shape[0] // 2, gray.shape[1] // 2
+    if h < 1 or w < 1:
+        return None
+    return gray[:h * 2, :w * 2].reshape(h, 2, w, 2).mean(axis=(1, 3), dtype=np.float32)
+
+
+def pyramid_depth(template):
+    # How many times the template can be halved and still keep enough detail to match
+    depth = 0
+    side = min(template.height, template.width)
+    while depth < PYRAMID_MAX_DEPTH and side // 2 >= PYRAMID_MIN_TEMPLATE_SIDE:
+        side //= 2
+        depth += 1
+    return depth
+
+
+class ScaledTemplate:
+    """A template downscaled to one pyramid level, with the fields ncc_map needs."""
+
+    def __init__(self, gray):
+        self.gray = gray
+        self.height, self.width = gray.shape
+        centered = gray - gray.mean()
+        norm = float(np.sqrt((centered * centered).sum()))
+        self.normalized = centered / norm if norm > 0 else np.zeros_like(centered)
+        self.is_flat = norm == 0
+        self.match_cache = {}
+
+
+def _scaled_template(template, depth):
+    scaled = template.match_cache.get(("level", depth))
+    if scaled is None:
+        gray = template.gray
+        for _ in range(depth):
+            gray = _downscale(gray)
+        scaled = ScaledTemplate(gray)
+        template.match_cache[("level", depth)] = scaled
+    return scaled
+
+
+def pyramid_match(window, template, frame):
+    # Best coarse positions are refined in small full-resolution windows around them.
+    # Returns a MatchResult, or None when the template is too small for a pyramid.
+    depth = pyramid_depth(template)
+    coarse_window = window.level(depth) if depth else None
+    if coarse_window is None:
+        return None
+    scaled = _scaled_template(template, depth)
+    coarse = ncc_map(coarse_window, scaled)
+    if coarse is None:
+        return None
+    count = min(PYRAMID_CANDIDATES, coarse.size)
+    candidates = np.argpartition(coarse.ravel(), -count)[-count:]
+    scale = 1 << depth
+    H, W = window.shape
+    stats = frame_stats(frame)
+    best = NO_MATCH
+    for index in candidates:
+        cy, cx = divmod(int(index), coarse.shape[1])
+        # The true position is within one coarse pixel of the candidate in every direction
+        x1, y1 = max(cx * scale - scale, 0), max(cy * scale - scale, 0)
+        x2 = min(cx * scale + scale + template.width + scale, W)
+        y2 = min(cy * scale + scale + template.height + scale, H)
+        fine_window = stats.window((window.left + x1, window.top + y1, x2 - x1, y2 - y1))
+        scores = ncc_map(fine_window, template) if fine_window is not None else None
+        if scores is None:
+            continue
+        y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+        if scores[y, x] > best.score:
+            box = (fine_window.left + int(x), fine_window.top + int(y), template.width, template.height)
+            best = MatchResult(box, float(scores[y, x]))
+    return best
+
+
+def measure_prefilter(frame, template, region=None, repeats=3):
+    # Times the dense and sparse paths on the same frame; returns (dense_ms, sparse_ms, pruned fraction)
+    window = frame_stats(frame).window(region)
+    if window is None or sparse_match(window, template) is None:
+        return None
+    ncc_map(window, template) # Warm the shared per-window data so both paths are timed on equal terms
+    start = time.perf_counter()
+    for _ in range(repeats):
+        ncc_map(window, template)
+    dense_ms = (time.perf_counter() - start) * 1000 / repeats
+    before = (PREFILTER_STATS.positions, PREFILTER_STATS.survivors)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        sparse_match(window, template)
+    sparse_ms = (time.perf_counter() - start) * 1000 / repeats
+    positions = PREFILTER_STATS.positions - before[0]
+    pruned = 1.0 - (PREFILTER_STATS.survivors - before[1]) / positions if positions else 0.0
+    return dense_ms, sparse_ms, pruned
+
+
+def match_template(frame, template, region=None, match_mode=DEFAULT_MATCH_MODE, strategy=DEFAULT_MATCH_STRATEGY):
+    # Best position of template in frame (optionally only within region).
+    # match_mode "exact" looks for a pixel-identical copy first and only correlates if there is none.
+    # strategy "sparse" scores only the positions that pass the sample-point prefilter,
+    # "pyramid" only the neighbourhoods of the best positions on a downscaled frame.
+    window = frame_stats(frame).window(region)
+    if window is None:
+        return NO_MATCH
+    if match_mode == "exact":
+        position = find_exact(window, template)
+        if position is not None:
+            box = (window.left + position[0], window.top + position[1], template.width, template.height)
+            return MatchResult(box, 1.0, exact=True)
+        # Not pixel-identical (glow, cooldown swipe, scaling): fall back to the fuzzy matcher
+    if strategy == "sparse":
+        result = sparse_match(window, template)
+        if result is not None:
+            return result
+    elif strategy == "pyramid":
+        result = pyramid_match(window, template, frame)
+        if result is not None:
+            return result
+    scores = ncc_map(window, template)
+    if scores is None:
+        return NO_MATCH # Search area smaller than the template (e.g. ROI clipped at a screen edge)
+    y, x = np.unravel_index(int(np.argmax(scores)), scores.shape)
+    box = (window.left + int(x), window.top + int(y), template.width, template.height)
+    return MatchResult(box, float(scores[y, x]))
+
+
+# --- Locating ---
+def locate_in_frame(template, frame, confidence=0.8, region=None, match_mode=DEFAULT_MATCH_MODE,
+                    strategy=DEFAULT_MATCH_STRATEGY):
+    # template: template_cache.Template (decoded once). frame: frame_sources.Frame.
+    # Returns (left, top, width, height) in screen coordinates, or None.
+    result = match_template(frame, template, region, match_mode, strategy)
+    return result.box if result.found(confidence) else None
+
+
+class SharedMatches:
+    """Match results for the current frame, keyed by template, search area, match mode and strategy, so
+    listeners watching the same icon (one decoded Template, thanks to the content-addressed asset store) cost
+    one match pass per frame. Confidence is applied by each caller. Used from one thread at a time."""
+
+    def __init__(self):
+        self._frame = None
+        self._results = {}
+        self.shared = 0 # Matches answered from another listener's pass
+
+    def match(self, frame, template, region=None, match_mode=DEFAULT_MATCH_MODE, strategy=DEFAULT_MATCH_STRATEGY):
+        if frame is not self._frame:
+            self._frame = frame
+            self._results = {}
+        key = (id(template), tuple(region) if region else None, match_mode, strategy)
+        entry = self._results.get(key)
+        if entry is not None and entry[0] is template:
+            self.shared += 1
+            return entry[1]
+        result = match_template(frame, template, region, match_mode, strategy)
+        self._results[key] = (template, result) # Holding the template keeps its id from being reused this frame
+        return result
@@ -0,0 +1,182 @@
+import collections
+import queue
+import threading
+import time
+
+
+PIPELINE_RING_SIZE = 3 # Captures kept for the matcher; older ones are overwritten (dropped as stale)
+PIPELINE_ACTION_QUEUE_SIZE = 1 # Detections waiting for the actuator; a newer detection replaces a waiting one
+PIPELINE_IDLE_WAIT = 0.1 # Seconds the matcher / actuator block before re-checking for shutdown
+
+
+# --- Frame Ring Buffer ---
+class FrameRing:
+    """Fixed-size buffer of the newest captures. Readers always get the newest frame; frames that were
+    overwritten or skipped before anyone read them are counted as dropped."""
+
+    def __init__(self, capacity=PIPELINE_RING_SIZE):
+        self._frames = collections.deque(maxlen=capacity)
+        self._sequence = 0 # Number of the newest frame
+        self._condition = threading.Condition()
+        self.captured = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        with self._condition:
+            self._sequence += 1
+            self._frames.append((self._sequence, frame))
+            self.captured += 1
+            self._condition.notify_all()
+
+    def newest(self, after=0, timeout=None):
+        # (sequence, frame) of the newest frame numbered above after, waiting up to timeout for one;
+        # (after, None) on timeout. Frames between after and the returned one are counted as dropped.
+        with self._condition:
+            if self._sequence <= after and not self._condition.wait_for(lambda: self._sequence > after, timeout):
+                return after, None
+            sequence, frame = self._frames[-1]
+            if after: self.dropped += sequence - after - 1
+            return sequence, frame
+
+
+# --- Capture / Match / Act Pipeline ---
+class WatchPipeline:
+    """Runs an icon watcher as three stages so they overlap instead of adding up.
+
+    A capture thread keeps a FrameRing filled (at most one grab per interval, sooner right after a key
+    press; interval may be a callable returning the current pause, e.g. ScanGovernor.interval). The matcher (the thread calling run()) always takes the newest frame and calls
+    match(frame, pipeline), which returns (key, action) for a detection or None. Detections go through a
+    bounded queue to an actuator thread that calls act(action). While a key's action is queued or running,
+    and for settle seconds after it, frames captured before that point are skipped for that key with
+    is_busy(), so a press the screen has not caught up with yet is never repeated.
+    """
+
+    def __init__(self, frame_source, match, act, interval, keep_running, settle=0.0,
+                 ring_size=PIPELINE_RING_SIZE, queue_size=PIPELINE_ACTION_QUEUE_SIZE):
+        self.frame_source = frame_source
+        self.match = match
+        self.act = act
+        self.interval = interval # Seconds between captures while nothing happens, or a callable returning them
+        self.keep_running = keep_running # Callable; the pipeline stops when it returns False
+        self.settle = settle # Seconds after an action before new frames may trigger the same key again
+        self.ring = FrameRing(ring_size)
+        self.actions = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._pending = set() # Keys with a queued or running action
+        self._settled_at = {} # key -> time.time() from which frames show the result of its last action
+        self._wake = threading.Event() # Set to capture right away instead of waiting out the interval
+        self._stopping = threading.Event()
+        self.failure = None # Exception that escaped act() or a capture, re-raised by run()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.ring.captured = 0
+        self.ring.dropped = 0
+        self.matched_frames = 0
+        self.actions_done = 0
+        self.replaced = 0 # Queued detections superseded by a newer one before the actuator got to them
+        self.capture_time = 0.0
+        self.match_time = 0.0
+        self.last_capture_time = 0.0 # Of the newest capture / matched frame, for feedback such as a governor
+        self.last_match_time = 0.0
+        self.detect_latency = 0.0 # Summed capture -> detection time
+        self.act_latency = 0.0 # Summed detection -> actuator start time
+
+    def _pause(self):
+        return self.interval() if callable(self.interval) else self.interval
+
+    def _running(self):
+        return not self._stopping.is_set() and self.keep_running()
+
+    def is_busy(self, key, frame):
+        # True if frame cannot show the effect of key's latest action yet (queued, running or settling)
+        with self._lock:
+            return key in self._pending or frame.timestamp < self._settled_at.get(key, 0.0)
+
+    def submit(self, key, action):
+        with self._lock:
+            while True:
+                try:
+                    self.actions.put_nowait((key, action, time.perf_counter()))
+                    break
+                except queue.Full:
+                    try:
+                        old_key, _, _ = self.actions.get_nowait()
+                        self._pending.discard(old_key)
+                        self.replaced += 1
+                    except queue.Empty:
+                        pass
+            self._pending.add(key)
+
+    def _capture_loop(self):
+        while self._running():
+            started = time.perf_counter()
+            try:
+                frame = self.frame_source.grab()
+            except Exception as e:
+                print(f"Error capturing screen: {e}")
+                self._wake.wait(max(self._pause(), PIPELINE_IDLE_WAIT))
+                continue
+            self.last_capture_time = time.perf_counter() - started
+            self.capture_time += self.last_capture_time
+            self.ring.put(frame)
+            self._wake.wait(self._pause())
+            self._wake.clear()
+
+    def _act_loop(self):
+        while self._running():
+            try:
+                key, action, submitted = self.actions.get(timeout=PIPELINE_IDLE_WAIT)
+            except queue.Empty:
+                continue
+            self.act_latency += time.perf_counter() - submitted
+            try:
+                self.act(action)
+            except BaseException as e:
+                self.failure = e
+                self._stopping.set()
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                    self._settled_at[key] = time.time() + self.settle
+                self.actions_done += 1
+                self._wake.set() # The screen just changed: look again now
+
+    def run(self, on_frame=None):
+        # Runs the matcher on the calling thread until keep_running() is False or a stage fails.
+        # on_frame(pipeline) is called after every matched frame (e.g. for periodic statistics).
+        self._stopping.clear()
+        stages = [threading.Thread(target=self._capture_loop, daemon=True),
+                  threading.Thread(target=self._act_loop, daemon=True)]
+        for stage in stages: stage.start()
+        sequence = 0
+        try:
+            while self._running():
+                sequence, frame = self.ring.newest(sequence, timeout=PIPELINE_IDLE_WAIT)
+                if frame is None: continue
+                started = time.perf_counter()
+                detection = self.match(frame, self)
+                self.last_match_time = time.perf_counter() - started
+                self.match_time += self.last_match_time
+                self.matched_frames += 1
+                if detection is not None:
+                    self.detect_latency += time.time() - frame.timestamp
+                    self.submit(*detection)
+                if on_frame: on_frame(self)
+        finally:
+            self._stopping.set()
+            self._wake.set()
+            for stage in stages: stage.join()
+        if self.failure is not None:
+            raise self.failure
+
+    def summary(self):
+        frames = self.matched_frames
+        detections = self.actions_done + self.replaced
+        capture_ms = self.capture_time * 1000 / self.ring.captured if self.ring.captured else 0.0
+        match_ms = self.match_time * 1000 / frames if frames else 0.0
+        detect_ms = self.detect_latency * 1000 / detections if detections else 0.0
+        act_ms = self.act_latency * 1000 / self.actions_done if self.actions_done else 0.0
+        return (f"pipeline: {self.ring.captured} captured ({capture_ms:.1f} ms each), {frames} matched ({match_ms:.1f} ms each), "
+                f"{self.ring.dropped} dropped as stale; capture->detection {detect_ms:.0f} ms, "
+                f"detection->press {act_ms:.0f} ms, {self.actions_done} actions, {self.replaced} superseded")
@@ -0,0 +1,110 @@
+import numpy as np
+
+
+# --- Batched Pixel Reads ---
+PIXEL_GROUP_GAP = 64 # Registered pixels within this many pixels of each other (on both axes) share one grab
+
+
+def bounding_box(coords):
+    # (left, top, width, height) enclosing every (x, y) in an (N, 2) array
+    left, top = coords.min(axis=0)
+    right, bottom = coords.max(axis=0)
+    return (int(left), int(top), int(right - left + 1), int(bottom - top + 1))
+
+
+def read_pixels(frame_source, coords):
+    # RGB of every (x, y) in coords as an (N, 3) uint8 array, from a single grab of their bounding box
+    coords = np.asarray(coords, dtype=np.intp).reshape(-1, 2)
+    if not len(coords):
+        return np.empty((0, 3), dtype=np.uint8)
+    frame = frame_source.grab(region=bounding_box(coords))
+    return frame.pixels[coords[:, 1] - frame.top, coords[:, 0] - frame.left]
+
+
+def colors_match(colors, expected, tolerance=0):
+    # Row-wise comparison of (N, 3) colors with (N, 3) expected values; every channel within tolerance
+    difference = np.abs(np.asarray(colors, dtype=np.int16) - np.asarray(expected, dtype=np.int16))
+    return np.all(difference <= tolerance, axis=-1)
+
+
+class PixelProbe:
+    """A set of named screen pixels read with one capture of their bounding box. Pixels far apart fall into
+    separate groups (see group), so reading one does not grab the screen area between it and the others."""
+
+    def __init__(self, frame_source):
+        self.frame_source = frame_source
+        self._index = {} # name -> row in _coords / _expected
+        self._coords = np.empty((0, 2), dtype=np.intp)
+        self._expected = np.empty((0, 3), dtype=np.int16)
+        self._groups = None # name -> names in its group, rebuilt after a registration
+        self.grabs = 0 # Captures made, for diagnostics
+        self.pixels_read = 0
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def register(self, name, x, y, expected_rgb=None):
+        self._groups = None
+        expected = tuple(expected_rgb) if expected_rgb is not None else (-1, -1, -1) # -1 never matches
+        if name in self._index:
+            row = self._index[name]
+            self._coords[row] = (int(x), int(y))
+            self._expected[row] = expected
+            return
+        self._index[name] = len(self._coords)
+        self._coords = np.vstack([self._coords, [(int(x), int(y))]])
+        self._expected = np.vstack([self._expected, [expected]])
+
+    def register_objects(self, objects, names=None):
+        # Registers the pixel objects of an Automation maker objects dict (only those in names, if given), using
+        # each one's captured RGB as the expected color
+        for name, obj in objects.items():
+            if names is not None and name not in names: continue
+            if obj.get("type") == "pixel" and obj.get("coords"):
+                self.register(name, obj["coords"][0], obj["coords"][1], obj.get("rgb"))
+
+    def group(self, name):
+        # Names of the registered pixels read together with name: those linked to it by steps of at most PIXEL_GROUP_GAP
+        if self._groups is None:
+            names = list(self._index)
+            parent = list(range(len(names)))
+            def root(i):
+                while parent[i] != i: i = parent[i]
+                return i
+            for i in range(len(names)):
+                near = np.nonzero(np.abs(self._coords[i + 1:] - self._coords[i]).max(axis=1) <= PIXEL_GROUP_GAP)[0] + i + 1
+                for j in near: parent[root(int(j))] = root(i)
+            members = {}
+            for i, other in enumerate(names): members.setdefault(root(i), []).append(other)
+            self._groups = {other: members[root(i)] for i, other in enumerate(names)}
+        return self._groups[name]
+
+    def _rows(self, names):
+        if names is None:
+            return list(self._index.values())
+        return [self._index[name] for name in names]
+
+    def read(self, names=None):
+        # {name: (r, g, b)} for the given names (default: all registered) from one capture
+        rows = self._rows(names)
+        colors = read_pixels(self.frame_source, self._coords[rows])
+        self.grabs += 1
+        self.pixels_read += len(rows)
+        ordered = names if names is not None else list(self._index)
+        return {name: tuple(int(c) for c in color) for name, color in zip(ordered, colors)}
+
+    def check(self, names=None, expected=None, tolerance=0):
+        # {name: bool} comparing each pixel with expected ({name: rgb}) or its registered color, from one capture
+        rows = self._rows(names)
+        ordered = names if names is not None else list(self._index)
+        targets = self._expected[rows].copy()
+        for i, name in enumerate(ordered):
+            if expected and name in expected:
+                targets[i] = expected[name]
+        colors = read_pixels(self.frame_source, self._coords[rows])
+        self.grabs += 1
+        self.pixels_read += len(rows)
+        return dict(zip(ordered, (bool(m) for m in colors_match(colors, targets, tolerance))))
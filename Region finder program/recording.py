@@ -0,0 +1,310 @@
+import json
+import os
+import sys
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from frame_diff import changed_tiles
+from frame_sources import Frame, FrameSource
+
+
+RECORDING_TILE_SIZE = 32 # Side of the tiles frames are delta-coded in; only tiles that changed are stored
+RECORDING_KEYFRAME_EVERY = 300 # Full frames stored this often so any frame can be decoded without replaying from the start
+RECORDING_COMPRESS_LEVEL = 1 # zlib level for frame data (1 = fastest; screen content compresses well anyway)
+REPLAY_PRESS_WINDOW_S = 1.0 # A replayed detection reproduces a recorded press if it comes at most this long before it
+
+RECORDING_META = "meta.json"
+RECORDING_INDEX = "index.bin" # Fixed-size records, memory-mapped by the reader
+RECORDING_DATA = "frames.bin" # Compressed frame blobs, appended in frame order
+RECORDING_EVENTS = "events.jsonl" # Key presses issued while recording
+
+INDEX_DTYPE = np.dtype([("timestamp", "<f8"), ("offset", "<u8"), ("length", "<u4"), ("tiles", "<u4"), ("keyframe", "u1")])
+
+
+def _tile_grid(pixels, tile_size):
+    # (height, width, 3) -> (rows, cols, tile, tile, 3) view over a copy padded to whole tiles (or the array itself)
+    h, w = pixels.shape[:2]
+    rows, cols = -(-h // tile_size), -(-w // tile_size)
+    if (rows * tile_size, cols * tile_size) != (h, w):
+        padded = np.zeros((rows * tile_size, cols * tile_size, 3), dtype=np.uint8)
+        padded[:h, :w] = pixels
+        pixels = padded
+    return pixels.reshape(rows, tile_size, cols, tile_size, 3).swapaxes(1, 2)
+
+
+# --- Recording ---
+class FrameRecorder:
+    """Writes captured frames and issued key presses to a recording folder.
+
+    Each frame is compared with the previous one in tiles and only the changed tiles are stored,
+    zlib-compressed, with a full keyframe every RECORDING_KEYFRAME_EVERY frames. A fixed-size index record per
+    frame (timestamp, blob offset and length) lets the reader memory-map the index and seek to any frame.
+    """
+
+    def __init__(self, path, tile_size=RECORDING_TILE_SIZE, keyframe_every=RECORDING_KEYFRAME_EVERY,
+                 compress_level=RECORDING_COMPRESS_LEVEL):
+        self.path = path
+        self.tile_size = tile_size
+        self.keyframe_every = keyframe_every
+        self.compress_level = compress_level
+        os.makedirs(path, exist_ok=True)
+        self._index = open(os.path.join(path, RECORDING_INDEX), "wb")
+        self._data = open(os.path.join(path, RECORDING_DATA), "wb")
+        self._events = open(os.path.join(path, RECORDING_EVENTS), "w", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._previous = None # Pixels of the last recorded frame
+        self._offset = 0
+        self.shape = None # (height, width) of the recorded frames, fixed by the first one
+        self.frames = 0
+        self.skipped = 0 # Frames of a different size than the first (e.g. region grabs), not recorded
+        self.stored_tiles = 0
+        self.total_tiles = 0
+        self.write_time = 0.0
+        self.events = 0
+
+    def _write_meta(self, frame):
+        meta = {"width": frame.width, "height": frame.height, "left": frame.left, "top": frame.top,
+                "tile_size": self.tile_size, "keyframe_every": self.keyframe_every, "created": time.time()}
+        with open(os.path.join(self.path, RECORDING_META), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+    def write(self, frame):
+        started = time.perf_counter()
+        with self._lock:
+            if self._data.closed: return
+            if self.shape is None:
+                self.shape = frame.pixels.shape[:2]
+                self._write_meta(frame)
+            elif frame.pixels.shape[:2] != self.shape:
+                self.skipped += 1
+                return
+            keyframe = self._previous is None or self.frames % self.keyframe_every == 0
+            grid = _tile_grid(frame.pixels, self.tile_size)
+            if keyframe:
+                tiles = grid.shape[0] * grid.shape[1]
+                payload = np.ascontiguousarray(frame.pixels).tobytes()
+            else:
+                rows, cols = np.nonzero(changed_tiles(self._previous, frame.pixels, self.tile_size))
+                tiles = len(rows)
+                flat = (rows * grid.shape[1] + cols).astype("<u4")
+                payload = flat.tobytes() + np.ascontiguousarray(grid[rows, cols]).tobytes()
+            blob = zlib.compress(payload, self.compress_level) if payload else b""
+            record = np.array([(frame.timestamp, self._offset, len(blob), tiles, keyframe)], dtype=INDEX_DTYPE)
+            self._data.write(blob)
+            self._index.write(record.tobytes())
+            self._offset += len(blob)
+            self._previous = frame.pixels
+            self.frames += 1
+            self.stored_tiles += tiles
+            self.total_tiles += grid.shape[0] * grid.shape[1]
+        self.write_time += time.perf_counter() - started
+
+    def record_key(self, keys, source=None, timestamp=None):
+        # keys as pressed (e.g. "ctrl+1"); source: what triggered it (listener name)
+        with self._lock:
+            if self._events.closed: return
+            event = {"t": time.time() if timestamp is None else timestamp, "frame": self.frames - 1, "keys": keys, "source": source}
+            self._events.write(json.dumps(event) + "\n")
+            self.events += 1
+
+    def close(self):
+        with self._lock:
+            for f in (self._index, self._data, self._events):
+                if not f.closed: f.close()
+
+    def summary(self):
+        raw = self.frames * self.shape[0] * self.shape[1] * 3 if self.shape else 0
+        ratio = raw / self._offset if self._offset else 0.0
+        write_ms = self.write_time * 1000 / self.frames if self.frames else 0.0
+        stored = self.stored_tiles / self.total_tiles if self.total_tiles else 0.0
+        return (f"recording: {self.frames} frames ({stored:.1%} of tiles stored), {self._offset / 1e6:.1f} MB "
+                f"({ratio:.0f}x smaller than raw), {write_ms:.1f} ms/frame, {self.events} key presses, "
+                f"{self.skipped} frames of another size skipped")
+
+
+class RecordingFrameSource(FrameSource):
+    """Wraps a frame source and records every frame it hands out. Region grabs are served by grabbing and
+    recording the whole screen and cropping, so the recording always holds complete frames."""
+
+    def __init__(self, source, recorder):
+        self.source = source
+        self.recorder = recorder
+        self.name = source.name
+        self.description = f"{source.description} (recording)"
+
+    def grab(self, region=None):
+        frame = self.source.grab()
+        self.recorder.write(frame)
+        if region is None:
+            return frame
+        cropped = frame.crop(region)
+        if cropped is None:
+            raise ValueError(f"Region {region} is outside the screen.")
+        return cropped
+
+    def screen_size(self):
+        return self.source.screen_size()
+
+
+# --- Playback ---
+class FrameRecording:
+    """Reads a recording folder written by FrameRecorder. The index is memory-mapped; frames are decoded on
+    demand, sequential reads apply one delta each and random access starts from the nearest keyframe."""
+
+    def __init__(self, path):
+        self.path = path
+        meta_path = os.path.join(path, RECORDING_META)
+        if not os.path.isfile(meta_path):
+            raise ValueError(f"'{path}' is not a frame recording (no {RECORDING_META}).")
+        with open(meta_path, encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.width, self.height = self.meta["width"], self.meta["height"]
+        self.left, self.top = self.meta.get("left", 0), self.meta.get("top", 0)
+        self.tile_size = self.meta["tile_size"]
+        index_path = os.path.join(path, RECORDING_INDEX)
+        self.frame_count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        if not self.frame_count:
+            raise ValueError(f"Recording '{path}' has no frames.")
+        self.index = np.memmap(index_path, dtype=INDEX_DTYPE, mode="r", shape=(self.frame_count,))
+        self._data = np.memmap(os.path.join(path, RECORDING_DATA), dtype=np.uint8, mode="r")
+        self.timestamps = self.index["timestamp"]
+        self._keyframes = np.flatnonzero(self.index["keyframe"])
+        self.key_events = []
+        events_path = os.path.join(path, RECORDING_EVENTS)
+        if os.path.isfile(events_path):
+            with open(events_path, encoding="utf-8") as f:
+                self.key_events = [json.loads(line) for line in f if line.strip()]
+        rows, cols = -(-self.height // self.tile_size), -(-self.width // self.tile_size)
+        self._canvas = np.zeros((rows * self.tile_size, cols * self.tile_size, 3), dtype=np.uint8)
+        self._grid = self._canvas.reshape(rows, self.tile_size, cols, self.tile_size, 3).swapaxes(1, 2)
+        self._decoded = -1 # Index of the frame currently on the canvas
+
+    @property
+    def start_time(self):
+        return float(self.timestamps[0])
+
+    @property
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0])
+
+    def _apply(self, index):
+        record = self.index[index]
+        start, length = int(record["offset"]), int(record["length"])
+        payload = zlib.decompress(self._data[start:start + length].tobytes()) if length else b""
+        if record["keyframe"]:
+            self._canvas[:self.height, :self.width] = np.frombuffer(payload, dtype=np.uint8).reshape(self.height, self.width, 3)
+        elif record["tiles"]:
+            count = int(record["tiles"])
+            flat = np.frombuffer(payload, dtype="<u4", count=count)
+            tiles = np.frombuffer(payload, dtype=np.uint8, offset=count * 4).reshape(count, self.tile_size, self.tile_size, 3)
+            self._grid[flat // self._grid.shape[1], flat % self._grid.shape[1]] = tiles
+        self._decoded = index
+
+    def pixels(self, index):
+        # RGB array of frame index (a copy; the decoder keeps working on its own canvas)
+        if not 0 <= index < self.frame_count:
+            raise IndexError(f"Frame {index} is outside the recording (0-{self.frame_count - 1}).")
+        if index != self._decoded:
+            start = index if index == self._decoded + 1 else int(self._keyframes[np.searchsorted(self._keyframes, index, "right") - 1])
+            if self._decoded < index and start <= self._decoded: start = self._decoded + 1 # Keep going from where we are
+            for i in range(start, index + 1):
+                self._apply(i)
+        return self._canvas[:self.height, :self.width].copy()
+
+    def frame(self, index):
+        return Frame(self.pixels(index), self.left, self.top, float(self.timestamps[index]))
+
+    def index_at(self, timestamp):
+        # Last frame captured at or before timestamp (the first frame for earlier times)
+        return max(int(np.searchsorted(self.timestamps, timestamp, "right")) - 1, 0)
+
+
+class VirtualClock:
+    """Replay time: only moves when told to, so a replay does the same thing however fast the machine is."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, seconds)
+
+    def advance_to(self, timestamp):
+        self.now = max(self.now, timestamp)
+
+
+class RecordedFrameSource(FrameSource):
+    """Frame source serving the recorded frame that was on screen at the virtual clock's current time."""
+    name = "recording"
+    description = "Recorded frames on a virtual clock"
+
+    def __init__(self, recording, clock=None):
+        self.recording = recording
+        self.clock = clock or VirtualClock(recording.start_time)
+
+    def grab(self, region=None):
+        frame = self.recording.frame(self.recording.index_at(self.clock.time()))
+        if region is not None:
+            cropped = frame.crop(region)
+            if cropped is None:
+                raise ValueError(f"Region {region} is outside the recorded frames.")
+            return cropped
+        return frame
+
+    def screen_size(self):
+        return (self.recording.width, self.recording.height)
+
+
+class ReplayReport:
+    def __init__(self, frames, detections, elapsed, recording, press_window=REPLAY_PRESS_WINDOW_S):
+        self.frames = frames
+        self.detections = detections # (timestamp, source) per detection, in order
+        self.elapsed = elapsed # Wall time the replay took
+        self.recorded_presses = [e for e in recording.key_events if e.get("source")]
+        self.reproduced = sum(1 for e in self.recorded_presses
+                              if any(s == e["source"] and e["t"] - press_window <= t <= e["t"] for t, s in detections))
+
+    def summary(self):
+        fps = self.frames / self.elapsed if self.elapsed else 0.0
+        per_second = len(self.detections) / self.elapsed if self.elapsed else 0.0
+        return (f"replay: {self.frames} frames in {self.elapsed:.2f} s ({fps:.1f} frames/s), {len(self.detections)} detections "
+                f"({per_second:.1f} detections/s), {self.reproduced} of {len(self.recorded_presses)} recorded presses reproduced")
+
+
+def replay_recording(recording, detect, clock=None, press_window=REPLAY_PRESS_WINDOW_S, keep_running=lambda: True):
+    # Feeds every frame of the recording, in order, to detect(frame, now) with the clock set to the frame's
+    # capture time. detect returns the sources (listener names) it detected on the frame. Nothing depends on
+    # the wall clock, so the same recording and settings always give the same detections.
+    clock = clock or VirtualClock(recording.start_time)
+    detections = []
+    frames = 0
+    started = time.perf_counter()
+    for index in range(recording.frame_count):
+        if not keep_running(): break
+        frame = recording.frame(index)
+        clock.advance_to(frame.timestamp)
+        detections.extend((frame.timestamp, source) for source in detect(frame, clock.time()) or ())
+        frames += 1
+    return ReplayReport(frames, detections, time.perf_counter() - started, recording, press_window)
+
+
+if __name__ == "__main__":
+    # Describe a recording and time its decoding: python recording.py <recording folder>
+    if len(sys.argv) != 2:
+        print("Usage: python recording.py <recording folder>")
+        sys.exit(1)
+    recording = FrameRecording(sys.argv[1])
+    stored = os.path.getsize(os.path.join(recording.path, RECORDING_DATA))
+    raw = recording.frame_count * recording.width * recording.height * 3
+    print(f"{recording.frame_count} frames of {recording.width}x{recording.height} over {recording.duration:.1f} s, "
+          f"{len(recording.key_events)} key presses, {stored / 1e6:.1f} MB ({raw / max(stored, 1):.0f}x smaller than raw)")
+    started = time.perf_counter()
+    for i in range(recording.frame_count):
+        recording.pixels(i)
+    elapsed = time.perf_counter() - started
+    print(f"Decoded at {recording.frame_count / elapsed:.1f} frames/s")
@@ -0,0 +1,145 @@
+import threading
+import time
+
+
+PRIORITY_LEVELS = ("high", "normal", "low")
+PRIORITY_LABELS = {"high": "High", "normal": "Normal", "low": "Low"}
+DEFAULT_PRIORITY = "normal"
+DEFAULT_SCAN_EVERY_MS = 0 # 0 = checked on every cycle
+DEFAULT_COOLDOWN_S = 0.0 # Seconds a listener is not checked after its keybind was pressed
+CYCLE_BUDGET_MS = 16 # Matching time per cycle before the remaining (non-high) listeners are deferred; 0 = unlimited
+
+
+def priority_for(listener):
+    priority = listener.get("priority", DEFAULT_PRIORITY)
+    return priority if priority in PRIORITY_LEVELS else DEFAULT_PRIORITY
+
+
+def scan_every_for(listener):
+    # Seconds between checks of a listener
+    return max(0, listener.get("scan_every_ms", DEFAULT_SCAN_EVERY_MS)) / 1000
+
+
+def cooldown_for(listener):
+    return max(0.0, listener.get("cooldown_s", DEFAULT_COOLDOWN_S))
+
+
+def describe_schedule(listener):
+    # Short text for list views, e.g. "High", "Normal/250ms", "Low/1000ms cd 2s"
+    text = PRIORITY_LABELS[priority_for(listener)]
+    if scan_every_for(listener):
+        text += f"/{listener.get('scan_every_ms')}ms"
+    if cooldown_for(listener):
+        text += f" cd {cooldown_for(listener):g}s"
+    return text
+
+
+class ListenerScheduler:
+    """Decides which listeners a watch cycle checks, and in what order.
+
+    A listener is due when its scan interval has passed since its last check and it is not cooling down
+    after a press. Due listeners are checked by priority level and then list order, except that listeners
+    deferred by an earlier cycle go first within their level. Once a cycle has used its time budget the
+    remaining 'normal' and 'low' listeners are deferred to the next cycle; 'high' listeners are always checked.
+    """
+
+    def __init__(self, budget_ms=CYCLE_BUDGET_MS):
+        self.budget = budget_ms / 1000
+        self._next_due = {} # key -> time.monotonic() from which the listener is due again
+        self._cooldown_until = {}
+        self._deferred = {} # key -> consecutive cycles the listener was deferred
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.cycles = 0
+        self.checks = 0
+        self.deferrals = 0
+        self.over_budget_cycles = 0
+        self.max_deferred = 0 # Longest run of deferred cycles of any listener (starvation check)
+
+    def forget(self):
+        with self._lock:
+            self._next_due.clear()
+            self._cooldown_until.clear()
+            self._deferred.clear()
+
+    def due(self, listeners, key=lambda l: l["id"], now=None):
+        # Listeners to check this cycle, in check order
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            ready = [(index, l) for index, l in enumerate(listeners)
+                     if now >= self._next_due.get(key(l), 0.0) and now >= self._cooldown_until.get(key(l), 0.0)]
+            ready.sort(key=lambda item: (PRIORITY_LEVELS.index(priority_for(item[1])),
+                                         -self._deferred.get(key(item[1]), 0), item[0]))
+        return [l for _, l in ready]
+
+    def checked(self, listener, key=lambda l: l["id"], now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._next_due[key(listener)] = now + scan_every_for(listener)
+            self._deferred.pop(key(listener), None)
+        self.checks += 1
+
+    def fired(self, listener, key=lambda l: l["id"], now=None):
+        # Starts the listener's cooldown; call once its keybind has been pressed
+        cooldown = cooldown_for(listener)
+        if cooldown:
+            with self._lock:
+                self._cooldown_until[key(listener)] = (time.monotonic() if now is None else now) + cooldown
+
+    def run_cycle(self, listeners, check, key=lambda l: l["id"], now=None):
+        # Calls check(listener) for the due listeners in order until one returns something truthy (returned
+        # as (listener, result)) or the budget runs out. Returns None if nothing was found.
+        # now overrides the clock for scan intervals and cooldowns (replays on a virtual clock).
+        started = time.perf_counter()
+        self.cycles += 1
+        order = self.due(listeners, key, now)
+        for position, listener in enumerate(order):
+            # 'high' listeners sort first, so every one of them has been checked once a deferral can happen
+            if (self.budget and position and priority_for(listener) != "high"
+                    and time.perf_counter() - started >= self.budget):
+                self._defer(order[position:], key)
+                return None
+            result = check(listener)
+            self.checked(listener, key, now)
+            if result:
+                return listener, result
+        return None
+
+    def run_batches(self, listeners, check_batch, batch_size, key=lambda l: l["id"], now=None):
+        # run_cycle for matchers that check several listeners at once (e.g. a process pool): check_batch(list)
+        # gets the due listeners batch_size at a time, in order, and returns (listener, result) for the first
+        # one found or None. The budget is checked between batches, with the same deferral rules.
+        started = time.perf_counter()
+        self.cycles += 1
+        order = self.due(listeners, key, now)
+        batch_size = max(1, batch_size)
+        for position in range(0, len(order), batch_size):
+            if (self.budget and position and priority_for(order[position]) != "high"
+                    and time.perf_counter() - started >= self.budget):
+                self._defer(order[position:], key)
+                return None
+            batch = order[position:position + batch_size]
+            found = check_batch(batch)
+            for listener in batch:
+                self.checked(listener, key, now)
+            if found:
+                return found
+        return None
+
+    def _defer(self, listeners, key):
+        if not listeners: return
+        self.over_budget_cycles += 1
+        self.deferrals += len(listeners)
+        with self._lock:
+            for listener in listeners:
+                count = self._deferred.get(key(listener), 0) + 1
+                self._deferred[key(listener)] = count
+                self.max_deferred = max(self.max_deferred, count)
+
+    def summary(self):
+        per_cycle = self.checks / self.cycles if self.cycles else 0.0
+        budget_text = f"{self.budget * 1000:.0f} ms budget" if self.budget else "no budget"
+        return (f"scheduler: {per_cycle:.1f} checks/cycle ({budget_text}), {self.over_budget_cycles} of {self.cycles} cycles "
+                f"over budget, {self.deferrals} deferrals, longest deferral {self.max_deferred} cycles")
@@ -0,0 +1,398 @@
+import random
+import time
+
+import pyautogui
+
+from matching import search_region_for, match_mode_for, match_strategy_for, clip_region, locate_in_frame
+from waits import Backoff, wait_for
+
+
+DEFAULT_CONFIDENCE = 0.8 # Used when neither the step nor the image object sets a confidence
+DEFAULT_WAIT_TIMEOUT = 10 # Seconds, for Wait for Image / Wait for Pixel Color steps without timeout_s
+
+# Actions that only read the screen, so pixel colors read by an earlier step are still valid when they run
+# (as long as control only moves forward: a jump back re-reads the screen, or polling loops would never see a change)
+SNAPSHOT_PRESERVING_ACTIONS = ("If Pixel Color", "Goto Step")
+
+
+class SequenceCancelled(BaseException):
+    # BaseException so the per-step "except Exception" handlers cannot swallow a Stop request
+    pass
+
+
+# --- Resolved Step Operands ---
+class ImageTarget:
+    """An image object resolved for matching: its decoded template and every search setting."""
+
+    def __init__(self, name, template, confidence, region, match_mode, strategy):
+        self.name = name
+        self.template = template
+        self.confidence = confidence
+        self.region = region
+        self.match_mode = match_mode
+        self.strategy = strategy
+
+
+class CompiledStep:
+    """One step of a SequencePlan: a handler bound to everything it needs, resolved once per run."""
+
+    def __init__(self, index, action, object_name, params):
+        self.index = index
+        self.action = action
+        self.object_name = object_name
+        self.label = f"Action: {action}, Object: {object_name or 'N/A'}, Params: {params}" # Printed as the step runs
+        self.handler = _skip
+        self.problem = None # Why the step cannot run, printed each time it is reached
+        self.keeps_pixel_snapshot = action in SNAPSHOT_PRESERVING_ACTIONS
+        self.target = None # Action-specific operands, filled in by the step's compiler
+        self.then_pc = None # 0-based jump targets; None continues with the next step
+        self.else_pc = None
+        self.timeout = None # Seconds, for the wait actions
+
+    def run(self, run):
+        # Executes the step; returns the 0-based index of the next step, or None for the following one
+        return self.handler(self, run)
+
+
+class SequencePlan:
+    """A sequence compiled for execution, plus the validation problems found while compiling it."""
+
+    def __init__(self, steps, errors):
+        self.steps = steps
+        self.errors = errors # "Step N (Action): message" strings, in step order
+
+    def __len__(self):
+        return len(self.steps)
+
+    def condition_pixels(self):
+        # Names of the pixel objects the If Pixel Color steps read, in step order (what the run's PixelProbe needs)
+        return list(dict.fromkeys(step.target[0] for step in self.steps if step.handler is _if_pixel))
+
+
+class SequenceRun:
+    """Per-run state the step handlers use: where to capture, how to wait, and the pixel probe."""
+
+    def __init__(self, sleep, pixel_probe, frame_source, backoff=None, on_wait=None, matcher_pool=None):
+        self.matcher_pool = matcher_pool # Optional MatcherPool doing the matching in worker processes
+        self.sleep = sleep # Interruptible sleep: raises when the run is cancelled
+        self.pixel_probe = pixel_probe
+        self.frame_source = frame_source # Grabbed by the image steps, polled by the wait actions
+        self.backoff = backoff or Backoff() # Poll interval policy of the wait actions
+        self.on_wait = on_wait # Optional callback(step, WaitResult) after each wait
+        self.pixel_snapshot = None # Colors of the pixel objects read so far, valid until a step that can change the screen
+        self.last_step_index = -1 # Index of the previous step run; reaching it (or an earlier one) again drops the snapshot
+
+    def find(self, target):
+        # Grabs only the target's search area (None = whole screen) and looks for the image in it
+        region = target.region
+        if region is not None:
+            region = clip_region(region, *self.frame_source.screen_size())
+            if region is None: return None # Search area is entirely off screen
+        return self.match_in(self.frame_source.grab(region=region), target)
+
+    def match_in(self, frame, target):
+        # The target's match in an already grabbed frame, or None
+        if self.matcher_pool is not None:
+            return self.matcher_pool.locate(target.template.path, frame, target.confidence, None, target.match_mode, target.strategy)
+        return locate_in_frame(target.template, frame, target.confidence, match_mode=target.match_mode, strategy=target.strategy)
+
+    def pixel(self, name):
+        # Color of a pixel object from the current snapshot; one not in it is read together with the pixels near it
+        if self.pixel_snapshot is None: self.pixel_snapshot = {}
+        if name not in self.pixel_snapshot: self.pixel_snapshot.update(self.pixel_probe.read(self.pixel_probe.group(name)))
+        return self.pixel_snapshot[name]
+
+    def step_starting(self, step):
+        # Only a straight (forward) chain of screen-reading steps shares one read of the pixels; a step that can change
+        # the screen, or a jump back to a step already evaluated (a loop polling for a color), reads them again
+        if not step.keeps_pixel_snapshot or step.index <= self.last_step_index: self.pixel_snapshot = None
+        self.last_step_index = step.index
+
+    def wait(self, step, region, check):
+        # Waits up to step.timeout for check(frame) on region, re-checking only when its pixels change
+        result = wait_for(self.frame_source, region, check, step.timeout, self.sleep, self.backoff)
+        if self.on_wait: self.on_wait(step, result)
+        return result
+
+
+# --- Execution ---
+def run_pass(plan, run, cancelled, on_step=None, on_step_done=None, on_error=None):
+    # One pass through a plan, following its jumps: the sequence runner's step loop. Raises SequenceCancelled once
+    # cancelled() is true; a step that fails is reported to on_error(step, error) and the pass goes on, except for
+    # pyautogui's failsafe, which ends it. on_step(step) and on_step_done(step, seconds) frame every step.
+    program_counter = 0
+    while program_counter < len(plan):
+        if cancelled(): raise SequenceCancelled()
+        step = plan.steps[program_counter]
+        step_started = time.perf_counter()
+        if on_step: on_step(step)
+        run.step_starting(step)
+        jump_to_pc = None # None: no jump, otherwise the target 0-based PC
+        try: jump_to_pc = step.run(run)
+        except pyautogui.FailSafeException: raise
+        except Exception as e:
+            if on_error: on_error(step, e)
+        if on_step_done: on_step_done(step, time.perf_counter() - step_started)
+        program_counter = jump_to_pc if jump_to_pc is not None else program_counter + 1
+
+
+# --- Compilation ---
+def _expected_rgb(params, obj):
+    # The step's expected_rgb parameter as a tuple, falling back to the pixel object's captured color
+    value = params.get("expected_rgb")
+    if isinstance(value, (list, tuple)): return tuple(value)
+    return tuple(obj["rgb"]) if obj and obj.get("rgb") else None
+
+
+class _Compiler:
+    def __init__(self, steps, objects, template_cache, hotkeys):
+        self.steps = steps
+        self.objects = objects
+        self.template_cache = template_cache
+        self.hotkeys = hotkeys
+        self.errors = []
+
+    def error(self, step, message):
+        self.errors.append(f"Step {step.index + 1} ({step.action}): {message}")
+        return message
+
+    def fail(self, step, message):
+        # The step cannot run at all: it is reported now and skipped with a warning when reached
+        step.problem = self.error(step, message)
+        step.handler = _skip
+
+    def jump(self, step, value, label):
+        # 1-based step number from the editor -> 0-based index, or None (with an error if it was set but invalid)
+        if isinstance(value, int) and 1 <= value <= len(self.steps): return value - 1
+        if value is not None: self.error(step, f"invalid '{label}' step {value}")
+        return None
+
+    def image_target(self, step, name, params):
+        obj = self.objects.get(name)
+        if not obj or obj.get("type") != "image":
+            return None, f"'{name}' is not an image object"
+        path = obj.get("image_path")
+        template = self.template_cache.get(path) if path else None
+        if template is None:
+            return None, f"image file missing for '{name}' at path: {path}"
+        confidence = params.get("confidence", obj.get("confidence", DEFAULT_CONFIDENCE))
+        return ImageTarget(name, template, confidence, search_region_for(obj), match_mode_for(obj), match_strategy_for(obj)), None
+
+    def compile(self):
+        plan = []
+        for index, raw in enumerate(self.steps):
+            action = raw.get("action"); obj_name = raw.get("object_name"); params = raw.get("params", {})
+            step = CompiledStep(index, action, obj_name, params)
+            compiler = _COMPILERS.get(action)
+            if compiler is None: self.fail(step, f"unknown action '{action}'")
+            else: compiler(self, step, self.objects.get(obj_name) if obj_name else None, params)
+            plan.append(step)
+        return SequencePlan(plan, self.errors)
+
+
+def compile_sequence(steps, objects, template_cache, hotkeys):
+    # Resolves a list of step dicts (as saved by the editor) into a SequencePlan.
+    # Objects, templates, colors and jump targets are looked up here once, never while the sequence runs.
+    return _Compiler(steps, objects, template_cache, hotkeys).compile()
+
+
+def _compile_goto(c, step, obj, params):
+    target = params.get("target_step")
+    if not isinstance(target, int) or not 1 <= target <= len(c.steps):
+        return c.fail(step, f"invalid target step for Goto: {target}")
+    step.then_pc = target - 1
+    step.handler = _goto
+
+
+def _compile_if_image(c, step, obj, params):
+    name = params.get("condition_object_name")
+    step.target, problem = c.image_target(step, name, params)
+    if problem: return c.fail(step, f"invalid condition object: {problem}")
+    step.then_pc = c.jump(step, params.get("then_step"), "Then")
+    step.else_pc = c.jump(step, params.get("else_step"), "Else")
+    step.handler = _if_image
+
+
+def _compile_if_pixel(c, step, obj, params):
+    name = params.get("condition_object_name")
+    condition = c.objects.get(name)
+    expected = _expected_rgb(params, condition)
+    if not condition or condition.get("type") != "pixel" or not expected:
+        return c.fail(step, f"invalid condition object/RGB '{name}' (expected RGB was {expected})")
+    step.target = (name, expected)
+    step.then_pc = c.jump(step, params.get("then_step"), "Then")
+    step.else_pc = c.jump(step, params.get("else_step"), "Else")
+    step.handler = _if_pixel
+
+
+def _compile_click(c, step, obj, params):
+    if obj is None: return c.fail(step, f"object '{step.object_name}' not found")
+    clicks = params.get("clicks", 1)
+    options = {"clicks": clicks, "interval": params.get("interval", 0.1 if clicks > 1 else 0.0), "button": params.get("button", "left")}
+    obj_type = obj.get("type"); coords = obj.get("coords")
+    if obj_type == "region" and coords:
+        step.target = ((coords[0] + coords[2] / 2, coords[1] + coords[3] / 2), options)
+    elif obj_type == "pixel" and coords:
+        step.target = ((coords[0], coords[1]), options)
+    elif obj_type == "image":
+        image, problem = c.image_target(step, step.object_name, params)
+        if problem: return c.fail(step, problem)
+        step.target = (image, options)
+    else: return c.fail(step, f"cannot click object '{step.object_name}' of type '{obj_type}'")
+    step.handler = _click
+
+
+def _compile_wait_image(c, step, obj, params):
+    if obj is None: return c.fail(step, f"object '{step.object_name}' not found")
+    step.target, problem = c.image_target(step, step.object_name, params)
+    if problem: return c.fail(step, problem)
+    step.timeout = params.get("timeout_s", DEFAULT_WAIT_TIMEOUT)
+    step.handler = _wait_image
+
+
+def _compile_wait_pixel(c, step, obj, params):
+    if not obj or obj.get("type") != "pixel" or not obj.get("coords"): return c.fail(step, f"'{step.object_name}' is not a pixel object")
+    expected = _expected_rgb(params, obj)
+    if not expected: return c.fail(step, f"no RGB for pixel '{step.object_name}'")
+    step.target = (step.object_name, expected, (int(obj["coords"][0]), int(obj["coords"][1])))
+    step.timeout = params.get("timeout_s", DEFAULT_WAIT_TIMEOUT)
+    step.handler = _wait_pixel
+
+
+def _compile_wait(c, step, obj, params):
+    min_s = params.get("min_s"); max_s = params.get("max_s")
+    step.target = (min_s, max_s) if min_s is not None and max_s is not None else params.get("duration_s", 1.0)
+    step.handler = _wait
+
+
+def _compile_keyboard(c, step, obj, params):
+    text = params.get("text_to_type", "")
+    if not text: return c.fail(step, "no text specified for Keyboard Input")
+    step.target = (text, params.get("interval", 0.01))
+    step.handler = _type_text
+
+
+def _compile_press(c, step, obj, params):
+    key = params.get("key_to_press")
+    if not key: return c.fail(step, "no key specified for Press Key")
+    step.target = key
+    step.handler = _press
+
+
+def _compile_hotkey(c, step, obj, params):
+    name = params.get("selected_hotkey_name")
+    if not name or name not in c.hotkeys: return c.fail(step, f"invalid or no hotkey selected: '{name}'")
+    step.target = (name, tuple(c.hotkeys[name]))
+    step.handler = _hotkey
+
+
+def _compile_scroll(c, step, obj, params):
+    direction = params.get("direction", "down"); amount = params.get("amount", 10)
+    if direction not in ("up", "down", "left", "right"): return c.fail(step, f"invalid scroll direction '{direction}'")
+    scroll = pyautogui.scroll if direction in ("up", "down") else pyautogui.hscroll
+    step.target = (scroll, -amount if direction in ("down", "left") else amount, params.get("x"), params.get("y"), direction)
+    step.handler = _scroll
+
+
+_COMPILERS = {
+    "Goto Step": _compile_goto,
+    "If Image Found": _compile_if_image,
+    "If Pixel Color": _compile_if_pixel,
+    "Click": _compile_click,
+    "Wait for Image": _compile_wait_image,
+    "Wait for Pixel Color": _compile_wait_pixel,
+    "Wait": _compile_wait,
+    "Keyboard Input": _compile_keyboard,
+    "Press Key": _compile_press,
+    "Hotkey Combo": _compile_hotkey,
+    "Scroll": _compile_scroll,
+}
+
+
+# --- Step Handlers ---
+def _skip(step, run):
+    print(f"    WARN: {step.problem}")
+
+
+def _goto(step, run):
+    return step.then_pc
+
+
+def _if_image(step, run):
+    if run.find(step.target):
+        print(f"    IF: Image '{step.target.name}' FOUND.")
+        return step.then_pc
+    print(f"    IF: Image '{step.target.name}' NOT found.")
+    return step.else_pc
+
+
+def _if_pixel(step, run):
+    name, expected = step.target
+    current = run.pixel(name)
+    if current == expected:
+        print(f"    IF: Pixel '{name}' color MATCHED.")
+        return step.then_pc
+    print(f"    IF: Pixel '{name}' color ({current}) did NOT match {expected}.")
+    return step.else_pc
+
+
+def _click(step, run):
+    where, options = step.target
+    if isinstance(where, ImageTarget):
+        loc = run.find(where)
+        if not loc:
+            print(f"    WARN: Image '{where.name}' not found for click."); return
+        where = (loc[0] + loc[2] / 2, loc[1] + loc[3] / 2)
+    pyautogui.click(x=where[0], y=where[1], **options)
+    print(f"    Clicked {options['button']} {options['clicks']}x at ({where[0]:.0f},{where[1]:.0f})")
+
+
+def _wait_image(step, run):
+    target = step.target
+    region = target.region
+    if region is not None:
+        region = clip_region(region, *run.frame_source.screen_size())
+        if region is None:
+            print(f"    WARN: Search area of '{target.name}' is off screen."); return
+    result = run.wait(step, region, lambda frame: run.match_in(frame, target))
+    if result: print(f"    Image '{target.name}' found, {result.summary()}.")
+    else: print(f"    TIMEOUT: Image '{target.name}' not found after {step.timeout}s ({result.summary()}).")
+
+
+def _wait_pixel(step, run):
+    name, expected, (x, y) = step.target
+    seen = [None] # Last color read, for the timeout message
+    def check(frame):
+        seen[0] = frame.pixel(x, y)
+        return seen[0] == expected
+    result = run.wait(step, (x, y, 1, 1), check)
+    if result: print(f"    Pixel color matched, {result.summary()}.")
+    else: print(f"    TIMEOUT: Pixel color not matched. Last: {seen[0]}")
+
+
+def _wait(step, run):
+    if isinstance(step.target, tuple):
+        duration = random.uniform(*step.target); print(f"    Random Wait: {duration:.2f}s")
+    else:
+        duration = step.target; print(f"    Static Wait: {duration}s")
+    run.sleep(duration)
+
+
+def _type_text(step, run):
+    text, interval = step.target
+    pyautogui.typewrite(text, interval=interval); print(f"    Typed: '{text}'")
+
+
+def _press(step, run):
+    pyautogui.press(step.target); print(f"    Pressed Key: '{step.target}'")
+
+
+def _hotkey(step, run):
+    name, keys = step.target
+    pyautogui.hotkey(*keys); print(f"    Executed Hotkey Combo: {name} ({list(keys)})")
+
+
+def _scroll(step, run):
+    scroll, amount, x, y, direction = step.target
+    scroll(amount, x=x, y=y)
+    print(f"    Scrolled {direction} by {abs(amount)}" + (f" at ({x},{y})" if x is not None else ""))
@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+from frame_sources import image_to_pixels, rgb_to_gray
+from matching import select_sample_points, sample_pairs
+
+
+TEMPLATE_REVALIDATE_INTERVAL = 2.0 # Seconds a cached template is trusted before its file's mtime is checked again
+
+
+# --- Decoded Templates ---
+class Template:
+    """A template image decoded once, with the forms the matchers need precomputed."""
+
+    def __init__(self, path, image, mtime=None):
+        self.path = path
+        self.mtime = mtime # None for templates primed from memory rather than read from disk
+        self.image = image.convert("RGB") if image.mode != "RGB" else image
+        self.rgb = image_to_pixels(self.image) # (height, width, 3) uint8
+        self.gray = rgb_to_gray(self.rgb) # float32 luma
+        centered = self.gray - self.gray.mean()
+        norm = float(np.sqrt((centered * centered).sum()))
+        # Zero-mean, unit-norm form used by normalised cross-correlation; a flat template has no pattern to match
+        self.normalized = centered / norm if norm > 0 else np.zeros_like(centered)
+        self.is_flat = norm == 0
+        self.height, self.width = self.gray.shape
+        # Most discriminative pixels, checked first by the sparse prefilter
+        self.sample_ys, self.sample_xs = select_sample_points(self.gray)
+        self.sample_pairs = sample_pairs(self.gray, self.sample_ys, self.sample_xs)
+        self.match_cache = {} # Matcher precomputations for this template (e.g. FFTs at a given size)
+        self.checked_at = time.monotonic()
+
+    @property
+    def size(self):
+        return (self.width, self.height)
+
+
+class TemplateCache:
+    def __init__(self, revalidate_interval=TEMPLATE_REVALIDATE_INTERVAL):
+        self.revalidate_interval = revalidate_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.loads = 0 # Decodes from disk, for diagnostics
+        self.hits = 0
+
+    def get(self, path):
+        # Returns the decoded Template for path, or None if the file is missing or unreadable.
+        # The file is only stat'ed once per revalidate_interval, so hot loops do no disk I/O.
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and (entry.mtime is None or now - entry.checked_at < self.revalidate_interval):
+                self.hits += 1
+                return entry
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            self.invalidate(path)
+            return None
+        if entry is not None and entry.mtime == mtime:
+            with self._lock:
+                entry.checked_at = now
+                self.hits += 1
+            return entry
+        try:
+            return self._load(path, mtime)
+        except Exception as e:
+            print(f"Could not decode template '{path}': {e}")
+            self.invalidate(path)
+            return None
+
+    def _load(self, path, mtime):
+        with Image.open(path) as image:
+            template = Template(path, image.convert("RGB"), mtime)
+        with self._lock:
+            self._entries[path] = template
+            self.loads += 1
+        return template
+
+    def preload(self, paths):
+        # Load-time validation: decodes every template up front.
+        # Returns {path: error message} for the ones that could not be loaded.
+        errors = {}
+        for path in paths:
+            if not path:
+                continue
+            if not os.path.exists(path):
+                errors[path] = "file not found"
+                continue
+            try:
+                self._load(path, os.stat(path).st_mtime)
+            except Exception as e:
+                errors[path] = str(e)
+        return errors
+
+    def put(self, path, image):
+        # Primes the cache from an in-memory image (e.g. a fresh capture not yet written to disk)
+        template = Template(path, image)
+        with self._lock:
+            self._entries[path] = template
+        return template
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
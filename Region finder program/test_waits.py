@@ -0,0 +1,74 @@
+import numpy as np
+
+import waits
+from frame_sources import Frame
+from waits import Backoff, wait_for, WAIT_POLL_MAX_S, WAIT_QUIET_S
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ScriptedSource:
+    """Frame source whose pixels come from changes(time): the value bumps whenever the region changes."""
+
+    def __init__(self, clock, changes):
+        self.clock = clock
+        self.changes = changes
+
+    def grab(self, region=None):
+        pixels = np.zeros((4, 4, 3), dtype=np.uint8)
+        pixels[0, 0] = self.changes(self.clock.now) % 256
+        return Frame(pixels)
+
+
+def _wait(monkeypatch, changes, timeout, check=lambda frame: None, check_cost=0.0):
+    clock = FakeClock()
+    monkeypatch.setattr(waits.time, "monotonic", clock.monotonic)
+
+    def timed_check(frame):
+        clock.sleep(check_cost)
+        return check(frame)
+
+    return clock, wait_for(ScriptedSource(clock, changes), None, timed_check, timeout, clock.sleep, Backoff())
+
+
+def test_always_changing_region_backs_off(monkeypatch):
+    # A pixel changes on every grab (an animated screen): checks must thin out like on an idle screen
+    grabs = iter(range(10 ** 6))
+    _, result = _wait(monkeypatch, lambda now: next(grabs), timeout=1.0)
+    assert not result.found
+    assert result.checks == result.grabs # Every poll saw a change...
+    assert result.checks <= 12 # ...yet the interval still grew (resetting on each change made ~56 checks here)
+    _, result = _wait(monkeypatch, lambda now: next(grabs), timeout=5.0)
+    assert result.checks <= 12 + (5.0 - 1.0) / WAIT_POLL_MAX_S + 1 # At the slow interval from then on
+
+
+def test_never_polls_faster_than_the_check_takes(monkeypatch):
+    grabs = iter(range(10 ** 6))
+    clock, result = _wait(monkeypatch, lambda now: next(grabs), timeout=2.0, check_cost=0.5)
+    assert result.checks <= 3 # 0.5 s check, then at least 0.5 s before the next poll
+
+
+def test_change_after_quiet_spell_is_noticed_fast(monkeypatch):
+    # Static for a while, then the screen starts changing: the change restarts fast polling, so what follows it
+    # shortly after (the awaited state) is noticed well within the slow interval
+    appear_at = 3.0
+    first_seen = []
+
+    def changes(now):
+        if now < appear_at: return 0
+        if not first_seen: first_seen.append(now)
+        return 1 if now < first_seen[0] + 0.05 else 2
+
+    _, result = _wait(monkeypatch, changes, timeout=10.0, check=lambda frame: frame.pixels[0, 0, 0] == 2)
+    assert result.found
+    assert WAIT_QUIET_S < appear_at
+    assert result.elapsed - first_seen[0] < 0.05 + WAIT_POLL_MAX_S / 2
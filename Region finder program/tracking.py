@@ -0,0 +1,82 @@
+import threading
+
+
+TRACK_MARGIN = 6 # Pixels searched around the last match rectangle
+TRACK_MAX_MISSES = 3 # Consecutive misses in the tracked window before searching the full ROI / screen again
+
+
+def _intersect(a, b):
+    # Intersection of two (left, top, width, height) regions; b=None means unbounded
+    if b is None:
+        return a
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return (x1, y1, x2 - x1, y2 - y1)
+
+
+class LocationTracker:
+    """Remembers where each listener's icon was last found, so the next search can start there.
+
+    While a listener has a track, only a small window around its last match is searched. After
+    max_misses misses in a row the track is dropped and the listener's own search area is used again.
+    """
+
+    def __init__(self, margin=TRACK_MARGIN, max_misses=TRACK_MAX_MISSES):
+        self.margin = margin
+        self.max_misses = max_misses
+        self._tracks = {} # key -> {"box": (left, top, width, height), "misses": int}
+        self._lock = threading.Lock()
+        self.tracked_checks = 0 # Searches limited to a tracked window, for diagnostics
+        self.wide_checks = 0
+
+    def window(self, box):
+        # Tracked search window around a match rectangle
+        return (box[0] - self.margin, box[1] - self.margin, box[2] + 2 * self.margin, box[3] + 2 * self.margin)
+
+    def search_region(self, key, fallback_region=None):
+        # Region to search this cycle: the tracked window if there is a live track, else fallback_region
+        # (the listener's ROI, or None for the full screen)
+        with self._lock:
+            track = self._tracks.get(key)
+            if track is not None:
+                region = _intersect(self.window(track["box"]), fallback_region)
+                if region is not None:
+                    self.tracked_checks += 1
+                    return region
+            self.wide_checks += 1
+            return fallback_region
+
+    def is_tracking(self, key):
+        with self._lock:
+            return key in self._tracks
+
+    def update(self, key, box):
+        # Records the result of a search: the match rectangle, or None for a miss
+        with self._lock:
+            if box is not None:
+                self._tracks[key] = {"box": tuple(box), "misses": 0}
+                return
+            track = self._tracks.get(key)
+            if track is None:
+                return
+            track["misses"] += 1
+            if track["misses"] >= self.max_misses:
+                del self._tracks[key] # Widen again: the icon has gone or moved
+
+    def forget(self, key=None):
+        with self._lock:
+            if key is None:
+                self._tracks.clear()
+            else:
+                self._tracks.pop(key, None)
+
+    def reset_stats(self):
+        self.tracked_checks = 0
+        self.wide_checks = 0
+
+    def summary(self):
+        total = self.tracked_checks + self.wide_checks
+        share = self.tracked_checks / total if total else 0.0
+        return f"tracker: {share:.0%} of {total} searches limited to the last known location"
@@ -0,0 +1,89 @@
+import time
+
+from frame_sources import ChangeDetector
+
+
+WAIT_POLL_MIN_S = 0.01 # First poll interval after a wait starts, or after the watched region changes following a quiet spell
+WAIT_POLL_MAX_S = 0.25 # Interval the polling slows down to while the region stays the same (or never stops changing)
+WAIT_POLL_GROWTH = 1.5 # Factor the interval grows by after each poll that does not restart it
+WAIT_QUIET_S = 0.2 # How long the region must have stayed unchanged for its next change to restart fast polling
+
+
+# --- Adaptive Polling ---
+class Backoff:
+    """Poll interval that starts fast and grows geometrically up to a ceiling while nothing happens."""
+
+    def __init__(self, minimum=WAIT_POLL_MIN_S, maximum=WAIT_POLL_MAX_S, growth=WAIT_POLL_GROWTH):
+        self.minimum = max(0.0, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.growth = max(1.0, growth)
+        self.interval = self.minimum
+
+    def reset(self):
+        self.interval = self.minimum
+
+    def next(self):
+        # Interval to sleep now; the following one is longer
+        interval = self.interval
+        grown = self.interval * self.growth if self.interval else WAIT_POLL_MIN_S # A zero minimum still backs off
+        self.interval = min(grown, self.maximum)
+        return interval
+
+
+class WaitResult:
+    """Outcome of a wait: whether the condition was met and how quickly it was noticed."""
+
+    def __init__(self, found, elapsed, notice_lag, checks, grabs, frame=None, value=None):
+        self.found = found
+        self.elapsed = elapsed # Seconds from the start of the wait until the condition was seen (or the timeout)
+        self.notice_lag = notice_lag # Seconds between the last poll where it was not met and the poll that saw it
+        self.checks = checks # Condition evaluations (only on frames where the region changed)
+        self.grabs = grabs
+        self.frame = frame # Frame the condition was met on
+        self.value = value # What the check returned for it (e.g. the match box)
+
+    def __bool__(self):
+        return self.found
+
+    def summary(self):
+        if not self.found:
+            return f"{self.checks} checks over {self.grabs} polls in {self.elapsed * 1000:.0f} ms"
+        return (f"noticed after {self.elapsed * 1000:.0f} ms (within {self.notice_lag * 1000:.0f} ms of the previous poll), "
+                f"{self.checks} checks over {self.grabs} polls")
+
+
+def wait_for(frame_source, region, check, timeout, sleep=time.sleep, backoff=None):
+    # Polls region until check(frame) returns something truthy or timeout seconds pass.
+    # check only runs when the region's pixels changed. Polling backs off while the region is idle and also while it
+    # keeps changing (an animated game screen); only a change after WAIT_QUIET_S without one speeds it up again, and
+    # it never polls sooner than the last check took.
+    backoff = backoff or Backoff()
+    backoff.reset()
+    detector = ChangeDetector(frame_source, region)
+    started = time.monotonic()
+    deadline = started + timeout
+    previous_poll = started
+    quiet_since = None # Time of the first unchanged poll since the last change
+    check_seconds = 0.0 # How long the last check took
+    checks = 0
+    while True:
+        polled_at = time.monotonic()
+        frame, changed = detector.grab()
+        if changed:
+            checks += 1
+            check_started = time.monotonic()
+            value = check(frame)
+            if value:
+                noticed = time.monotonic()
+                return WaitResult(True, noticed - started, noticed - previous_poll, checks, detector.grabs, frame, value)
+            check_seconds = time.monotonic() - check_started
+            if quiet_since is not None and polled_at - quiet_since >= WAIT_QUIET_S:
+                backoff.reset() # Something started happening after a calm spell: look again soon
+            quiet_since = None
+        elif quiet_since is None:
+            quiet_since = polled_at
+        previous_poll = polled_at
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return WaitResult(False, time.monotonic() - started, None, checks, detector.grabs)
+        sleep(min(max(backoff.next(), check_seconds), remaining))
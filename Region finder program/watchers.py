@@ -0,0 +1,412 @@
+import time
+import traceback
+
+import pyautogui
+
+from matching import (DEFAULT_MATCH_MODE, DEFAULT_LISTENER_STRATEGY, PREFILTER_STATS, search_region_for, match_mode_for,
+                      match_strategy_for, clip_region, match_template, NO_MATCH, measure_prefilter, MATCH_BACKEND,
+                      SharedMatches)
+from frame_diff import FrameDiff
+from tracking import LocationTracker
+from pipeline import WatchPipeline
+from instrumentation import WatchMetrics
+
+# The watch loops of the listener tool (Gemini warcraft.py) and the WA monitor (Warcraft WA advanced.py). They
+# only need a frame source and pyautogui, so benchmark_watchers.py runs these same loops against a headless scene.
+
+
+# --- Listener Tool ---
+def new_watch_stats():
+    return {"cycles": 0, "match": 0.0, "checks": 0, "capture": 0.0}
+
+
+class ListenerWatch:
+    """One watching session of the listener tool: checks the active listeners against the screen and presses the
+    keybind of the first one found, either pipelined (capture, match and press threads sharing one frame per
+    cycle) or serially (each listener grabs its own search area).
+
+    The app keeps the state it shows between sessions (tracker, frame diff, scheduler, governor, metrics) and
+    passes it in; template_for(listener) returns the listener's decoded Template, or None if its image is missing.
+    """
+
+    def __init__(self, listeners, source, template_for, active, location_tracker, frame_diff, scheduler, governor, metrics,
+                 recorder=None, cycle_stats_every=0):
+        self.listeners = listeners # Read live, so toggling 'active' in the UI takes effect on the next cycle
+        self.source = source
+        self.template_for = template_for
+        self.active = active # threading.Event; the loops stop once it is cleared
+        self.location_tracker = location_tracker
+        self.frame_diff = frame_diff
+        self.scheduler = scheduler
+        self.governor = governor
+        self.metrics = metrics
+        self.recorder = recorder # Optional FrameRecorder that also logs every key press
+        self.cycle_stats_every = cycle_stats_every # Print averaged cycle timings every N cycles (0 = never)
+        self.shared_matches = SharedMatches() # Listeners with the same icon and search area share one match pass per frame
+        self.screen_size = source.screen_size()
+
+    def match_icon(self, template, frame=None, region=None, match_mode=DEFAULT_MATCH_MODE,
+                   strategy=DEFAULT_LISTENER_STRATEGY, stats=None):
+        # Matches against a frame grabbed earlier in the cycle if given, otherwise grabs a fresh one.
+        # region limits the search to the listener's ROI (None = full screen). Returns the MatchResult.
+        if frame is None:
+            # Without a shared frame only the searched area needs grabbing
+            grab_region = clip_region(region, *self.screen_size) if region else None
+            if region is not None and grab_region is None:
+                return NO_MATCH # ROI is entirely off screen
+            grab_start = time.perf_counter()
+            frame = self.source.grab(region=grab_region)
+            if stats is not None: stats["capture"] += time.perf_counter() - grab_start
+        return match_template(frame, template, region, match_mode, strategy)
+
+    def locate_icon(self, template, confidence, frame=None, region=None, match_mode=DEFAULT_MATCH_MODE,
+                    strategy=DEFAULT_LISTENER_STRATEGY):
+        result = self.match_icon(template, frame, region, match_mode, strategy)
+        return result.box if result.found(confidence) else None
+
+    def search(self, listener):
+        # (template, confidence, region, match_mode, strategy) of this cycle's search for a listener,
+        # or None if its image is missing
+        template = self.template_for(listener)
+        if template is None:
+            return None # Missing/unreadable image, reported when watching started
+        # Around the last hit if the icon was seen recently, else the listener's ROI (None = full screen)
+        region = self.location_tracker.search_region(listener['id'], search_region_for(listener))
+        return (template, listener.get('confidence', 0.8), region, match_mode_for(listener),
+                match_strategy_for(listener, DEFAULT_LISTENER_STRATEGY))
+
+    def check(self, listener, frame, stats):
+        # Looks for one listener's icon (in frame, or in a fresh grab of its search area when frame is None).
+        # Returns (template, confidence, match_mode, location) if it is on screen, else None.
+        search = self.search(listener)
+        if search is None:
+            return None
+        template, confidence, region, match_mode, strategy = search
+        match_start = time.perf_counter()
+        # Same area, same pixels, same settings as last cycle: the result cannot have changed
+        settings = (template, confidence, match_mode, strategy)
+        reused, location = self.frame_diff.lookup(listener['id'], region, settings) if frame is not None else (False, None)
+        score = None
+        if not reused:
+            if frame is not None: # Another listener with the same icon may already have searched this area of the frame
+                result = self.shared_matches.match(frame, template, region, match_mode, strategy)
+            else:
+                result = self.match_icon(template, None, region, match_mode, strategy, stats)
+            location = result.box if result.found(confidence) else None
+            score = result.score if result.box is not None else None
+            if frame is not None: self.frame_diff.remember(listener['id'], region, settings, location)
+        elapsed = time.perf_counter() - match_start # Includes the grab of the search area when frame is None
+        stats["match"] += elapsed
+        stats["checks"] += 1
+        self.metrics.record_check(listener['id'], listener['name'], elapsed, bool(location), score, reused)
+        self.location_tracker.update(listener['id'], location)
+        return (template, confidence, match_mode, location) if location else None
+
+    def check_pooled(self, listeners, frame, stats, pool):
+        # Matches every listener on frame at once in the pool's worker processes.
+        # Returns (listener, (template, confidence, match_mode, location)) for the first one on screen, or None.
+        searches = []
+        requests = []
+        request_for = {} # Listener id -> id of the request answering it; identical searches are sent once
+        sent = {}
+        for listener in listeners:
+            search = self.search(listener)
+            if search is None: continue
+            template, confidence, region, match_mode, strategy = search
+            settings = (template, confidence, match_mode, strategy)
+            reused, location = self.frame_diff.lookup(listener['id'], region, settings)
+            searches.append((listener, search, settings, reused, location))
+            if not reused:
+                request = (template.path, confidence, tuple(region) if region else None, match_mode, strategy)
+                if request in sent:
+                    self.shared_matches.shared += 1
+                else:
+                    sent[request] = listener['id']
+                    requests.append((listener['id'], *request))
+                request_for[listener['id']] = sent[request]
+        match_start = time.perf_counter()
+        results = pool.match(frame, requests)
+        elapsed = time.perf_counter() - match_start
+        stats["match"] += elapsed
+        stats["checks"] += len(searches)
+        per_request = elapsed / len(requests) if requests else 0.0 # Workers run in parallel, so the frame's time is shared out
+        first_hit = None
+        for listener, search, settings, reused, location in searches:
+            if not reused:
+                location = results.get(request_for[listener['id']])
+                self.frame_diff.remember(listener['id'], search[2], settings, location)
+            self.metrics.record_check(listener['id'], listener['name'], 0.0 if reused else per_request, bool(location),
+                                      None if reused else pool.last_scores.get(request_for[listener['id']]), reused)
+            self.location_tracker.update(listener['id'], location)
+            if location and first_hit is None:
+                first_hit = (listener, (search[0], search[1], search[3], location))
+        return first_hit
+
+    def press_until_gone(self, listener, template, confidence, match_mode, location):
+        # Returns (number of presses, time.perf_counter() of the first press or None)
+        print(f"Detected: {listener['name']}. Pressing: {listener['keybind_raw']}")
+        keys_to_press = listener['keybind_raw'].split('+')
+
+        press_count = 0
+        first_press_at = None
+        max_presses = listener.get('max_sequential_presses', 3)
+        delay = listener.get('post_press_delay', 0.1)
+
+        # Press keybind until icon disappears or max_presses reached
+        # The screen changes after every press, so each re-check needs a fresh frame, but only
+        # of the few pixels around where the icon was just found
+        verify_region = self.location_tracker.window(location)
+        while self.active.is_set():
+            still_there = self.locate_icon(template, confidence, region=verify_region, match_mode=match_mode, strategy="dense")
+            self.location_tracker.update(listener['id'], still_there)
+            if not still_there: break
+            if len(keys_to_press) == 1:
+                pyautogui.press(keys_to_press[0])
+            else:
+                pyautogui.hotkey(*keys_to_press)
+            if first_press_at is None: first_press_at = time.perf_counter()
+            if self.recorder is not None: self.recorder.record_key(listener['keybind_raw'], listener['name'])
+
+            press_count += 1
+            time.sleep(delay)
+
+            if max_presses > 0 and press_count >= max_presses:
+                print(f"Max ({max_presses}) sequential presses for {listener['name']}. Re-evaluating.")
+                break
+
+        print(f"Icon {listener['name']} action complete (pressed {press_count} times).")
+        return press_count, first_press_at
+
+    def record_presses(self, listener, presses, detected_at):
+        press_count, first_press_at = presses
+        latency = first_press_at - detected_at if first_press_at is not None else None
+        self.metrics.record_press(listener['id'], listener['name'], press_count, latency)
+
+    def print_stats(self, stats, capture_text):
+        # Scan cost only: time spent pressing keys is not part of a cycle's match cost
+        match_ms = stats["match"] * 1000 / stats["cycles"]
+        per_check_ms = stats["match"] * 1000 / stats["checks"] if stats["checks"] else 0.0
+        print(f"[Watcher] last {stats['cycles']} cycles: scan {match_ms:.1f} ms/cycle "
+              f"({capture_text}, {per_check_ms:.1f} ms/listener check)")
+        if PREFILTER_STATS.searches:
+            print(f"[Watcher] {PREFILTER_STATS.summary()}")
+            PREFILTER_STATS.reset()
+        print(f"[Watcher] {self.location_tracker.summary()}")
+        self.location_tracker.reset_stats()
+        print(f"[Watcher] {self.scheduler.summary()}")
+        self.scheduler.reset_stats()
+        print(f"[Watcher] {self.governor.summary()}")
+
+    def run_pipelined(self, pool=None):
+        # Capture, matching and key presses run on separate threads: the next icon is searched for while the
+        # previous one's keybind is being pressed, and the matcher always works on the newest frame
+        stats = new_watch_stats()
+
+        def match(frame, pipeline):
+            self.frame_diff.update(frame)
+            # The first active listener (in UI order) that is on screen wins. Listeners whose last press is
+            # not on screen yet are left out.
+            listeners = [l for l in self.listeners if l.get('active', False) and not pipeline.is_busy(l['id'], frame)]
+            if pool is not None:
+                try:
+                    # Due listeners by priority, a batch per worker process at a time, until one is found or the
+                    # cycle's budget is used up (checked between batches)
+                    hit = self.scheduler.run_batches(listeners, lambda batch: self.check_pooled(batch, frame, stats, pool),
+                                                     pool.process_count)
+                except Exception as e:
+                    print(f"Error matching in the matcher pool: {e}")
+                    return None
+                return (hit[0]['id'], (*hit, time.perf_counter())) if hit else None
+
+            def check(listener):
+                if not self.active.is_set(): return None
+                try:
+                    return self.check(listener, frame, stats)
+                except Exception as e:
+                    print(f"Error during watch loop for listener {listener.get('name', 'Unknown')}: {e}")
+                    traceback.print_exc()
+                    return None
+
+            # Due listeners by priority until one is found or the cycle's budget is used up
+            found = self.scheduler.run_cycle(listeners, check)
+            return (found[0]['id'], (*found, time.perf_counter())) if found else None
+
+        def act(action):
+            listener, hit, detected_at = action
+            try:
+                self.record_presses(listener, self.press_until_gone(listener, *hit), detected_at)
+            except pyautogui.FailSafeException:
+                raise
+            except Exception as e:
+                print(f"Error pressing keybind for listener {listener.get('name', 'Unknown')}: {e}")
+            self.scheduler.fired(listener)
+            self.governor.record_hit()
+
+        def on_frame(pipeline):
+            self.governor.record_cycle(pipeline.last_capture_time + pipeline.last_match_time)
+            self.metrics.record_cycle(pipeline.last_capture_time)
+            stats["cycles"] += 1
+            if self.cycle_stats_every > 0 and stats["cycles"] >= self.cycle_stats_every:
+                self.print_stats(stats, "capture on its own thread")
+                print(f"[Watcher] {self.frame_diff.summary()}")
+                self.frame_diff.reset_stats()
+                print(f"[Watcher] {pipeline.summary()}")
+                pipeline.reset_stats()
+                stats.update(new_watch_stats())
+
+        # The capture thread asks the governor for the pause before every grab
+        pipeline = WatchPipeline(self.source, match, act, self.governor.interval, self.active.is_set)
+        pipeline.run(on_frame)
+
+    def run_serial(self):
+        # One thread does everything in turn: each listener grabs just its own search area
+        stats = new_watch_stats()
+        while self.active.is_set():
+            processed_one_this_cycle = False
+            cycle_start = time.perf_counter()
+            capture_before = stats["capture"]
+            # Create a temporary list of active listeners in their current UI order
+            active_listeners_in_order = [l for l in self.listeners if l.get('active', False)]
+
+            def check(listener):
+                if not self.active.is_set(): return None # Check event before each potentially long operation
+                try:
+                    return self.check(listener, None, stats)
+                except pyautogui.FailSafeException:
+                    raise
+                except Exception as e:
+                    print(f"Error during watch loop for listener {listener.get('name', 'Unknown')}: {e}")
+                    traceback.print_exc()
+                    return None # For now, just continue to the next listener or next cycle
+
+            found = self.scheduler.run_cycle(active_listeners_in_order, check)
+            self.governor.record_cycle(time.perf_counter() - cycle_start) # Scan cost, without the presses
+            self.metrics.record_cycle(stats["capture"] - capture_before) # Summed grabs of the listeners' search areas
+            if found:
+                listener, hit = found
+                detected_at = time.perf_counter()
+                self.record_presses(listener, self.press_until_gone(listener, *hit), detected_at)
+                self.scheduler.fired(listener)
+                self.governor.record_hit()
+                processed_one_this_cycle = True # IMPORTANT: Restart scan from highest priority after an action
+
+            stats["cycles"] += 1
+            if self.cycle_stats_every > 0 and stats["cycles"] >= self.cycle_stats_every:
+                self.print_stats(stats, "capture included in match")
+                stats = new_watch_stats()
+
+            if not self.active.is_set(): break # Check again before sleep
+
+            if not processed_one_this_cycle:
+                time.sleep(self.governor.interval()) # Sleep only if no icon was processed in this full pass
+
+
+# --- WA Monitor ---
+def _report_prefilter_speedup(listeners, frame, template_cache):
+    # Times dense vs. prefiltered matching once per icon on the first frame, so the gain is visible
+    for listener in listeners:
+        obj_data = listener["object_data"]
+        if obj_data["type"] != "icon" or match_strategy_for(obj_data, DEFAULT_LISTENER_STRATEGY) != "sparse": continue
+        template = template_cache.get(obj_data["image_path"])
+        if template is None: continue
+        report = measure_prefilter(frame, template, search_region_for(obj_data), repeats=1)
+        if report is None:
+            print(f"Prefilter {listener['name']}: matched densely (too little contrast or too many candidates)")
+            continue
+        dense_ms, sparse_ms, pruned = report
+        print(f"Prefilter {listener['name']}: {pruned:.1%} of positions pruned, "
+              f"{dense_ms:.1f} ms dense -> {sparse_ms:.1f} ms sparse ({dense_ms / max(sparse_ms, 1e-6):.1f}x)")
+
+
+def monitor_icons(listeners, frame_source, template_cache, governor, keep_running, settle, metrics_path=None):
+    # Presses the keybind of the highest priority icon on screen, frame after frame, until keep_running() is false.
+    # listeners are the monitor's listener dicts (name, priority, object_data); per-icon metrics are appended to
+    # metrics_path (JSON lines) when it stops.
+    listeners.sort(key=lambda x: x["priority"]) # Lower number = higher priority
+    print(f"Monitoring {len(listeners)} icon(s) with the {MATCH_BACKEND} NCC matcher.")
+    PREFILTER_STATS.reset()
+    tracker = LocationTracker() # Where each icon was last seen; searched first on the next pass
+    frame_diff = FrameDiff() # Icons whose search area did not change since the last pass reuse that pass's result
+    metrics = WatchMetrics() # Per-icon match time, hits, press latency and best-score histogram
+    shared_matches = SharedMatches() # Icons with the same image and search area are matched once per frame
+    prefilter_checked = [False]
+
+    def match(frame, pipeline):
+        # Runs on the newest captured frame; returns the highest priority icon that is on screen
+        frame_diff.update(frame)
+        if not prefilter_checked[0]:
+            _report_prefilter_speedup(listeners, frame, template_cache)
+            prefilter_checked[0] = True
+            PREFILTER_STATS.reset()
+        for listener in listeners:
+            obj_data = listener["object_data"]
+            if obj_data["type"] != "icon": continue
+            if pipeline.is_busy(listener["name"], frame): continue # Its last press is not on screen yet
+            template = template_cache.get(obj_data["image_path"])
+            if template is None: continue # Missing/unreadable image, reported when monitoring started
+            confidence = obj_data.get("confidence", 0.8)
+            try:
+                # Check if the icon is in this frame: around its last position if it was seen
+                # recently, otherwise within its search area
+                started = time.perf_counter()
+                region = tracker.search_region(listener["name"], search_region_for(obj_data))
+                settings = (template, confidence, match_mode_for(obj_data), match_strategy_for(obj_data, DEFAULT_LISTENER_STRATEGY))
+                reused, location = frame_diff.lookup(listener["name"], region, settings)
+                score = None
+                if not reused:
+                    result = shared_matches.match(frame, template, region, settings[2], settings[3])
+                    location = result.box if result.found(confidence) else None
+                    score = result.score if result.box is not None else None
+                    frame_diff.remember(listener["name"], region, settings, location)
+                metrics.record_check(listener["name"], listener["name"], time.perf_counter() - started, bool(location), score, reused)
+                tracker.update(listener["name"], location)
+                if location:
+                    print(f"Found {listener['name']} at {location}. Pressing {obj_data['keybind']}.")
+                    # Press only the highest priority active icon
+                    return listener["name"], (listener["name"], obj_data["keybind"], time.perf_counter())
+            except Exception as e:
+                print(f"Error monitoring {listener['name']}: {e}")
+        return None
+
+    def act(action):
+        # Simulate key press on the actuator thread while the matcher moves on to the next frame
+        name, keybind, detected_at = action
+        try:
+            if '+' in keybind: # Handle hotkeys like 'alt+q'
+                pyautogui.hotkey(*keybind.split('+'))
+            else:
+                pyautogui.press(keybind)
+            metrics.record_press(name, name, 1, time.perf_counter() - detected_at)
+        except pyautogui.FailSafeException:
+            raise
+        except Exception as e:
+            print(f"Error pressing {keybind}: {e}")
+        governor.record_hit()
+
+    def on_frame(pipeline):
+        governor.record_cycle(pipeline.last_capture_time + pipeline.last_match_time)
+        metrics.record_cycle(pipeline.last_capture_time)
+
+    # Instead of sleeping after every press, only the pressed icon is ignored until a frame captured
+    # settle seconds after the press; every other icon keeps being checked
+    pipeline = WatchPipeline(frame_source, match, act, governor.interval, keep_running, settle=settle)
+    try:
+        pipeline.run(on_frame)
+    except pyautogui.FailSafeException:
+        print("!!! FAILSAFE TRIGGERED (mouse to top-left) !!!")
+
+    if PREFILTER_STATS.searches:
+        print(PREFILTER_STATS.summary().capitalize())
+    print(tracker.summary().capitalize())
+    print(frame_diff.summary().capitalize())
+    print(pipeline.summary().capitalize())
+    print(governor.summary().capitalize())
+    print("Per-icon cost:\n  " + "\n  ".join(metrics.summary_lines() or ["no checks"]))
+    if shared_matches.shared:
+        print(f"{shared_matches.shared} checks reused another icon's match of the same image")
+    if metrics_path:
+        try:
+            metrics.export_jsonl(metrics_path)
+        except OSError as e:
+            print(f"Could not write listener metrics: {e}")
+    print("Listener loop stopped.")
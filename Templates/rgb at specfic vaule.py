@@ -4,8 +4,8 @@ from tkinter import Tk, Button, Label
 def check_rgb():
     # Position to check
     x, y = 1182, 1219
-    # Get RGB value at the position
-    rgb = pyautogui.screenshot().getpixel((x, y))
+    # Get RGB value at the position (capture just that pixel, not the whole screen)
+    rgb = pyautogui.screenshot(region=(x, y, 1, 1)).getpixel((0, 0))
     # Update the label with the RGB value
     rgb_label.config(text=f"RGB at ({x}, {y}): {rgb}")
     # Print the RGB value to the terminal